@@ -1,33 +1,70 @@
-from django.utils.deprecation import MiddlewareMixin
-from django.contrib.auth.views import redirect_to_login
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.shortcuts import redirect
 
 
-class CacheControlMiddleware(MiddlewareMixin):
+class CacheControlMiddleware:
     """
     Middleware to add cache control headers to prevent back button access after logout
     """
-    def process_response(self, request, response):
-        # Add cache control headers to authenticated pages
-        if hasattr(request, 'user') and request.user.is_authenticated:
-            if request.path.startswith('/dashboard') or 'dashboard' in request.path:
-                response['Cache-Control'] = 'no-cache, no-store, must-revalidate, max-age=0'
-                response['Pragma'] = 'no-cache'
-                response['Expires'] = '0'
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if self._is_dashboard(request) and request.user.is_authenticated:
+            self._add_headers(response)
         return response
 
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self._is_dashboard(request) and (await request.auser()).is_authenticated:
+            self._add_headers(response)
+        return response
+
+    def _is_dashboard(self, request):
+        # Checked before the user so other requests never load it
+        return hasattr(request, 'user') and 'dashboard' in request.path
+
+    def _add_headers(self, response):
+        # Add cache control headers to authenticated pages
+        response['Cache-Control'] = 'no-cache, no-store, must-revalidate, max-age=0'
+        response['Pragma'] = 'no-cache'
+        response['Expires'] = '0'
+
 
-class LogoutRedirectMiddleware(MiddlewareMixin):
+class LogoutRedirectMiddleware:
     """
     Middleware to handle browser back button after logout
     """
-    def process_request(self, request):
-        # Check if user is trying to access protected pages after logout
-        protected_paths = ['/dashboard/', '/auth/profile/']
+    sync_capable = True
+    async_capable = True
+
+    # Protected pages that redirect home after logout
+    protected_paths = ['/dashboard/', '/auth/profile/']
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if self._is_protected(request) and not request.user.is_authenticated:
+            return redirect('home:index')
+        return self.get_response(request)
 
-        if any(request.path.startswith(path) for path in protected_paths):
-            if not request.user.is_authenticated:
-                return redirect('home:index')
+    async def __acall__(self, request):
+        if self._is_protected(request) and not (await request.auser()).is_authenticated:
+            return redirect('home:index')
+        return await self.get_response(request)
 
-        return None
\ No newline at end of file
+    def _is_protected(self, request):
+        return any(request.path.startswith(path) for path in self.protected_paths)
@@ -1,9 +1,10 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q
+from django.db.models import Count, Q, Sum
 from profiles.models import Profile
 from authentication.models import UserProfile
+from jobs.models import JobStats
 
 
 def home_page(request):
@@ -25,9 +26,24 @@ def dashboard(request):
         profile = request.user.profile
         visible_fields = profile.get_visible_fields()
 
+    # Pipeline totals across all of a recruiter's jobs, from the per-job counters
+    job_totals = None
+    if hasattr(request.user, 'userprofile') and request.user.userprofile.user_type == 'recruiter':
+        job_totals = JobStats.objects.filter(
+            job__recruiter__user_profile=request.user.userprofile
+        ).aggregate(
+            jobs=Count('job'),
+            applications=Sum('total_applications'),
+            in_review=Sum('review_count'),
+            interviews=Sum('interview_count'),
+            offers=Sum('offer_count'),
+            unread_messages=Sum('unread_messages'),
+        )
+
     context = {
         'profile': profile,
-        'visible_fields': visible_fields
+        'visible_fields': visible_fields,
+        'job_totals': job_totals
     }
     return render(request, 'home/dashboard.html', context)
 
@@ -0,0 +1,127 @@
+"""
+Read-replica routing with read-your-writes stickiness.
+
+When ``settings.DATABASES`` has a replica (``settings.REPLICA_DATABASE_ALIAS``),
+``ReplicaRoutingMiddleware`` lets the reads of GET and HEAD requests go to it;
+everything else, and all writes, use ``default``. A request falls back to the
+primary for the rest of its reads as soon as it writes anything (or opens a
+transaction), and the response pins that client to the primary for
+``settings.REPLICA_PIN_SECONDS`` with a cookie, so nobody reads a replica
+that has not caught up with their own change yet.
+
+Outside a request (management commands, the shell, tests) everything uses
+``default``.
+"""
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'db_primary_pin'
+
+_request_state = ContextVar('dbrouter_request_state', default=None)
+
+
+class _RequestState:
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.wrote = False
+
+
+def replica_alias():
+    """Alias of the configured replica, or None if there is none"""
+    alias = getattr(settings, 'REPLICA_DATABASE_ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+# Django's database cache table lives on the primary only, and writing to
+# it is bookkeeping rather than a user's change
+PRIMARY_ONLY_APPS = {'django_cache'}
+
+
+class ReplicaRouter:
+    """Database router sending a request's reads to the replica when it is safe to"""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return DEFAULT_DB_ALIAS
+        state = _request_state.get()
+        alias = replica_alias()
+        if (
+            state is None
+            or alias is None
+            or not state.use_replica
+            or state.wrote
+            # Reads inside a transaction must see that transaction's writes
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            state.wrote = True
+        # Explicit, so saving an object that was read from the replica still writes to the primary
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica is a copy of the primary, so objects from either can be related
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == replica_alias():
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Marks which requests may read from the replica and pins clients that wrote
+    to the primary. Put it near the top of MIDDLEWARE so that writes made by
+    other middleware (sessions, last_login) count too.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self._finish(state, response)
+
+    async def __acall__(self, request):
+        # The ORM's worker threads run in a copy of this context, and share the state object
+        state, token = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self._finish(state, response)
+
+    def _start(self, request):
+        state = _RequestState(
+            use_replica=request.method in ('GET', 'HEAD') and PIN_COOKIE not in request.COOKIES
+        )
+        return state, _request_state.set(state)
+
+    def _finish(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 10),
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
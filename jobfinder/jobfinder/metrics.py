@@ -0,0 +1,434 @@
+"""
+In-process metrics with a Prometheus text endpoint.
+
+``registry`` holds counters and fixed-bucket histograms, optionally with
+labels. Updates are thread-safe. Each process periodically (every
+``settings.METRICS_FLUSH_INTERVAL`` seconds, and when asked to) writes a
+snapshot of its metrics to ``settings.METRICS_DIR`` as
+``metrics-process-<host>-<pid>-<start>.json``; the ``/metrics`` endpoint sums
+every snapshot in the directory, so all web workers and management commands
+are reported together. When it finds a snapshot of a process of this host
+that has exited, it adds it to ``metrics-retained.json`` and deletes it, so
+counters never go backwards and the directory does not grow with every
+restart. One-shot management commands call ``flush(job=<name>)`` when they
+finish instead, which adds their numbers to ``metrics-job-<name>.json``.
+Clear the directory on deploy to start from zero.
+
+``MetricsMiddleware`` records, per resolved URL name, request counts by
+method and status, a latency histogram and a histogram of SQL queries per
+request. Histograms declared with ``quantiles`` also get estimated quantile
+gauges (p50, p99, ...) interpolated from their buckets, the same way
+Prometheus' ``histogram_quantile`` does.
+
+Example::
+
+    SENT = metrics.registry.counter('jobfinder_emails_sent_total', 'Emails sent', ['kind'])
+    SENT.inc(kind='digest')
+"""
+import json
+import math
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: snapshots of exited processes are kept as they are
+    fcntl = None
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from . import queryhooks
+from .ratelimit import get_client_ip
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.samples = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} takes labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def metadata(self):
+        return {'type': self.type, 'help': self.documentation, 'labelnames': list(self.labelnames)}
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.samples[key] = self.samples.get(key, 0) + amount
+        self.registry.maybe_flush()
+
+    def snapshot(self):
+        return dict(self.metadata(), samples=[[list(key), value] for key, value in self.samples.items()])
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, quantiles=()):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.quantiles = tuple(quantiles)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            # Per-bucket (not cumulative) counts, with a final slot for +Inf, then the sum
+            counts, total = self.samples.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+            counts[index] += 1
+            self.samples[key] = (counts, total + value)
+        self.registry.maybe_flush()
+
+    def metadata(self):
+        return dict(super().metadata(), buckets=list(self.buckets), quantiles=list(self.quantiles))
+
+    def snapshot(self):
+        return dict(self.metadata(), samples=[
+            [list(key), list(counts), total] for key, (counts, total) in self.samples.items()
+        ])
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self._last_flush = time.monotonic()
+        self._pid = self._started = None
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(self, name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f'{name} is already registered as a {metric.type}')
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, quantiles=()):
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets, quantiles)
+
+    def snapshot(self):
+        with self.lock:
+            return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    def _directory(self):
+        return getattr(settings, 'METRICS_DIR', None)
+
+    def _path(self, directory):
+        # The start time tells apart processes that reuse a pid
+        if self._pid != os.getpid():
+            self._pid, self._started = os.getpid(), time.time_ns()
+        return os.path.join(directory, f'metrics-process-{_HOST}-{self._pid}-{self._started:x}.json')
+
+    def flush(self, job=None):
+        """
+        Write this process' snapshot to METRICS_DIR (no-op without one). With
+        ``job``, add it to that job's retained totals instead and start over
+        from zero; one-shot commands do this when they finish.
+        """
+        directory = self._directory()
+        self._last_flush = time.monotonic()
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        if job is None:
+            _write_json(self._path(directory), self.snapshot())
+            return
+
+        with self.lock:
+            snapshot = {name: metric.snapshot() for name, metric in self.metrics.items()}
+            for metric in self.metrics.values():
+                metric.samples.clear()
+        with _directory_lock(directory):
+            _add_to(os.path.join(directory, f'metrics-job-{job}.json'), [snapshot])
+            _remove(self._path(directory))
+
+    def maybe_flush(self):
+        if time.monotonic() - self._last_flush >= getattr(settings, 'METRICS_FLUSH_INTERVAL', 10):
+            self.flush()
+
+    def collect(self):
+        """Snapshots of every process merged into one, this process' taken live"""
+        snapshots = [self.snapshot()]
+        directory = self._directory()
+        if directory and os.path.isdir(directory):
+            own = os.path.basename(self._path(directory))
+            # Locked so no snapshot is read both before and after being retained
+            with _directory_lock(directory):
+                self._retain_exited(directory)
+                for filename in os.listdir(directory):
+                    if filename == own or not (filename.startswith('metrics-') and filename.endswith('.json')):
+                        continue
+                    snapshot = _read_json(os.path.join(directory, filename))
+                    if snapshot is not None:
+                        snapshots.append(snapshot)
+        return merge_snapshots(snapshots)
+
+    def _retain_exited(self, directory):
+        """Fold snapshots of this host's exited processes into metrics-retained.json (lock held)"""
+        if fcntl is None:
+            return
+        prefix = f'metrics-process-{_HOST}-'
+        paths = [
+            os.path.join(directory, filename) for filename in os.listdir(directory)
+            if filename.startswith(prefix) and filename.endswith('.json')
+            and not _is_running(filename[len(prefix):-len('.json')].split('-')[0])
+        ]
+        snapshots = [snapshot for snapshot in map(_read_json, paths) if snapshot is not None]
+        if snapshots:
+            _add_to(os.path.join(directory, 'metrics-retained.json'), snapshots)
+        for path in paths:
+            _remove(path)
+
+
+_HOST = socket.gethostname().replace('-', '_')
+
+
+def _is_running(pid):
+    try:
+        os.kill(int(pid), 0)
+    except ValueError:
+        return True  # Not a pid: leave the file alone
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Someone else's process
+    return True
+
+
+@contextmanager
+def _directory_lock(directory):
+    """Serialize read-modify-write of the shared snapshot files (best effort without fcntl)"""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(directory, '.lock'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # Removed or half-written by its process; it is picked up next time
+        return None
+
+
+def _write_json(path, data):
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary, 'w') as f:
+        json.dump(data, f)
+    os.replace(temporary, path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _add_to(path, snapshots):
+    """Add ``snapshots`` to the snapshot stored at ``path`` (call with the directory lock held)"""
+    existing = _read_json(path)
+    merged = merge_snapshots(([existing] if existing else []) + snapshots)
+    _write_json(path, {
+        name: dict(metric, samples=[
+            [list(key), value] if metric['type'] == 'counter' else [list(key), value[0], value[1]]
+            for key, value in metric['samples'].items()
+        ])
+        for name, metric in merged.items()
+    })
+
+
+def merge_snapshots(snapshots):
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, dict(metric, samples={}))
+            for sample in metric['samples']:
+                key = tuple(sample[0])
+                if metric['type'] == 'counter':
+                    target['samples'][key] = target['samples'].get(key, 0) + sample[1]
+                elif metric['buckets'] == target['buckets']:
+                    counts, total = target['samples'].get(key) or ([0] * len(sample[1]), 0.0)
+                    target['samples'][key] = ([a + b for a, b in zip(counts, sample[1])], total + sample[2])
+    return merged
+
+
+def histogram_quantile(quantile, buckets, counts):
+    """Estimate of ``quantile`` from per-bucket counts, interpolating linearly inside the bucket"""
+    observations = sum(counts)
+    if not observations:
+        return math.nan
+    rank = quantile * observations
+    cumulative = 0
+    for index, count in enumerate(counts):
+        if cumulative + count >= rank and count:
+            if index == len(buckets):
+                # Past the last finite bucket: the best estimate is its upper bound
+                return buckets[-1]
+            lower = buckets[index - 1] if index else 0.0
+            return lower + (buckets[index] - lower) * (rank - cumulative) / count
+        cumulative += count
+    return buckets[-1]
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, **extra):
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if isinstance(value, float) and math.isnan(value):
+        return 'NaN'
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(metrics):
+    """Prometheus text exposition format of merged snapshots"""
+    lines = []
+    for name in sorted(metrics):
+        metric = metrics[name]
+        names = metric['labelnames']
+        lines.append(f'# HELP {name} {metric["help"]}')
+        lines.append(f'# TYPE {name} {metric["type"]}')
+        if metric['type'] == 'counter':
+            for key, value in sorted(metric['samples'].items()):
+                lines.append(f'{name}{_labels(names, key)} {_number(value)}')
+            continue
+
+        bounds = metric['buckets']
+        for key, (counts, total) in sorted(metric['samples'].items()):
+            cumulative = 0
+            for bound, count in zip(bounds + [math.inf], counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(names, key, le=_number(float(bound)))} {cumulative}')
+            lines.append(f'{name}_sum{_labels(names, key)} {_number(float(total))}')
+            lines.append(f'{name}_count{_labels(names, key)} {cumulative}')
+
+        if metric['quantiles'] and metric['samples']:
+            lines.append(f'# HELP {name}_quantile Estimated from the {name} buckets')
+            lines.append(f'# TYPE {name}_quantile gauge')
+            for key, (counts, _) in sorted(metric['samples'].items()):
+                for quantile in metric['quantiles']:
+                    value = histogram_quantile(quantile, bounds, counts)
+                    lines.append(f'{name}_quantile{_labels(names, key, quantile=quantile)} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUESTS = registry.counter(
+    'jobfinder_http_requests_total', 'HTTP requests by URL name, method and status',
+    ['view', 'method', 'status'],
+)
+REQUEST_DURATION = registry.histogram(
+    'jobfinder_http_request_duration_seconds', 'Time to produce a response, by URL name',
+    ['view'], buckets=LATENCY_BUCKETS, quantiles=(0.5, 0.9, 0.99),
+)
+REQUEST_QUERIES = registry.histogram(
+    'jobfinder_http_request_db_queries', 'SQL queries per request, by URL name',
+    ['view'], buckets=QUERY_COUNT_BUCKETS,
+)
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """Records request count, latency and query count per resolved URL name"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        queryhooks.install()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return self.get_response(request)
+
+        queries = _QueryCounter()
+        started = time.perf_counter()
+        with queryhooks.observe_queries(queries):
+            response = self.get_response(request)
+        self._record(request, response, time.perf_counter() - started, queries.count)
+        return response
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return await self.get_response(request)
+
+        queries = _QueryCounter()
+        started = time.perf_counter()
+        with queryhooks.observe_queries(queries):
+            response = await self.get_response(request)
+        self._record(request, response, time.perf_counter() - started, queries.count)
+        return response
+
+    def _record(self, request, response, duration, query_count):
+        # Unresolved paths share one label so 404 scans cannot grow the label set
+        view = request.resolver_match.view_name if request.resolver_match else '<unresolved>'
+        REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        REQUEST_DURATION.observe(duration, view=view)
+        REQUEST_QUERIES.observe(query_count, view=view)
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; staff users and METRICS_ALLOWED_IPS only"""
+    allowed_ips = getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+    if not (request.user.is_authenticated and request.user.is_staff) and get_client_ip(request) not in allowed_ips:
+        return HttpResponseForbidden('Forbidden')
+    registry.flush()
+    response = HttpResponse(render(registry.collect()), content_type=CONTENT_TYPE)
+    response['Cache-Control'] = 'no-store'
+    return response
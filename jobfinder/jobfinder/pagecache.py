@@ -0,0 +1,124 @@
+"""
+Whole-response caching of public pages for anonymous visitors.
+
+Views opt in with ``@cache_anonymous_page('<namespace>')``. Responses are
+cached under the request path and its normalized GET parameters, plus the
+namespace's current *generation*. Writes bump the generation (see
+``bump_generation``), which orphans every page cached under the old one,
+so nothing has to be deleted and no stale page is ever served after a write.
+
+Logged-in users, non-GET requests and requests with pending flash
+messages always bypass the cache.
+"""
+import hashlib
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import caches
+
+# Query parameters that never change what a page shows
+IGNORED_PARAMS = {'fbclid', 'gclid', 'ref'}
+
+
+def _cache():
+    return caches[getattr(settings, 'PAGE_CACHE_ALIAS', 'default')]
+
+
+def _generation_key(namespace):
+    return f'pagecache:generation:{namespace}'
+
+
+def get_generation(namespace):
+    """
+    Current generation of ``namespace``. A missing counter (first use, or
+    evicted) restarts from the current time in milliseconds, so it can never
+    go back to a generation that cached pages were stored under.
+    """
+    cache = _cache()
+    key = _generation_key(namespace)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, int(time.time() * 1000), None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(namespace):
+    """Invalidate every cached page of ``namespace``"""
+    cache = _cache()
+    key = _generation_key(namespace)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Not set yet: starting it now is already newer than anything cached
+        get_generation(namespace)
+
+
+def normalized_query(request):
+    """
+    GET parameters in sorted order, without empty values or tracking
+    parameters (the cached views treat an empty filter like a missing one)
+    """
+    params = sorted(
+        (key, value)
+        for key, values in request.GET.lists()
+        if key not in IGNORED_PARAMS and not key.startswith('utm_')
+        for value in values
+        if value
+    )
+    return urlencode(params)
+
+
+def page_cache_key(request, namespace):
+    raw = f'{request.get_host()}{request.path}?{normalized_query(request)}'
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return f'pagecache:page:{namespace}:{get_generation(namespace)}:{digest}'
+
+
+def _is_cacheable_request(request):
+    if not getattr(settings, 'PAGE_CACHE_ENABLED', True):
+        return False
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.user.is_authenticated:
+        return False
+    # A cached page would drop the visitor's flash messages (or show them to others)
+    return len(messages.get_messages(request)) == 0
+
+
+def _is_cacheable_response(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        and 'private' not in response.get('Cache-Control', '')
+    )
+
+
+def cache_anonymous_page(namespace, timeout=None):
+    """Serve anonymous GETs of the decorated view from the page cache"""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not _is_cacheable_request(request):
+                return view_func(request, *args, **kwargs)
+
+            cache = _cache()
+            key = page_cache_key(request, namespace)
+            response = cache.get(key)
+            if response is not None:
+                return response
+
+            response = view_func(request, *args, **kwargs)
+            if _is_cacheable_response(request, response):
+                cache.set(
+                    key, response,
+                    timeout if timeout is not None else getattr(settings, 'PAGE_CACHE_TIMEOUT', 600)
+                )
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,180 @@
+"""
+Per-request SQL query budgets and N+1 detection (opt-in).
+
+With ``settings.QUERY_INSPECTOR_ENABLED`` on, ``QueryInspectorMiddleware``
+records every query a request runs, on every database connection. Queries are
+grouped by their normalized SQL (literals and ``IN`` lists replaced by ``?``)
+and by the line of project code that triggered them, so a loop issuing the
+same query once per row shows up as one group with a high count:
+
+* groups run at least ``QUERY_REPEAT_THRESHOLD`` times are reported as likely
+  N+1 patterns
+* ``QUERY_BUDGETS`` caps the number of queries per view name, falling back to
+  ``QUERY_BUDGET_DEFAULT`` (None for no cap)
+* ``QUERY_BUDGET_ACTION`` decides what happens when either is hit: ``'log'``
+  writes a warning to the ``jobfinder.querybudget`` logger, ``'raise'``
+  raises ``QueryBudgetExceeded`` (for tests and CI)
+
+Queries from async views run in worker threads, away from the view's frames,
+so their call site is reported as ``unknown (async)``; they are still
+grouped by SQL.
+
+Every inspected response carries an ``X-Query-Summary`` header, e.g.
+``queries=14; time=6.2ms; repeated=1; budget=20``.
+
+Example::
+
+    QUERY_INSPECTOR_ENABLED = True
+    QUERY_BUDGETS = {'jobs:job_list': 10, 'jobs:application_pipeline': 25}
+"""
+import logging
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+import asgiref
+import django
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import queryhooks
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_HEADER = 'X-Query-Summary'
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\bIN \((?:\?|%s)(?:, ?(?:\?|%s))*\)', re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Frames from Django and the standard library are never reported as a query's call site
+_LIBRARY_DIRS = (
+    os.path.dirname(django.__file__) + os.sep,
+    os.path.dirname(os.__file__) + os.sep,
+)
+_ASGIREF_DIR = os.path.dirname(asgiref.__file__) + os.sep
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def normalize_sql(sql):
+    """SQL with literals and parameter lists collapsed, so per-row variants compare equal"""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _WHITESPACE_RE.sub(' ', sql).strip()
+
+
+def call_site():
+    """``file:line in function`` of the innermost project frame on the stack"""
+    base_dir = str(settings.BASE_DIR) + os.sep
+    frame = sys._getframe(1)
+    # Other query observers sit between the query and this one; start outside the hook dispatcher
+    dispatcher = frame
+    while dispatcher is not None and dispatcher.f_code.co_filename != queryhooks.__file__:
+        dispatcher = dispatcher.f_back
+    if dispatcher is not None:
+        frame = dispatcher.f_back
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_ASGIREF_DIR):
+            # Run for async code, whose frames are on no thread's stack
+            return 'unknown (async)'
+        if filename != __file__ and not filename.startswith(_LIBRARY_DIRS) and 'site-packages' not in filename:
+            if filename.startswith(base_dir):
+                filename = filename[len(base_dir):]
+            return f'{filename}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return 'unknown'
+
+
+class QueryRecorder:
+    """``execute_wrapper`` that records each query's normalized SQL, call site and duration"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((
+                normalize_sql(sql),
+                call_site(),
+                time.perf_counter() - started,
+            ))
+
+    @property
+    def total_time(self):
+        return sum(duration for _, _, duration in self.queries)
+
+    def repeated(self, threshold):
+        """``((sql, call_site), count)`` of groups run at least ``threshold`` times, most frequent first"""
+        groups = Counter((sql, site) for sql, site, _ in self.queries)
+        return [(group, count) for group, count in groups.most_common() if count >= threshold]
+
+
+class QueryInspectorMiddleware:
+    """Records the queries of each request and enforces the configured budgets"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        queryhooks.install()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not getattr(settings, 'QUERY_INSPECTOR_ENABLED', False):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        with queryhooks.observe_queries(recorder):
+            response = self.get_response(request)
+        return self._inspect(request, response, recorder)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'QUERY_INSPECTOR_ENABLED', False):
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        with queryhooks.observe_queries(recorder):
+            response = await self.get_response(request)
+        return self._inspect(request, response, recorder)
+
+    def _inspect(self, request, response, recorder):
+        view_name = request.resolver_match.view_name if request.resolver_match else request.path
+        budget = getattr(settings, 'QUERY_BUDGETS', {}).get(
+            view_name, getattr(settings, 'QUERY_BUDGET_DEFAULT', None)
+        )
+        repeated = recorder.repeated(getattr(settings, 'QUERY_REPEAT_THRESHOLD', 10))
+
+        response[SUMMARY_HEADER] = (
+            f'queries={len(recorder.queries)}; time={recorder.total_time * 1000:.1f}ms; '
+            f'repeated={len(repeated)}; budget={budget if budget is not None else "none"}'
+        )
+
+        problems = []
+        if budget is not None and len(recorder.queries) > budget:
+            problems.append(f'{len(recorder.queries)} queries, over the budget of {budget}')
+        for (sql, site), count in repeated:
+            problems.append(f'{count}x at {site}: {sql[:200]}')
+        if problems:
+            self._report(view_name, problems)
+        return response
+
+    def _report(self, view_name, problems):
+        message = f'Query problems in {view_name}:\n  ' + '\n  '.join(problems)
+        if getattr(settings, 'QUERY_BUDGET_ACTION', 'log') == 'raise':
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
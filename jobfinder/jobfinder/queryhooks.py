@@ -0,0 +1,55 @@
+"""
+Per-request query observers that work under both WSGI and ASGI.
+
+``connection.execute_wrapper()`` only wraps the current thread's connection,
+but the async ORM runs queries in worker threads with connections of their
+own, shared by every request the thread serves. Instead, ``install()`` puts
+one dispatcher on every connection as it is created, and the dispatcher calls
+the observers registered with ``observe_queries()`` in the current context,
+which worker threads inherit from the request that called them.
+
+Observers have the ``execute_wrapper`` signature::
+
+    def observer(execute, sql, params, many, context):
+        return execute(sql, params, many, context)
+
+    with queryhooks.observe_queries(observer):
+        response = get_response(request)
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_observers = ContextVar('query_observers', default=())
+
+
+def _dispatch(execute, sql, params, many, context):
+    observers = _observers.get()
+    for observer in reversed(observers):
+        execute = partial(observer, execute)
+    return execute(sql, params, many, context)
+
+
+def _install(sender=None, connection=None, **kwargs):
+    if _dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_dispatch)
+
+
+def install():
+    """Hook every connection opened from now on, and this thread's current ones (idempotent)"""
+    connection_created.connect(_install, dispatch_uid='jobfinder.queryhooks')
+    for connection in connections.all(initialized_only=True):
+        _install(connection=connection)
+
+
+@contextmanager
+def observe_queries(observer):
+    """Call ``observer`` for every query run in this context, in any thread"""
+    token = _observers.set(_observers.get() + (observer,))
+    try:
+        yield
+    finally:
+        _observers.reset(token)
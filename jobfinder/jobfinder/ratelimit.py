@@ -0,0 +1,191 @@
+"""
+Token-bucket rate limiting for views, configured per URL name.
+
+Limits are declared in ``settings.RATE_LIMITS`` keyed by the resolved view
+name (e.g. ``'jobs:ajax_send_message'``). Each client gets its own bucket:
+authenticated users are keyed by user id, anonymous clients by IP address.
+A bucket holds up to ``rate`` tokens and refills at ``rate / per`` tokens per
+second. Requests that find the bucket empty get a 429 with ``Retry-After``.
+Bucket stores implement ``consume`` and, for requests served under ASGI,
+its async twin ``aconsume``.
+
+Example::
+
+    RATE_LIMITS = {
+        'jobs:ajax_send_message': {'rate': 20, 'per': 60, 'methods': ['POST']},
+    }
+"""
+import math
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+from django.utils.module_loading import import_string
+
+
+class InMemoryTokenBucketStore:
+    """Per-process bucket store. Exact, but each worker process keeps its own buckets."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, refill_rate):
+        """
+        Take one token from the bucket at ``key``.
+        Returns ``(allowed, retry_after_seconds)``.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return True, 0
+            self._buckets[key] = (tokens, now)
+            return False, (1 - tokens) / refill_rate
+
+    async def aconsume(self, key, capacity, refill_rate):
+        # No I/O, so there is nothing to await
+        return self.consume(key, capacity, refill_rate)
+
+
+class CacheTokenBucketStore:
+    """
+    Bucket store backed by a Django cache, so limits are shared by every worker
+    using that cache (use a database or file cache across processes). Updates
+    are read-modify-write, so a burst racing across workers may be let through
+    by a token or two.
+    """
+
+    def __init__(self, alias=None):
+        self.cache = caches[alias or getattr(settings, 'RATE_LIMIT_CACHE_ALIAS', 'default')]
+
+    def consume(self, key, capacity, refill_rate):
+        now = time.time()
+        cache_key = f'ratelimit:{key}'
+        bucket = self.cache.get(cache_key, (capacity, now))
+        tokens, result = self._take(bucket, now, capacity, refill_rate)
+        self.cache.set(cache_key, (tokens, now), self._timeout(capacity, refill_rate))
+        return result
+
+    async def aconsume(self, key, capacity, refill_rate):
+        now = time.time()
+        cache_key = f'ratelimit:{key}'
+        bucket = await self.cache.aget(cache_key, (capacity, now))
+        tokens, result = self._take(bucket, now, capacity, refill_rate)
+        await self.cache.aset(cache_key, (tokens, now), self._timeout(capacity, refill_rate))
+        return result
+
+    def _take(self, bucket, now, capacity, refill_rate):
+        """Tokens left after this request, and ``(allowed, retry_after_seconds)``"""
+        tokens, updated = bucket
+        tokens = min(capacity, tokens + max(now - updated, 0) * refill_rate)
+        if tokens >= 1:
+            return tokens - 1, (True, 0)
+        return tokens, (False, (1 - tokens) / refill_rate)
+
+    def _timeout(self, capacity, refill_rate):
+        # Keep the entry just long enough for the bucket to refill completely
+        return math.ceil(capacity / refill_rate) + 1
+
+
+def get_client_ip(request):
+    """Client IP, honouring X-Forwarded-For only when RATE_LIMIT_TRUST_FORWARDED is set"""
+    if getattr(settings, 'RATE_LIMIT_TRUST_FORWARDED', False):
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def get_client_key(request, user=None):
+    if user is None:
+        user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    return f'ip:{get_client_ip(request)}'
+
+
+def rate_limited_response(request, retry_after):
+    """429 response; JSON for AJAX endpoints so the front-end can show the error"""
+    retry_after = max(math.ceil(retry_after), 1)
+    message = 'Too many requests. Please slow down and try again shortly.'
+    if '/ajax/' in request.path or request.content_type == 'application/json':
+        response = JsonResponse({'success': False, 'error': message, 'retry_after': retry_after}, status=429)
+    else:
+        response = HttpResponse(message, status=429, content_type='text/plain')
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+class RateLimitMiddleware:
+    """
+    Applies ``settings.RATE_LIMITS`` to matching views. Must come after
+    AuthenticationMiddleware so buckets can be keyed on the user.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limits = getattr(settings, 'RATE_LIMITS', {})
+        store_path = getattr(settings, 'RATE_LIMIT_STORE', 'jobfinder.ratelimit.CacheTokenBucketStore')
+        self.store = import_string(store_path)()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+            # Django calls process_view in the handler's mode; a sync one would cost a thread hop
+            self.process_view = self._aprocess_view
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        limit = self._limit_for(request)
+        if limit is None:
+            return None
+        key, capacity, refill_rate = self._bucket(request, limit, None)
+        allowed, retry_after = self.store.consume(key, capacity, refill_rate)
+        if allowed:
+            return None
+        return rate_limited_response(request, retry_after)
+
+    async def _aprocess_view(self, request, view_func, view_args, view_kwargs):
+        limit = self._limit_for(request)
+        if limit is None:
+            return None
+        key, capacity, refill_rate = self._bucket(request, limit, await request.auser())
+        allowed, retry_after = await self.store.aconsume(key, capacity, refill_rate)
+        if allowed:
+            return None
+        return rate_limited_response(request, retry_after)
+
+    def _limit_for(self, request):
+        if not getattr(settings, 'RATE_LIMIT_ENABLED', True):
+            return None
+
+        view_name = request.resolver_match.view_name if request.resolver_match else None
+        limit = self.limits.get(view_name)
+        if limit is None:
+            return None
+
+        methods = limit.get('methods')
+        if methods and request.method not in methods:
+            return None
+        return limit
+
+    def _bucket(self, request, limit, user):
+        """``(key, capacity, refill_rate)`` of the client's bucket for the request's view"""
+        capacity = limit['rate']
+        refill_rate = capacity / limit.get('per', 60)
+        key = f'{request.resolver_match.view_name}:{get_client_key(request, user)}'
+        return key, capacity, refill_rate
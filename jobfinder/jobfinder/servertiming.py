@@ -0,0 +1,204 @@
+"""
+Server-Timing instrumentation of each request's phases.
+
+``ServerTimingMiddleware`` measures, per request:
+
+* ``total``: the whole request, from this middleware down and back
+* ``view``: from view dispatch until the response is back, so the view with
+  its queries and rendering, plus the response processing of the middleware
+  listed after this one
+* ``db``: every SQL query on every connection (via ``queryhooks``), with
+  the query count in the description
+* ``tpl``: rendering of Django templates, minus the queries run while
+  rendering (lazy querysets evaluated in the template count as ``db``).
+  Templates are timed by the ``TimedDjangoTemplates`` backend, which the
+  ``TEMPLATES`` setting uses in place of ``DjangoTemplates``.
+
+and logs them as one record per request on the ``jobfinder.servertiming``
+logger. The record's message is logfmt, and the same values are attached as
+``extra`` fields for structured log handlers. Staff users and clients in
+``settings.INTERNAL_IPS`` also get them as a ``Server-Timing`` response
+header, which browser devtools show in the network panel's Timing tab; other
+visitors never see the timings of the server's internals.
+"""
+import logging
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+from . import queryhooks
+from .ratelimit import get_client_ip
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('server_timing', default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.view_started = None
+        self.view = 0.0
+        self.db = 0.0
+        self.db_queries = 0
+        self.template = 0.0
+        self.template_db = 0.0
+        self.template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """``execute_wrapper`` adding each query's duration to the db phase"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.db += elapsed
+            self.db_queries += 1
+            if self.template_depth:
+                self.template_db += elapsed
+
+    def metrics(self, total):
+        """``(name, milliseconds, description)`` of each phase"""
+        return [
+            ('total', total * 1000, None),
+            ('view', self.view * 1000, None),
+            ('db', self.db * 1000, f'{self.db_queries} queries'),
+            ('tpl', max(self.template - self.template_db, 0) * 1000, None),
+        ]
+
+
+class TimedTemplate(Template):
+    """Django template whose renders count towards the current request's ``tpl`` phase"""
+
+    def render(self, context=None, request=None):
+        timings = _current.get()
+        # Nested renders (render_to_string inside a render) are already being timed
+        if timings is None or timings.template_depth:
+            return super().render(context, request)
+        timings.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timings.template += time.perf_counter() - started
+            timings.template_depth -= 1
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """``DjangoTemplates`` backend returning ``TimedTemplate``s"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+def server_timing_header(metrics):
+    entries = []
+    for name, duration, description in metrics:
+        entry = f'{name};dur={duration:.1f}'
+        if description:
+            entry += f';desc="{description}"'
+        entries.append(entry)
+    return ', '.join(entries)
+
+
+class ServerTimingMiddleware:
+    """Logs a timing record for every request, and adds a Server-Timing header for staff and internal IPs"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        queryhooks.install()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+            # Django calls process_view in the handler's mode; a sync one would cost a thread hop
+            self.process_view = self._aprocess_view
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not getattr(settings, 'SERVER_TIMING_ENABLED', True):
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            with queryhooks.observe_queries(timings):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        internal = self._is_internal(request, getattr(request, 'user', None))
+        return self._finish(request, response, timings, started, internal)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'SERVER_TIMING_ENABLED', True):
+            return await self.get_response(request)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            with queryhooks.observe_queries(timings):
+                response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        internal = self._is_internal(request, await request.auser() if hasattr(request, 'auser') else None)
+        return self._finish(request, response, timings, started, internal)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self._view_started()
+        return None
+
+    async def _aprocess_view(self, request, view_func, view_args, view_kwargs):
+        self._view_started()
+        return None
+
+    def _view_started(self):
+        timings = _current.get()
+        if timings is not None:
+            timings.view_started = time.perf_counter()
+
+    def _is_internal(self, request, user):
+        """Whether the client may see the timings: staff users and INTERNAL_IPS"""
+        if get_client_ip(request) in getattr(settings, 'INTERNAL_IPS', ()):
+            return True
+        return user is not None and user.is_staff
+
+    def _finish(self, request, response, timings, started, send_header):
+        finished = time.perf_counter()
+        total = finished - started
+        if timings.view_started is not None:
+            timings.view = finished - timings.view_started
+
+        metrics = timings.metrics(total)
+        if send_header:
+            response['Server-Timing'] = server_timing_header(metrics)
+        self._log(request, response, metrics, timings.db_queries)
+        return response
+
+    def _log(self, request, response, metrics, db_queries):
+        fields = {
+            'view': request.resolver_match.view_name if request.resolver_match else None,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+        }
+        for name, duration, _ in metrics:
+            fields[f'{name}_ms'] = round(duration, 1)
+        fields['db_queries'] = db_queries
+        logger.info(
+            'server_timing ' + ' '.join(f'{key}={value}' for key, value in fields.items()),
+            extra={'server_timing': fields},
+        )
+
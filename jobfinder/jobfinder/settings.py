@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,12 +47,17 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'jobfinder.metrics.MetricsMiddleware',
+    'jobfinder.servertiming.ServerTimingMiddleware',
+    'jobfinder.dbrouter.ReplicaRoutingMiddleware',
+    'jobfinder.querybudget.QueryInspectorMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'authentication.middleware.CacheControlMiddleware',
     'authentication.middleware.LogoutRedirectMiddleware',
+    'jobfinder.ratelimit.RateLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -60,7 +66,8 @@ ROOT_URLCONF = 'jobfinder.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, timing renders for the Server-Timing 'tpl' phase
+        'BACKEND': 'jobfinder.servertiming.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -80,13 +87,166 @@ WSGI_APPLICATION = 'jobfinder.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# Pick a profile with the JOBFINDER_DB environment variable:
+# 'sqlite' is the plain development setup; 'sqlite-production' switches the
+# same file to WAL journaling (readers no longer wait for writers) with the
+# pragmas below and keeps connections open between requests; 'postgres' uses
+# a psycopg 3 connection pool (needs `pip install "psycopg[pool]"`).
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',        # Safe with WAL; fsync at checkpoints instead of every commit
+    'busy_timeout': 5000,           # Milliseconds to wait for a lock before "database is locked"
+    'mmap_size': 128 * 1024 * 1024,
+    'cache_size': -32000,           # Negative means KiB, so about 32 MB of page cache per connection
+    'temp_store': 'MEMORY',
+}
+
+DATABASE_PROFILES = {
+    'sqlite': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    },
+    'sqlite-production': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': '; '.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+            # Take the write lock when a transaction starts, so concurrent writers
+            # queue on busy_timeout instead of failing to upgrade a read lock
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+    'postgres': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('POSTGRES_DB', 'jobfinder'),
+        'USER': os.environ.get('POSTGRES_USER', 'jobfinder'),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+        'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+        'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        # Pooled connections are returned to the pool after each request, so
+        # CONN_MAX_AGE has to stay 0
+        'OPTIONS': {
+            'pool': {
+                'min_size': 2,
+                'max_size': int(os.environ.get('POSTGRES_POOL_SIZE', 10)),
+                'timeout': 10,
+            },
+        },
+    },
+}
+
+DATABASES = {
+    'default': DATABASE_PROFILES[os.environ.get('JOBFINDER_DB', 'sqlite')],
+}
+
+# Read replica (jobfinder/dbrouter.py). Set JOBFINDER_DB_REPLICA to a second
+# SQLite file kept in sync with the primary (`python manage.py sync_replica
+# --interval 5`), or to the replica's host for PostgreSQL, and the reads of
+# GET requests go there. A client that writes reads from the primary for the
+# next REPLICA_PIN_SECONDS, so keep that longer than the replica's lag.
+
+REPLICA_DATABASE_ALIAS = 'replica'
+REPLICA_PIN_SECONDS = 10
+
+if os.environ.get('JOBFINDER_DB_REPLICA'):
+    replica_setting = 'NAME' if DATABASES['default']['ENGINE'].endswith('sqlite3') else 'HOST'
+    DATABASES[REPLICA_DATABASE_ALIAS] = dict(
+        DATABASES['default'],
+        **{replica_setting: os.environ['JOBFINDER_DB_REPLICA']},
+        TEST={'MIRROR': 'default'},
+    )
+
+DATABASE_ROUTERS = ['jobfinder.dbrouter.ReplicaRouter']
+
+
+# Cache
+# Pick a backend with the JOBFINDER_CACHE environment variable. 'locmem' is
+# private to each process; 'file' and 'db' are shared by every worker ('db'
+# needs `python manage.py createcachetable` first).
+#
+# Rendered pages, map tiles and rate-limit buckets each get their own cache,
+# so churn in one cannot evict the others. MAX_ENTRIES bounds each of them;
+# past it the backend culls a third of the entries. The rate-limit cache holds
+# one bucket per client and limited view, and must stay large enough for
+# every active client, or evicted clients get a fresh burst.
+
+CACHE_BACKEND = os.environ.get('JOBFINDER_CACHE', 'locmem')
+
+
+def _cache(name, max_entries):
+    """Settings for the cache ``name`` on the CACHE_BACKEND backend"""
+    suffix = '' if name == 'default' else f'_{name}'
+    backends = {
+        'locmem': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': f'jobfinder{suffix}',
+        },
+        'file': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / f'.cache{suffix}',
+        },
+        'db': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': f'jobfinder_cache{suffix}',
+        },
     }
+    return dict(backends[CACHE_BACKEND], OPTIONS={'MAX_ENTRIES': max_entries})
+
+
+CACHES = {
+    'default': _cache('default', 5000),
+    'pages': _cache('pages', 2000),
+    'tiles': _cache('tiles', 10000),
+    'ratelimit': _cache('ratelimit', 50000),
 }
 
+# Anonymous page cache (jobfinder/pagecache.py)
+
+PAGE_CACHE_ENABLED = True
+PAGE_CACHE_ALIAS = 'pages'
+PAGE_CACHE_TIMEOUT = 600
+
+# Query budgets and N+1 detection (jobfinder/querybudget.py). Off by default;
+# turn it on in development and CI. QUERY_BUDGET_ACTION is 'log' or 'raise'.
+
+QUERY_INSPECTOR_ENABLED = os.environ.get('JOBFINDER_QUERY_INSPECTOR') == '1'
+QUERY_BUDGET_ACTION = 'log'
+QUERY_REPEAT_THRESHOLD = 10
+QUERY_BUDGET_DEFAULT = None
+# Measured with database sessions, on the most expensive path through each
+# view (a job seeker with skills for job_list); jobs.tests.QueryBudgetTests
+# fails when a view goes over.
+QUERY_BUDGETS = {
+    'jobs:job_list': 8,
+    'jobs:job_detail': 9,
+    'jobs:my_jobs': 6,
+    'jobs:application_pipeline': 14,
+    'jobs:ajax_pipeline_changes': 8,
+    'jobs:ajax_conversations': 5,
+    'jobs:ajax_applicant_locations': 6,
+    'jobs:recommended_candidates': 14,
+}
+
+# Per-request timing log records (jobfinder/servertiming.py). The timings
+# are also sent as a Server-Timing header, but only to staff users and to
+# clients in INTERNAL_IPS.
+
+SERVER_TIMING_ENABLED = True
+INTERNAL_IPS = ['127.0.0.1', '::1']
+
+# Metrics (jobfinder/metrics.py), scraped from /metrics by Prometheus. Every
+# process writes its snapshot to METRICS_DIR so the endpoint can report all
+# workers and management commands together; snapshots of exited processes are
+# folded into metrics-retained.json when /metrics is scraped.
+
+METRICS_ENABLED = True
+METRICS_DIR = BASE_DIR / '.metrics'
+METRICS_FLUSH_INTERVAL = 10
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -132,6 +292,69 @@ LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/'
 LOGIN_URL = '/auth/login/'
 
+# Rate limiting (token bucket per view name and per user/IP)
+# 'rate' requests are allowed in a burst, refilling over 'per' seconds.
+
+RATE_LIMIT_ENABLED = True
+RATE_LIMIT_STORE = 'jobfinder.ratelimit.CacheTokenBucketStore'
+RATE_LIMIT_CACHE_ALIAS = 'ratelimit'
+RATE_LIMIT_TRUST_FORWARDED = False
+
+RATE_LIMITS = {
+    'jobs:ajax_send_message': {'rate': 20, 'per': 60, 'methods': ['POST']},
+    'jobs:ajax_update_status': {'rate': 120, 'per': 60, 'methods': ['POST']},
+    'jobs:ajax_batch_update': {'rate': 30, 'per': 60, 'methods': ['POST']},
+    'jobs:ajax_bulk_transition': {'rate': 30, 'per': 60, 'methods': ['POST']},
+    'jobs:ajax_delete_application': {'rate': 60, 'per': 60, 'methods': ['POST']},
+    'jobs:apply_to_job': {'rate': 10, 'per': 60, 'methods': ['POST']},
+    'jobs:ajax_search_messages': {'rate': 30, 'per': 60},
+    'jobs:job_list': {'rate': 120, 'per': 60},
+    'home:search_candidates': {'rate': 30, 'per': 60},
+    'profiles:search_candidates': {'rate': 30, 'per': 60},
+}
+
+# Pipeline board delta sync (jobs.ajax_views.pipeline_changes). Each sync
+# re-sends this many seconds of changes before the client's version, to catch
+# writes that committed after a sync but were stamped before it.
+PIPELINE_SYNC_OVERLAP_SECONDS = 30
+
+# Clustered map tiles (jobs/tiles.py). Tiles are invalidated when points in
+# them change, so the timeout only bounds staleness from bulk writes.
+
+MAP_TILE_CACHE_ALIAS = 'tiles'
+MAP_TILE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Admin CSV exports (jobfinder/csvexport.py): rows fetched per query, and
+# whether to gzip the stream for clients that accept it.
+
+CSV_EXPORT_CHUNK_SIZE = 2000
+CSV_EXPORT_GZIP = True
+
+# Offline geocoder (jobs/geocoder.py): path to a gazetteer TSV in the same
+# format as the bundled jobs/data/gazetteer.tsv, or None to use the bundled one.
+
+GEOCODER_DATASET = None
+
+# Logging. The 'jobfinder' loggers (query budgets, server timing) log to the
+# console at JOBFINDER_LOG_LEVEL; set it to INFO to see a server_timing record
+# for every request.
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'jobfinder': {
+            'handlers': ['console'],
+            'level': os.environ.get('JOBFINDER_LOG_LEVEL', 'WARNING'),
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -18,12 +18,15 @@ from django.contrib import admin
 from django.urls import path, include
 from django.shortcuts import render
 
+from .metrics import metrics_view
+
 def home(request):
     return render(request, 'home.html')
 
 urlpatterns = [
     path('alternatehome', home, name='home'),
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('accounts/', include('accounts.urls', namespace='accounts')),
     path('profiles/', include('profiles.urls', namespace='profiles')),
     path('', include('home.urls')),
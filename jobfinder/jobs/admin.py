@@ -1,137 +1,43 @@
-import csv
 from django.contrib import admin
-from django.http import HttpResponse
-from .models import Job, JobApplication, Message
-
-def export_profiles_csv(modeladmin, request, queryset):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename=profiles_export.csv'
-    writer = csv.writer(response)
-
-    writer.writerow([
-        'id', 'username', 'email', 'first_name', 'last_name',
-        'headline', 'location', 'skills', 'links', 'created_at'
-    ])
-
-    for obj in queryset.select_related('user'):
-        writer.writerow([
-            obj.id,
-            obj.user.username if obj.user else '',
-            obj.user.email if obj.user else '',
-            getattr(obj.user, 'first_name', ''),
-            getattr(obj.user, 'last_name', ''),
-            getattr(obj, 'headline', ''),
-            getattr(obj, 'location', ''),
-            getattr(obj, 'skills', ''),
-            getattr(obj, 'links', ''),
-            getattr(obj, 'created_at', ''),
-        ])
-
-    return response
-export_profiles_csv.short_description = "Export selected profiles to CSV"
-
-
-def export_savedsearches_csv(modeladmin, request, queryset):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename=savedsearches_export.csv'
-    writer = csv.writer(response)
-
-    writer.writerow([
-        'id', 'name', 'recruiter_username', 'query', 'notification_enabled', 'created_at'
-    ])
-
-    for obj in queryset.select_related('recruiter__user'):
-        recruiter_name = obj.recruiter.user.username if getattr(obj, 'recruiter', None) and getattr(obj.recruiter, 'user', None) else ''
-        writer.writerow([
-            obj.id,
-            getattr(obj, 'name', ''),
-            recruiter_name,
-            getattr(obj, 'query', ''),
-            getattr(obj, 'notification_enabled', False),
-            getattr(obj, 'created_at', ''),
-        ])
-
-    return response
-export_savedsearches_csv.short_description = "Export selected saved searches to CSV"
-
+from django.utils import timezone
+from jobfinder import csvexport
+from .models import ApplicationStatusEvent, Job, JobApplication, JobStats, Message, MessageReadState
 
 
 def export_jobs_csv(modeladmin, request, queryset):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename=jobs_export.csv'
-    writer = csv.writer(response)
-    writer.writerow([
+    columns = [
         'id', 'title', 'company', 'location', 'work_type',
         'experience_level', 'visa_sponsorship', 'skills_required',
         'is_active', 'created_at', 'updated_at'
-    ])
-    for obj in queryset:
-        writer.writerow([
-            obj.id,
-            getattr(obj, 'title', ''),
-            getattr(obj, 'company', ''),
-            getattr(obj, 'location', ''),
-            getattr(obj, 'work_type', ''),
-            getattr(obj, 'experience_level', ''),
-            getattr(obj, 'visa_sponsorship', ''),
-            getattr(obj, 'skills_required', ''),
-            getattr(obj, 'is_active', ''),
-            getattr(obj, 'created_at', ''),
-            getattr(obj, 'updated_at', ''),
-        ])
-    return response
+    ]
+    return csvexport.csv_response(request, 'jobs_export.csv', columns, csvexport.rows(queryset, *columns))
 export_jobs_csv.short_description = "Export selected jobs to CSV"
 
 
 def export_jobapplications_csv(modeladmin, request, queryset):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename=jobapplications_export.csv'
-    writer = csv.writer(response)
-    writer.writerow([
+    header = [
         'id', 'applicant_username', 'applicant_email', 'job_id', 'job_title',
         'status', 'notified', 'applied_at', 'updated_at', 'resume'
-    ])
-    for obj in queryset.select_related('job', 'applicant'):
-        applicant_username = getattr(obj.applicant, 'username', '') if getattr(obj, 'applicant', None) else ''
-        applicant_email = getattr(obj.applicant, 'email', '') if getattr(obj, 'applicant', None) else ''
-        writer.writerow([
-            obj.id,
-            applicant_username,
-            applicant_email,
-            getattr(obj.job, 'id', ''),
-            getattr(obj.job, 'title', ''),
-            getattr(obj, 'status', ''),
-            getattr(obj, 'notified', False),
-            getattr(obj, 'applied_at', ''),
-            getattr(obj, 'updated_at', ''),
-            getattr(obj, 'resume', ''),
-        ])
-    return response
+    ]
+    rows = csvexport.rows(
+        queryset, 'id', 'applicant__username', 'applicant__email', 'job_id', 'job__title',
+        'status', 'notified', 'applied_at', 'updated_at'
+    )
+    # Applications carry no resume; the column is kept for existing spreadsheets
+    rows = (row + ('',) for row in rows)
+    return csvexport.csv_response(request, 'jobapplications_export.csv', header, rows)
 export_jobapplications_csv.short_description = "Export selected job applications to CSV"
 
 
 def export_messages_csv(modeladmin, request, queryset):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename=messages_export.csv'
-    writer = csv.writer(response)
-    writer.writerow([
-        'id', 'sender_username', 'application_id', 'application_applicant', 'is_read', 'content', 'created_at'
-    ])
-    for obj in queryset.select_related('sender', 'application', 'application__applicant'):
-        sender_username = getattr(obj.sender, 'username', '') if getattr(obj, 'sender', None) else ''
-        app_id = getattr(obj.application, 'id', '')
-        app_applicant = getattr(getattr(obj.application, 'applicant', None), 'username', '')
-        writer.writerow([
-            obj.id,
-            sender_username,
-            app_id,
-            app_applicant,
-
-            getattr(obj, 'is_read', False),
-            getattr(obj, 'content', ''),
-            getattr(obj, 'created_at', ''),
-        ])
-    return response
+    header = [
+        'id', 'sender_username', 'application_id', 'application_applicant', 'content', 'created_at'
+    ]
+    rows = csvexport.rows(
+        queryset, 'id', 'sender__username', 'application_id', 'application__applicant__username',
+        'content', 'created_at'
+    )
+    return csvexport.csv_response(request, 'messages_export.csv', header, rows)
 export_messages_csv.short_description = "Export selected messages to CSV"
 
 
@@ -153,11 +59,56 @@ class JobApplicationAdmin(admin.ModelAdmin):
     readonly_fields = ['applied_at', 'updated_at', 'status_updated_at']
     actions = [ export_jobapplications_csv ]
 
+    def save_model(self, request, obj, form, change):
+        old_status = form.initial.get('status', '') if change else ''
+        status_changed = change and 'status' in form.changed_data
+        if status_changed:
+            obj.status_updated_at = timezone.now()
+        if change:
+            # Invalidate versions held by open pipeline boards
+            obj.version += 1
+        super().save_model(request, obj, form, change)
+        # New applications get their first event from the post_save signal
+        if status_changed:
+            ApplicationStatusEvent.record(
+                [(obj.pk, obj.job_id, old_status, obj.status)],
+                changed_by=request.user, at=obj.status_updated_at
+            )
+
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
-    list_display = ['sender', 'application', 'is_read', 'created_at']
-    list_filter = ['is_read', 'created_at']
+    list_display = ['sender', 'application', 'created_at']
+    list_filter = ['created_at']
     search_fields = ['sender__username', 'content']
     ordering = ['-created_at']
     readonly_fields = ['created_at']
     actions = [ export_messages_csv ]
+
+@admin.register(MessageReadState)
+class MessageReadStateAdmin(admin.ModelAdmin):
+    list_display = ['user', 'application', 'last_read_message_id', 'updated_at']
+    search_fields = ['user__username', 'application__job__title']
+    readonly_fields = ['updated_at']
+
+@admin.register(ApplicationStatusEvent)
+class ApplicationStatusEventAdmin(admin.ModelAdmin):
+    list_display = ['application', 'from_status', 'to_status', 'changed_by', 'created_at']
+    list_filter = ['to_status', 'created_at']
+    search_fields = ['application__applicant__username', 'job__title']
+    ordering = ['-created_at']
+    readonly_fields = ['application', 'job', 'from_status', 'to_status', 'changed_by', 'created_at']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(JobStats)
+class JobStatsAdmin(admin.ModelAdmin):
+    list_display = ['job', 'total_applications', 'applied_count', 'review_count', 'interview_count',
+                    'offer_count', 'closed_count', 'rejected_count', 'unread_messages', 'last_application_at']
+    search_fields = ['job__title', 'job__company']
+    list_select_related = ['job']
+    readonly_fields = ['updated_at']
@@ -1,28 +1,129 @@
 """
 AJAX and API views for job application management
+
+The endpoints the chat widget and applicant map poll (unread count,
+conversations, messages, applicant locations) are async views, so under ASGI
+they are served on the event loop with the async ORM.
 """
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
-from django.shortcuts import get_object_or_404
+from django.shortcuts import aget_object_or_404, get_object_or_404
 from django.utils import timezone
+from django.db import transaction
+from django.db.models import Case, F, Max, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, NullIf
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
+from django.utils.dateparse import parse_datetime
 from authentication.models import UserProfile, RecruiterProfile
-from profiles.models import Profile
-from .models import Job, JobApplication, Message
+from .models import (
+    ApplicationStatusEvent, ApplicationTombstone, Job, JobApplication, JobStats, Message, MessageReadState,
+    unread_count_for
+)
+from . import analytics, geo, geocoder, pipeline, search, serializers, tiles
 import json
+import math
+
+
+MESSAGE_SEARCH_PAGE_SIZE = 20
+MAP_TILE_MAX_AGE = 60
+BULK_TRANSITION_LIMIT = 1000
+LOCATION_AUTOCOMPLETE_LIMIT = 10
+LOCATION_AUTOCOMPLETE_MAX_AGE = 3600
+
+# Output key -> values() column for the serialized message and conversation lists
+MESSAGE_FIELDS = {
+    'id': 'id',
+    'sender': 'sender_name',
+    'sender_id': 'sender_id',
+    'content': 'content',
+    'created_at': 'created_at',
+    'is_read': 'is_read',
+    'is_own': 'is_own',
+}
+
+CONVERSATION_FIELDS = {
+    'application_id': 'id',
+    'job_title': 'job__title',
+    'other_party': 'other_party',
+    'last_message': 'last_message',
+    'last_message_time': 'last_message_time',
+    'unread_count': 'unread_count',
+}
+
+SEARCH_RESULT_FIELDS = {
+    'message_id': 'id',
+    'application_id': 'application_id',
+    'job_title': 'application__job__title',
+    'sender': 'sender_name',
+    'is_own': 'is_own',
+    'created_at': 'created_at',
+    'highlight': 'highlight',
+}
+
+# Output key -> values() column for the applicant map feed
+LOCATION_FIELDS = {
+    'id': 'id',
+    'lat': 'lat',
+    'lng': 'lng',
+    'name': 'name',
+    'location': 'location_label',
+    'status': 'status',
+    'applied_at': 'applied_at',
+}
+
+CLUSTER_FIELDS = {
+    'lat': 'lat',
+    'lng': 'lng',
+    'count': 'count',
+}
+
+
+def _conflict_response(application_id):
+    """409 carrying the application's current state, for clients holding a stale version"""
+    current = JobApplication.objects.filter(id=application_id).values(
+        'id', 'status', 'notified', 'notified_status', 'status_updated_at', 'version'
+    ).first()
+    return JsonResponse({
+        'success': False,
+        'conflict': True,
+        'error': 'This application was changed by someone else since you loaded it.',
+        'current': current
+    }, status=409)
+
+
+def _parse_version(value):
+    """Client-supplied version, or None when the client did not send one"""
+    if value is None:
+        return None
+    return int(value)
 
 
 @login_required
 @require_POST
 def update_application_status(request):
-    """AJAX endpoint to update a single application status"""
+    """
+    AJAX endpoint to update a single application status.
+    
+    The write is a conditional ``UPDATE ... WHERE version = ?`` touching only
+    the changed columns. Clients send the ``version`` they last saw; if the
+    application has changed since, nothing is written and a 409 with the
+    current state is returned.
+    """
     try:
         data = json.loads(request.body)
         application_id = data.get('application_id')
         new_status = data.get('status')
         notify = data.get('notify', False)
+        expected_version = _parse_version(data.get('version'))
         
-        print(f"DEBUG: update_application_status called - ID: {application_id}, Status: {new_status}, Notify: {notify}")
+        if new_status not in {code for code, _ in JobApplication.STATUS_CHOICES}:
+            return JsonResponse({'success': False, 'error': 'Invalid status'}, status=400)
         
         # Verify recruiter owns this job
         user_profile = UserProfile.objects.get(user=request.user)
@@ -30,37 +131,53 @@ def update_application_status(request):
             return JsonResponse({'success': False, 'error': 'Not authorized'}, status=403)
         
         recruiter_profile = RecruiterProfile.objects.get(user_profile=user_profile)
-        application = get_object_or_404(JobApplication, id=application_id)
+        current = JobApplication.objects.filter(id=application_id).values(
+            'job_id', 'job__recruiter_id', 'status', 'notified_status', 'version'
+        ).first()
+        if current is None:
+            return JsonResponse({'success': False, 'error': 'Application not found'}, status=404)
         
-        if application.job.recruiter != recruiter_profile:
+        if current['job__recruiter_id'] != recruiter_profile.id:
             return JsonResponse({'success': False, 'error': 'Not authorized'}, status=403)
         
-        print(f"DEBUG: Before update - status: {application.status}, notified_status: {application.notified_status}, notified: {application.notified}")
+        if expected_version is None:
+            # Older clients: still guard against writes landing between our read and update
+            expected_version = current['version']
         
-        # Update status
-        application.status = new_status
-        application.status_updated_at = timezone.now()
-        application.notified = notify
+        old_status = current['status']
+        now = timezone.now()
+        changes = {'notified': notify, 'updated_at': now, 'version': F('version') + 1}
+        if new_status != old_status:
+            changes['status'] = new_status
+            changes['status_updated_at'] = now
         
         # If notifying, update the notified_status to current status
         if notify:
-            application.notified_status = new_status
-            print(f"DEBUG: Notifying applicant - setting notified_status to {new_status}")
+            changes['notified_status'] = new_status
         
-        application.save()
+        with transaction.atomic():
+            updated = JobApplication.objects.filter(
+                id=application_id, version=expected_version
+            ).update(**changes)
+            if updated:
+                ApplicationStatusEvent.record(
+                    [(application_id, current['job_id'], old_status, new_status)],
+                    changed_by=request.user, at=now
+                )
         
-        print(f"DEBUG: After save - status: {application.status}, notified_status: {application.notified_status}, notified: {application.notified}")
+        if not updated:
+            return _conflict_response(application_id)
         
         return JsonResponse({
             'success': True,
-            'application_id': application.id,
-            'status': application.status,
-            'notified': application.notified,
-            'notified_status': application.notified_status
+            'application_id': application_id,
+            'status': new_status,
+            'notified': notify,
+            'notified_status': new_status if notify else current['notified_status'],
+            'version': expected_version + 1
         })
     
     except Exception as e:
-        print(f"DEBUG: Error in update_application_status: {str(e)}")
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
 
@@ -80,20 +197,17 @@ def batch_update_status(request):
         
         recruiter_profile = RecruiterProfile.objects.get(user_profile=user_profile)
         
-        applications = JobApplication.objects.filter(
+        # Only update notified flag and notified_status, don't change current status.
+        # The version is left alone: this never overwrites a status someone else set.
+        updated_count = JobApplication.objects.filter(
             id__in=application_ids,
             job__recruiter=recruiter_profile
+        ).update(
+            notified_status=F('status'),
+            notified=True,
+            updated_at=timezone.now()
         )
         
-        # Only update notified flag and notified_status, don't change current status
-        updated_count = 0
-        for application in applications:
-            # Update notified_status to match current status
-            application.notified_status = application.status
-            application.notified = True
-            application.save()
-            updated_count += 1
-        
         return JsonResponse({
             'success': True,
             'updated_count': updated_count
@@ -103,6 +217,156 @@ def batch_update_status(request):
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
 
+@login_required
+@require_POST
+def bulk_transition(request):
+    """
+    AJAX endpoint to apply many pipeline moves in one request.
+    
+    Expects ``{"moves": [{"id", "status", "notify", "rejection_reason", "version"}, ...]}``.
+    Moves sharing the same target (and expected version) are applied together
+    as one set-based conditional UPDATE, all inside a single transaction.
+    Moves whose ``version`` is stale are skipped and reported as conflicts.
+    Returns a result per application id, plus ``errors`` for moves that have
+    no usable id (``{"index", "id", "error"}``, ``index`` being the move's
+    position in ``moves``).
+    """
+    try:
+        data = json.loads(request.body)
+        moves = data.get('moves', [])
+        
+        if not isinstance(moves, list) or not moves:
+            return JsonResponse({'success': False, 'error': 'No moves given'}, status=400)
+        if len(moves) > BULK_TRANSITION_LIMIT:
+            return JsonResponse({
+                'success': False,
+                'error': f'At most {BULK_TRANSITION_LIMIT} moves per request'
+            }, status=400)
+        
+        # Verify recruiter owns these jobs
+        user_profile = UserProfile.objects.get(user=request.user)
+        if user_profile.user_type != 'recruiter':
+            return JsonResponse({'success': False, 'error': 'Not authorized'}, status=403)
+        
+        recruiter_profile = RecruiterProfile.objects.get(user_profile=user_profile)
+        
+        valid_statuses = {code for code, _ in JobApplication.STATUS_CHOICES}
+        results = {}
+        errors = []
+        groups = {}
+        for index, move in enumerate(moves):
+            try:
+                application_id = int(move.get('id'))
+            except (TypeError, ValueError, AttributeError):
+                errors.append({
+                    'index': index,
+                    'id': move.get('id') if isinstance(move, dict) else None,
+                    'error': 'Invalid application id'
+                })
+                continue
+            new_status = move.get('status')
+            if new_status not in valid_statuses:
+                results[application_id] = {'success': False, 'error': 'Invalid status'}
+                continue
+            notify = bool(move.get('notify', False))
+            rejection_reason = None
+            if new_status == 'rejected':
+                # Rejections always notify the applicant, as in delete_application
+                rejection_reason = move.get('rejection_reason', '')
+                notify = True
+            try:
+                expected_version = _parse_version(move.get('version'))
+            except (TypeError, ValueError):
+                results[application_id] = {'success': False, 'error': 'Invalid version'}
+                continue
+            # A later move of the same application wins
+            results.pop(application_id, None)
+            for group_moves in groups.values():
+                group_moves.pop(application_id, None)
+            groups.setdefault((new_status, notify, rejection_reason), {})[application_id] = expected_version
+        
+        now = timezone.now()
+        with transaction.atomic():
+            current = {
+                row['id']: row
+                for row in JobApplication.objects.filter(
+                    id__in=set().union(*groups.values()),
+                    job__recruiter=recruiter_profile
+                ).values('id', 'job_id', 'status', 'notified', 'notified_status', 'version')
+            }
+            transitions = []
+            
+            for (new_status, notify, rejection_reason), group_moves in groups.items():
+                # Sub-group by the version each move expects, so every UPDATE
+                # can carry a single ``version = ?`` condition
+                by_version = {}
+                for application_id, expected_version in group_moves.items():
+                    row = current.get(application_id)
+                    if row is None:
+                        results[application_id] = {'success': False, 'error': 'Not found'}
+                    elif expected_version is not None and expected_version != row['version']:
+                        results[application_id] = {'success': False, 'conflict': True, 'current': row}
+                    else:
+                        by_version.setdefault(row['version'], set()).add(application_id)
+                if not by_version:
+                    continue
+                
+                changes = {
+                    'status': new_status,
+                    'notified': notify,
+                    # Only moves that actually change status restart the stage clock
+                    'status_updated_at': Case(
+                        When(status=new_status, then=F('status_updated_at')),
+                        default=Value(now)
+                    ),
+                    'updated_at': now,
+                    'version': F('version') + 1,
+                }
+                if notify:
+                    changes['notified_status'] = new_status
+                if rejection_reason is not None:
+                    changes['rejection_reason'] = rejection_reason
+                
+                for version, group_ids in by_version.items():
+                    updated = JobApplication.objects.filter(
+                        id__in=group_ids,
+                        job__recruiter=recruiter_profile,
+                        version=version
+                    ).update(**changes)
+                    
+                    stale = set()
+                    if updated < len(group_ids):
+                        # Some rows changed after we read them; find out which
+                        stale = set(JobApplication.objects.filter(id__in=group_ids).exclude(
+                            version=version + 1
+                        ).values_list('id', flat=True))
+                    
+                    for application_id in group_ids:
+                        row = current[application_id]
+                        if application_id in stale:
+                            results[application_id] = {'success': False, 'conflict': True}
+                            continue
+                        transitions.append((application_id, row['job_id'], row['status'], new_status))
+                        results[application_id] = {
+                            'success': True,
+                            'status': new_status,
+                            'notified': notify,
+                            'version': version + 1
+                        }
+            
+            ApplicationStatusEvent.record(transitions, changed_by=request.user, at=now)
+        
+        return JsonResponse({
+            'success': True,
+            'updated_count': sum(1 for result in results.values() if result['success']),
+            'results': {str(application_id): result for application_id, result in results.items()},
+            'errors': errors
+        })
+    
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
 @login_required
 @require_POST
 def delete_application(request):
@@ -111,6 +375,7 @@ def delete_application(request):
         data = json.loads(request.body)
         application_id = data.get('application_id')
         rejection_reason = data.get('rejection_reason', '')
+        expected_version = _parse_version(data.get('version'))
         
         # Verify recruiter owns this job
         user_profile = UserProfile.objects.get(user=request.user)
@@ -118,22 +383,44 @@ def delete_application(request):
             return JsonResponse({'success': False, 'error': 'Not authorized'}, status=403)
         
         recruiter_profile = RecruiterProfile.objects.get(user_profile=user_profile)
-        application = get_object_or_404(JobApplication, id=application_id)
+        current = JobApplication.objects.filter(id=application_id).values(
+            'job_id', 'job__recruiter_id', 'status', 'version'
+        ).first()
+        if current is None:
+            return JsonResponse({'success': False, 'error': 'Application not found'}, status=404)
         
-        if application.job.recruiter != recruiter_profile:
+        if current['job__recruiter_id'] != recruiter_profile.id:
             return JsonResponse({'success': False, 'error': 'Not authorized'}, status=403)
         
+        if expected_version is None:
+            expected_version = current['version']
+        
         # Mark as rejected instead of deleting
-        application.status = 'rejected'
-        application.rejection_reason = rejection_reason
-        application.status_updated_at = timezone.now()
-        application.notified = True
-        application.notified_status = 'rejected'
-        application.save()
+        now = timezone.now()
+        with transaction.atomic():
+            updated = JobApplication.objects.filter(
+                id=application_id, version=expected_version
+            ).update(
+                status='rejected',
+                rejection_reason=rejection_reason,
+                status_updated_at=now,
+                notified=True,
+                notified_status='rejected',
+                updated_at=now,
+                version=F('version') + 1
+            )
+            if updated:
+                ApplicationStatusEvent.record(
+                    [(application_id, current['job_id'], current['status'], 'rejected')],
+                    changed_by=request.user, at=now
+                )
+        
+        if not updated:
+            return _conflict_response(application_id)
         
         return JsonResponse({
             'success': True,
-            'application_id': application.id
+            'application_id': application_id
         })
     
     except Exception as e:
@@ -141,40 +428,48 @@ def delete_application(request):
 
 
 @login_required
-def application_messages(request, application_id):
+async def application_messages(request, application_id):
     """View messages for a specific application"""
-    application = get_object_or_404(JobApplication, id=application_id)
+    user = await request.auser()
+    application = await aget_object_or_404(
+        JobApplication.objects.select_related('job__recruiter', 'applicant'),
+        id=application_id
+    )
     
     # Check if user is involved in this application
-    user_profile = UserProfile.objects.get(user=request.user)
+    user_profile = await UserProfile.objects.aget(user=user)
     
     is_recruiter = (user_profile.user_type == 'recruiter' and 
-                   application.job.recruiter.user_profile == user_profile)
-    is_applicant = application.applicant == request.user
+                   application.job.recruiter.user_profile_id == user_profile.id)
+    is_applicant = application.applicant_id == user.id
     
     if not (is_recruiter or is_applicant):
         return JsonResponse({'success': False, 'error': 'Not authorized'}, status=403)
     
-    # Mark messages as read for the current user
-    Message.objects.filter(
-        application=application
-    ).exclude(sender=request.user).update(is_read=True)
+    # Own messages count as read once the other party's watermark has passed them
+    other_party_watermark = (await application.read_states.exclude(
+        user=user
+    ).aaggregate(watermark=Max('last_read_message_id')))['watermark'] or 0
     
-    messages_list = []
-    for msg in application.messages.all():
-        messages_list.append({
-            'id': msg.id,
-            'sender': msg.sender.get_full_name() or msg.sender.username,
-            'sender_id': msg.sender.id,
-            'content': msg.content,
-            'created_at': msg.created_at.strftime('%Y-%m-%d %H:%M'),
-            'is_read': msg.is_read,
-            'is_own': msg.sender == request.user
-        })
+    rows = [row async for row in application.messages.annotate(
+        sender_name=serializers.full_name('sender')
+    ).values('id', 'sender_id', 'sender_name', 'content', 'created_at')]
+    for row in rows:
+        row['is_own'] = row['sender_id'] == user.id
+        row['is_read'] = row['id'] <= other_party_watermark if row['is_own'] else True
     
-    return JsonResponse({
+    # Mark the whole thread as read for the current user
+    if rows:
+        read = 0
+        if is_recruiter:
+            read = await application.messages.unread_for(user).filter(id__lte=rows[-1]['id']).acount()
+        await MessageReadState.amark_read(application, user, rows[-1]['id'])
+        if read:
+            await sync_to_async(JobStats.add_unread)(application.job_id, -read)
+    
+    return serializers.stable_json_response({
         'success': True,
-        'messages': messages_list,
+        'messages': serializers.serialize_rows(rows, MESSAGE_FIELDS, serializers.wants_columnar(request)),
         'application': {
             'id': application.id,
             'job_title': application.job.title,
@@ -196,32 +491,36 @@ def send_message(request):
         if not content:
             return JsonResponse({'success': False, 'error': 'Message cannot be empty'}, status=400)
         
-        application = get_object_or_404(JobApplication, id=application_id)
+        application = get_object_or_404(
+            JobApplication.objects.select_related('job__recruiter__user_profile'),
+            id=application_id
+        )
         
         # Check if user is involved in this application
         user_profile = UserProfile.objects.get(user=request.user)
         
         is_recruiter = (user_profile.user_type == 'recruiter' and 
-                       application.job.recruiter.user_profile == user_profile)
-        is_applicant = application.applicant == request.user
+                       application.job.recruiter.user_profile_id == user_profile.id)
+        is_applicant = application.applicant_id == request.user.id
         
         if not (is_recruiter or is_applicant):
             return JsonResponse({'success': False, 'error': 'Not authorized'}, status=403)
         
-        # Create message
-        message = Message.objects.create(
-            application=application,
-            sender=request.user,
-            content=content
-        )
+        # Create message; the post_save handlers index it and update the job's
+        # unread counter, and must commit or roll back with it
+        message = Message(application=application, sender=request.user, content=content)
+        # Saves the signal handlers looking the job and recruiter up again
+        message.job_recruiter = (application.job_id, application.job.recruiter.user_profile.user_id)
+        with transaction.atomic():
+            message.save()
         
-        return JsonResponse({
+        return serializers.stable_json_response({
             'success': True,
             'message': {
                 'id': message.id,
-                'sender': message.sender.get_full_name() or message.sender.username,
+                'sender': request.user.get_full_name() or request.user.username,
                 'content': message.content,
-                'created_at': message.created_at.strftime('%Y-%m-%d %H:%M'),
+                'created_at': message.created_at,
                 'is_own': True
             }
         })
@@ -231,24 +530,23 @@ def send_message(request):
 
 
 @login_required
-def get_unread_message_count(request):
+async def get_unread_message_count(request):
     """Get count of unread messages for current user"""
     try:
-        user_profile = UserProfile.objects.get(user=request.user)
+        user = await request.auser()
+        user_profile = await UserProfile.objects.aget(user=user)
         
         if user_profile.user_type == 'recruiter':
-            recruiter_profile = RecruiterProfile.objects.get(user_profile=user_profile)
+            recruiter_profile = await RecruiterProfile.objects.aget(user_profile=user_profile)
             # Count messages in applications for recruiter's jobs
-            unread_count = Message.objects.filter(
-                application__job__recruiter=recruiter_profile,
-                is_read=False
-            ).exclude(sender=request.user).count()
+            unread_count = await Message.objects.filter(
+                application__job__recruiter=recruiter_profile
+            ).unread_for(user).acount()
         else:
             # Count messages in user's applications
-            unread_count = Message.objects.filter(
-                application__applicant=request.user,
-                is_read=False
-            ).exclude(sender=request.user).count()
+            unread_count = await Message.objects.filter(
+                application__applicant=user
+            ).unread_for(user).acount()
         
         return JsonResponse({
             'success': True,
@@ -260,60 +558,257 @@ def get_unread_message_count(request):
 
 
 @login_required
-def get_conversations(request):
+async def get_conversations(request):
     """Get all conversations for current user"""
     try:
-        user_profile = UserProfile.objects.get(user=request.user)
-        conversations = []
+        user = await request.auser()
+        user_profile = await UserProfile.objects.aget(user=user)
         
         if user_profile.user_type == 'recruiter':
-            recruiter_profile = RecruiterProfile.objects.get(user_profile=user_profile)
-            # Get all applications for recruiter's jobs that have messages
+            recruiter_profile = await RecruiterProfile.objects.aget(user_profile=user_profile)
+            # Applications for recruiter's jobs; the other party is the applicant
             applications = JobApplication.objects.filter(
                 job__recruiter=recruiter_profile
-            ).exclude(messages=None).distinct()
-            
-            for app in applications:
-                last_message = app.messages.order_by('-created_at').first()
-                unread_count = app.messages.filter(is_read=False).exclude(sender=request.user).count()
-                
-                conversations.append({
-                    'application_id': app.id,
-                    'job_title': app.job.title,
-                    'other_party': app.applicant.get_full_name() or app.applicant.username,
-                    'last_message': last_message.content[:50] + '...' if last_message and len(last_message.content) > 50 else (last_message.content if last_message else ''),
-                    'last_message_time': last_message.created_at.strftime('%b %d, %H:%M') if last_message else '',
-                    'unread_count': unread_count
-                })
+            ).annotate(other_party=serializers.full_name('applicant'))
         else:
-            # Get all applications by job seeker that have messages
+            # Job seeker's own applications; the other party is the company
             applications = JobApplication.objects.filter(
-                applicant=request.user
-            ).exclude(messages=None).distinct()
-            
-            for app in applications:
-                last_message = app.messages.order_by('-created_at').first()
-                unread_count = app.messages.filter(is_read=False).exclude(sender=request.user).count()
-                
-                conversations.append({
-                    'application_id': app.id,
-                    'job_title': app.job.title,
-                    'other_party': app.job.company,
-                    'last_message': last_message.content[:50] + '...' if last_message and len(last_message.content) > 50 else (last_message.content if last_message else ''),
-                    'last_message_time': last_message.created_at.strftime('%b %d, %H:%M') if last_message else '',
-                    'unread_count': unread_count
-                })
+                applicant=user
+            ).annotate(other_party=F('job__company'))
+        
+        last_message = Message.objects.filter(application=OuterRef('pk')).order_by('-created_at', '-id')
+        
+        # Only applications that have messages, most recent conversation first
+        rows = [row async for row in applications.annotate(
+            last_message=Subquery(last_message.annotate(
+                preview=serializers.preview('content', 50)
+            ).values('preview')[:1]),
+            last_message_time=Subquery(last_message.values('created_at')[:1]),
+            unread_count=unread_count_for(user)
+        ).filter(
+            last_message_time__isnull=False
+        ).order_by('-last_message_time').values(
+            'id', 'job__title', 'other_party', 'last_message', 'last_message_time', 'unread_count'
+        )]
+        
+        return serializers.stable_json_response({
+            'success': True,
+            'conversations': serializers.serialize_rows(
+                rows, CONVERSATION_FIELDS, serializers.wants_columnar(request)
+            ),
+            'unread_count': sum(row['unread_count'] for row in rows)
+        })
+    
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@login_required
+def search_messages(request):
+    """Full-text search across the conversations the current user takes part in"""
+    query = request.GET.get('q', '').strip()
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    
+    if not query:
+        return JsonResponse({'success': False, 'error': 'Search query cannot be empty'}, status=400)
+    
+    try:
+        user_profile = UserProfile.objects.get(user=request.user)
+        recruiter_profile = None
+        if user_profile.user_type == 'recruiter':
+            recruiter_profile = RecruiterProfile.objects.filter(user_profile=user_profile).first()
+        
+        total, rows = search.search_messages(
+            request.user, recruiter_profile, query,
+            page=page, per_page=MESSAGE_SEARCH_PAGE_SIZE
+        )
+        
+        details = {
+            row['id']: row for row in Message.objects.filter(
+                id__in=[message_id for message_id, _ in rows]
+            ).annotate(
+                sender_name=serializers.full_name('sender')
+            ).values('id', 'application_id', 'application__job__title', 'sender_id', 'sender_name', 'created_at')
+        }
+        
+        # Keep the rank order from the search, skipping rows deleted in the meantime
+        results = []
+        for message_id, highlight in rows:
+            row = details.get(message_id)
+            if row is None:
+                continue
+            row['highlight'] = highlight
+            row['is_own'] = row['sender_id'] == request.user.id
+            results.append(row)
         
-        # Sort by last message time
-        conversations.sort(key=lambda x: x['last_message_time'], reverse=True)
+        num_pages = max(math.ceil(total / MESSAGE_SEARCH_PAGE_SIZE), 1)
         
-        # Calculate total unread count
-        total_unread = sum(conv['unread_count'] for conv in conversations)
+        return serializers.stable_json_response({
+            'success': True,
+            'query': query,
+            'results': serializers.serialize_rows(
+                results, SEARCH_RESULT_FIELDS, serializers.wants_columnar(request)
+            ),
+            'total': total,
+            'page': page,
+            'num_pages': num_pages,
+            'has_next': page < num_pages,
+            'has_previous': page > 1
+        })
+    
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@login_required
+def pipeline_changes(request, job_id):
+    """
+    AJAX endpoint for delta sync of the pipeline board.
+    
+    Given ``since`` (the ``version`` returned by the previous call), returns
+    only the applications on this job whose status, notification state or
+    messages changed since then, plus the ids of deleted applications.
+    Without ``since``, only the current version is returned. Changes from
+    the last ``PIPELINE_SYNC_OVERLAP_SECONDS`` before ``since`` are sent again,
+    so clients must apply them idempotently.
+    
+    The version is the newest change returned (see ``pipeline.sync_version``),
+    not the time of the request, so reads from a lagging replica do not skip
+    the changes it has not replayed yet.
+    """
+    try:
+        user_profile = UserProfile.objects.get(user=request.user)
+        if user_profile.user_type != 'recruiter':
+            return JsonResponse({'success': False, 'error': 'Not authorized'}, status=403)
+        
+        recruiter_profile = RecruiterProfile.objects.get(user_profile=user_profile)
+        if not Job.objects.filter(id=job_id, recruiter=recruiter_profile).exists():
+            return JsonResponse({'success': False, 'error': 'Job not found'}, status=404)
+        
+        since = parse_datetime(request.GET.get('since', ''))
+        if since is None:
+            return serializers.stable_json_response({
+                'success': True,
+                'version': pipeline.latest_change(job_id).isoformat()
+            })
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        if since < timezone.now() - ApplicationTombstone.RETENTION:
+            # Tombstones older than this are gone, so the client must reload the board
+            return serializers.stable_json_response({
+                'success': True,
+                'reset': True,
+                'version': pipeline.latest_change(job_id).isoformat()
+            })
+        seen = since
+        
+        # Writes are stamped before they commit, so a transaction still open at
+        # ``since`` can become visible later with an earlier timestamp. Re-send
+        # the last few seconds every time; applying a change twice is harmless.
+        since -= timedelta(seconds=getattr(settings, 'PIPELINE_SYNC_OVERLAP_SECONDS', 30))
+        applications = list(pipeline.card_queryset(job_id, request.user).filter(updated_at__gt=since))
+        
+        changes = []
+        for application in applications:
+            change = {
+                'id': application.id,
+                'status': application.status,
+                'notified': application.notified,
+                'notified_status': application.notified_status,
+                'version': application.version,
+                'message_count': application.message_count,
+                'unread_count': application.unread_count,
+            }
+            # New cards are rendered server-side so the board can insert them as-is
+            if application.applied_at > since and application.status in JobApplication.PIPELINE_STATUSES:
+                change['html'] = render_to_string(
+                    'jobs/partials/application_card.html', {'application': application}, request=request
+                )
+            changes.append(change)
+        
+        tombstones = list(ApplicationTombstone.objects.filter(
+            job_id=job_id,
+            deleted_at__gt=since
+        ).values_list('application_id', 'deleted_at'))
+        deleted = [application_id for application_id, _ in tombstones]
+        version = pipeline.sync_version(
+            seen,
+            *(application.updated_at for application in applications),
+            *(deleted_at for _, deleted_at in tombstones)
+        )
+        
+        return serializers.stable_json_response({
+            'success': True,
+            'version': version.isoformat(),
+            'changes': changes,
+            'deleted': deleted,
+            'counts': pipeline.column_counts(job_id) if changes or deleted else None
+        })
+    
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@login_required
+def pipeline_column(request, job_id, status):
+    """
+    AJAX endpoint returning the next page of one pipeline column as rendered
+    cards. Pass the ``cursor`` from the previous page (or the board's
+    ``data-next-cursor``) to continue where it stopped.
+    """
+    try:
+        user_profile = UserProfile.objects.get(user=request.user)
+        if user_profile.user_type != 'recruiter':
+            return JsonResponse({'success': False, 'error': 'Not authorized'}, status=403)
+        
+        recruiter_profile = RecruiterProfile.objects.get(user_profile=user_profile)
+        if not Job.objects.filter(id=job_id, recruiter=recruiter_profile).exists():
+            return JsonResponse({'success': False, 'error': 'Job not found'}, status=404)
+        
+        if status not in JobApplication.PIPELINE_STATUSES:
+            return JsonResponse({'success': False, 'error': 'Invalid status'}, status=400)
+        
+        try:
+            applications, next_cursor = pipeline.column_page(
+                job_id, status, request.user, cursor=request.GET.get('cursor')
+            )
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Invalid cursor'}, status=400)
+        
+        html = ''.join(
+            render_to_string('jobs/partials/application_card.html', {'application': application}, request=request)
+            for application in applications
+        )
         
         return JsonResponse({
             'success': True,
-            'conversations': conversations,
-            'unread_count': total_unread
+            'html': html,
+            'count': len(applications),
+            'next_cursor': next_cursor
+        })
+    
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@login_required
+def pipeline_stats(request, job_id):
+    """AJAX endpoint for a job's hiring funnel and time-in-stage metrics"""
+    try:
+        user_profile = UserProfile.objects.get(user=request.user)
+        if user_profile.user_type != 'recruiter':
+            return JsonResponse({'success': False, 'error': 'Not authorized'}, status=403)
+        
+        recruiter_profile = RecruiterProfile.objects.get(user_profile=user_profile)
+        if not Job.objects.filter(id=job_id, recruiter=recruiter_profile).exists():
+            return JsonResponse({'success': False, 'error': 'Job not found'}, status=404)
+        
+        return serializers.stable_json_response({
+            'success': True,
+            **analytics.hiring_velocity(job_id)
         })
     
     except Exception as e:
@@ -321,12 +816,18 @@ def get_conversations(request):
 
 
 @login_required
-def get_applicant_locations(request, job_id):
-    """AJAX endpoint to get applicant locations for map clustering"""
+async def get_applicant_locations(request, job_id):
+    """
+    AJAX endpoint to get applicant locations for the applicants map.
+    
+    Returns the points as parallel arrays, optionally only those in ``?ids=``.
+    With ``?zoom=N`` the points are clustered server-side instead and only
+    per-cell centroids and counts are returned.
+    """
     try:
         # Verify recruiter owns this job
         try:
-            user_profile = UserProfile.objects.get(user=request.user)
+            user_profile = await UserProfile.objects.aget(user=await request.auser())
         except UserProfile.DoesNotExist:
             return JsonResponse({'success': False, 'error': 'User profile not found'}, status=403)
         
@@ -334,52 +835,110 @@ def get_applicant_locations(request, job_id):
             return JsonResponse({'success': False, 'error': 'Not authorized - only recruiters can view applicant locations'}, status=403)
         
         try:
-            recruiter_profile = RecruiterProfile.objects.get(user_profile=user_profile)
+            recruiter_profile = await RecruiterProfile.objects.aget(user_profile=user_profile)
         except RecruiterProfile.DoesNotExist:
             return JsonResponse({'success': False, 'error': 'Recruiter profile not found'}, status=403)
         
         try:
-            job = Job.objects.get(id=job_id, recruiter=recruiter_profile)
+            job = await Job.objects.aget(id=job_id, recruiter=recruiter_profile)
         except Job.DoesNotExist:
             return JsonResponse({'success': False, 'error': 'Job not found or you do not have permission to view it'}, status=404)
         
-        # Get all applicants for this job
-        applications = job.applications.all()
-        
-        locations = []
-        for application in applications:
-            try:
-                # Get the applicant's profile
-                profile = Profile.objects.get(user=application.applicant)
-                
-                # Only include if location sharing is enabled and coordinates exist
-                if profile.show_location and profile.latitude is not None and profile.longitude is not None:
-                    locations.append({
-                        'lat': float(profile.latitude),
-                        'lng': float(profile.longitude),
-                        'name': application.applicant.get_full_name() or application.applicant.username,
-                        'location': profile.location or 'Location not specified',
-                        'status': application.get_status_display(),
-                        'status_code': application.status,
-                        'applied_at': application.applied_at.strftime('%b %d, %Y'),
-                        'application_id': application.id
-                    })
-            except Profile.DoesNotExist:
-                # Skip if profile doesn't exist
-                continue
-            except (ValueError, TypeError) as e:
-                print(f"Invalid coordinates for user {application.applicant.id}: {e}")
-                continue
-        
-        return JsonResponse({
+        # One query joining applications to applicant profiles; only applicants
+        # sharing their location with known coordinates are shown
+        applications = tiles.applicant_points(job.id)
+        
+        zoom = geo.parse_zoom(request.GET.get('zoom'))
+        if zoom is not None:
+            clusters = [cluster async for cluster in geo.grid_clusters(
+                applications, zoom, 'applicant__profile__latitude', 'applicant__profile__longitude'
+            )]
+            return serializers.stable_json_response({
+                'success': True,
+                'zoom': zoom,
+                'clusters': serializers.serialize_rows(clusters, CLUSTER_FIELDS, columnar=True),
+                'count': sum(cluster['count'] for cluster in clusters)
+            })
+        
+        ids = request.GET.get('ids')
+        if ids:
+            # Details of specific applicants, e.g. for a marker popup on the tiled map
+            applications = applications.filter(id__in=[int(i) for i in ids.split(',')])
+        
+        rows = [row async for row in applications.annotate(
+            lat=F('applicant__profile__latitude'),
+            lng=F('applicant__profile__longitude'),
+            name=serializers.full_name('applicant'),
+            location_label=Coalesce(
+                NullIf(F('applicant__profile__location'), Value('')),
+                Value('Location not specified')
+            )
+        ).order_by('id').values('id', 'lat', 'lng', 'name', 'location_label', 'status', 'applied_at')]
+        
+        return serializers.stable_json_response({
             'success': True,
-            'locations': locations,
-            'count': len(locations)
+            'locations': serializers.serialize_rows(rows, LOCATION_FIELDS, columnar=True),
+            'status_labels': dict(JobApplication.STATUS_CHOICES),
+            'count': len(rows)
         })
     
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
     except Exception as e:
-        import traceback
-        print(f"Error in get_applicant_locations: {str(e)}")
-        print(traceback.format_exc())
         return JsonResponse({'success': False, 'error': f'Server error: {str(e)}'}, status=500)
 
+
+def _tile_response(tile, private):
+    """Tiles are plain GETs that browsers may cache briefly; server-side they are cached until invalidated"""
+    response = serializers.stable_json_response(dict(tile, success=True))
+    if private:
+        patch_cache_control(response, private=True, max_age=MAP_TILE_MAX_AGE)
+    else:
+        patch_cache_control(response, public=True, max_age=MAP_TILE_MAX_AGE)
+    return response
+
+
+def job_map_tile(request, z, x, y):
+    """Public map tile of clustered active job locations"""
+    try:
+        tiles.validate_tile(z, x, y)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    tile = tiles.get_tile('jobs', tiles.job_points(), *tiles.JOB_POINT_FIELDS, z, x, y)
+    return _tile_response(tile, private=False)
+
+
+@login_required
+def applicant_map_tile(request, job_id, z, x, y):
+    """Map tile of clustered applicant locations for one of the recruiter's jobs"""
+    try:
+        user_profile = UserProfile.objects.get(user=request.user)
+        if user_profile.user_type != 'recruiter':
+            return JsonResponse({'success': False, 'error': 'Not authorized'}, status=403)
+        
+        recruiter_profile = RecruiterProfile.objects.get(user_profile=user_profile)
+        if not Job.objects.filter(id=job_id, recruiter=recruiter_profile).exists():
+            return JsonResponse({'success': False, 'error': 'Job not found'}, status=404)
+        
+        tiles.validate_tile(z, x, y)
+        tile = tiles.get_tile(
+            f'applicants:{job_id}', tiles.applicant_points(job_id), *tiles.APPLICANT_POINT_FIELDS, z, x, y,
+            extra_fields=tiles.APPLICANT_EXTRA_FIELDS
+        )
+        return _tile_response(tile, private=True)
+    
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+def location_autocomplete(request):
+    """Gazetteer cities (and their aliases) matching the typed prefix, for the location filter"""
+    query = request.GET.get('q', '').strip()
+    results = geocoder.complete(query, LOCATION_AUTOCOMPLETE_LIMIT) if query else []
+    response = JsonResponse({'success': True, 'results': results})
+    # The gazetteer only changes on deploy
+    patch_cache_control(response, public=True, max_age=LOCATION_AUTOCOMPLETE_MAX_AGE)
+    return response
@@ -0,0 +1,125 @@
+"""
+Hiring-velocity metrics computed from the ApplicationStatusEvent log.
+
+The aggregation runs in SQL. Window functions pair each event with the next
+event of the same application, so no history is replayed in Python.
+"""
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import ApplicationStatusEvent, JobApplication
+
+
+def _seconds_between(start, end):
+    """SQL expression for the number of seconds between two timestamp expressions"""
+    if connection.vendor == 'sqlite':
+        return f'(julianday({end}) - julianday({start})) * 86400.0'
+    return f'EXTRACT(EPOCH FROM ({end} - {start}))'
+
+
+def time_in_stage(job_id):
+    """
+    Time applications on ``job_id`` spend in each status.
+
+    Returns a list of dicts, one per status in STATUS_CHOICES order:
+    ``entries`` (times the stage was entered), ``current`` (applications in
+    it now), and average/max seconds spent over completed stays.
+    """
+    duration = _seconds_between('entered_at', 'left_at')
+    sql = f"""
+        WITH stays AS (
+            SELECT
+                to_status AS status,
+                created_at AS entered_at,
+                LEAD(created_at) OVER (
+                    PARTITION BY application_id ORDER BY created_at, id
+                ) AS left_at
+            FROM jobs_applicationstatusevent
+            WHERE job_id = %s
+        )
+        SELECT
+            status,
+            COUNT(*),
+            SUM(CASE WHEN left_at IS NULL THEN 1 ELSE 0 END),
+            AVG(CASE WHEN left_at IS NOT NULL THEN {duration} END),
+            MAX(CASE WHEN left_at IS NOT NULL THEN {duration} END)
+        FROM stays
+        GROUP BY status
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [job_id])
+        rows = {row[0]: row[1:] for row in cursor.fetchall()}
+
+    stages = []
+    for status, label in JobApplication.STATUS_CHOICES:
+        entries, current, avg_seconds, max_seconds = rows.get(status, (0, 0, None, None))
+        stages.append({
+            'status': status,
+            'label': label,
+            'entries': entries,
+            'current': current,
+            'avg_seconds': round(avg_seconds) if avg_seconds is not None else None,
+            'max_seconds': round(max_seconds) if max_seconds is not None else None,
+        })
+    return stages
+
+
+def funnel(job_id):
+    """
+    How far applications on ``job_id`` got through the pipeline.
+
+    ``stages`` has one entry per status in PIPELINE_STATUSES order, counting
+    the applications that reached that stage or a later one (so the counts
+    never grow down the funnel), with their share of all applications.
+    Rejection can happen at any stage, so ``rejected`` is reported on its own.
+    """
+    statuses = JobApplication.PIPELINE_STATUSES
+    stage_index = ' '.join(f'WHEN %s THEN {index}' for index in range(len(statuses)))
+    sql = f"""
+        SELECT furthest, COUNT(*)
+        FROM (
+            SELECT application_id, MAX(CASE to_status {stage_index} END) AS furthest
+            FROM jobs_applicationstatusevent
+            WHERE job_id = %s
+            GROUP BY application_id
+        ) AS applications
+        WHERE furthest IS NOT NULL
+        GROUP BY furthest
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*statuses, job_id])
+        furthest = dict(cursor.fetchall())
+
+    total = sum(furthest.values())
+    labels = dict(JobApplication.STATUS_CHOICES)
+    stages = []
+    for index, status in enumerate(statuses):
+        count = sum(n for stage, n in furthest.items() if stage >= index)
+        stages.append({
+            'status': status,
+            'label': labels[status],
+            'count': count,
+            'conversion': round(count / total, 4) if total else None,
+        })
+
+    rejected = ApplicationStatusEvent.objects.filter(job_id=job_id, to_status='rejected').aggregate(
+        count=Count('application', distinct=True)
+    )['count']
+    return {
+        'stages': stages,
+        'rejected': {
+            'count': rejected,
+            'conversion': round(rejected / total, 4) if total else None,
+        },
+    }
+
+
+def hiring_velocity(job_id):
+    """Funnel and time-in-stage metrics for a job, as one JSON-ready dict"""
+    return {
+        'job_id': job_id,
+        'generated_at': timezone.now().isoformat(),
+        'funnel': funnel(job_id),
+        'time_in_stage': time_in_stage(job_id),
+    }
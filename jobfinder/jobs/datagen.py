@@ -0,0 +1,475 @@
+"""
+Deterministic synthetic data for local load testing and benchmarks.
+
+``generate(rng, ...)`` creates recruiters, jobs, job seekers (users, profiles
+and candidate profiles), applications with their status history, message
+threads and saved searches, all with ``bulk_create`` in batches, so millions
+of rows take minutes rather than hours. The same seed always produces the
+same data.
+
+Distributions aim to look like a real job board rather than uniform noise:
+
+* people and jobs belong to a role (backend, frontend, data, ...) whose skill
+  stack they draw from, most common skills first
+* locations follow city population in the bundled gazetteer, with a share
+  of remote jobs and seekers who leave the location blank
+* job popularity is heavy-tailed, and most seekers apply within their role
+* application statuses follow a hiring funnel, and most threads are short
+
+``bulk_create`` skips signals, so the work the signal handlers would have done
+is done in bulk instead: coordinates come straight from the gazetteer,
+messages are added to the FTS index per batch, status events are written
+alongside the applications, job stats are rebuilt at the end, and cached job
+pages and map tiles are invalidated.
+"""
+import itertools
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+from authentication.models import UserProfile, RecruiterProfile, JobSeekerProfile
+from jobfinder import pagecache
+from profiles.models import Profile, SavedSearch
+from . import geocoder, search, tiles
+from .models import ApplicationStatusEvent, Job, JobApplication, JobStats, Message, MessageReadState
+
+# role: (weight, title, skills from most to least common)
+ROLES = {
+    'backend': (30, 'Backend Engineer', [
+        'Python', 'SQL', 'Django', 'PostgreSQL', 'REST APIs', 'Docker', 'Java', 'Go', 'Redis', 'Spring', 'Kafka',
+    ]),
+    'frontend': (20, 'Frontend Developer', [
+        'JavaScript', 'React', 'TypeScript', 'CSS', 'HTML', 'Vue', 'Next.js', 'Webpack', 'Figma', 'Accessibility',
+    ]),
+    'fullstack': (15, 'Full Stack Developer', [
+        'JavaScript', 'Python', 'React', 'SQL', 'Node.js', 'TypeScript', 'Django', 'Docker', 'AWS', 'GraphQL',
+    ]),
+    'data': (12, 'Data Scientist', [
+        'Python', 'SQL', 'Pandas', 'Machine Learning', 'Statistics', 'Spark', 'TensorFlow', 'Tableau', 'R', 'Airflow',
+    ]),
+    'devops': (10, 'DevOps Engineer', [
+        'AWS', 'Docker', 'Kubernetes', 'Linux', 'Terraform', 'CI/CD', 'Python', 'Go', 'Prometheus', 'Ansible',
+    ]),
+    'mobile': (8, 'Mobile Developer', [
+        'Swift', 'Kotlin', 'iOS', 'Android', 'React Native', 'Flutter', 'Firebase', 'Objective-C',
+    ]),
+    'qa': (5, 'QA Engineer', [
+        'Test Automation', 'Selenium', 'Python', 'Cypress', 'Java', 'SQL', 'Jenkins', 'Postman',
+    ]),
+}
+
+LEVELS = {
+    # level: (weight, title prefix, experience years range, salary range in thousands)
+    'entry': (30, 'Junior', (0, 2), (55, 85)),
+    'mid': (40, '', (2, 6), (80, 130)),
+    'senior': (25, 'Senior', (6, 15), (120, 190)),
+    'executive': (5, 'Principal', (12, 25), (170, 260)),
+}
+
+WORK_TYPES = {'on_site': 40, 'hybrid': 35, 'remote': 25}
+
+# Share of applications in each status: a hiring funnel
+STATUSES = {'applied': 45, 'review': 22, 'interview': 12, 'offer': 4, 'closed': 7, 'rejected': 10}
+
+# Applications per seeker, and messages per application
+APPLICATION_COUNTS = {0: 15, 1: 20, 2: 18, 3: 15, 5: 15, 8: 10, 13: 5, 21: 2}
+MESSAGE_COUNTS = {0: 55, 1: 12, 2: 12, 3: 8, 5: 8, 8: 4, 13: 1}
+
+# Share of applications a seeker sends within their own role
+IN_ROLE_APPLICATIONS = 0.8
+
+FIRST_NAMES = [
+    'James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+    'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Wei', 'Priya',
+    'Carlos', 'Fatima', 'Hiroshi', 'Aisha', 'Mateo', 'Olga', 'Kwame', 'Sofia', 'Arjun', 'Mei',
+]
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+    'Hernandez', 'Lopez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Lee', 'Perez',
+    'Nguyen', 'Kim', 'Patel', 'Chen', 'Singh', 'Okafor', 'Novak', 'Tanaka', 'Haddad', 'Kowalski',
+]
+COMPANY_WORDS = [
+    'Tech', 'Data', 'Cloud', 'Bright', 'Blue', 'Peach', 'Summit', 'Vector', 'North', 'Signal',
+    'Harbor', 'Quantum', 'Pixel', 'Atlas', 'Maple', 'Orbit', 'Granite', 'Nimbus', 'Falcon', 'Lumen',
+]
+COMPANY_SUFFIXES = ['Labs', 'Systems', 'Inc.', 'Solutions', 'Works', 'Group', 'Analytics', 'Software']
+
+MESSAGES_FROM_RECRUITER = [
+    'Thanks for applying! Are you available for a quick call this week?',
+    'We would like to move you forward to the next round.',
+    'Could you share a bit more about your recent projects?',
+    'Following up on your application for this role.',
+    'Our team enjoyed the interview. We will be in touch soon.',
+]
+MESSAGES_FROM_APPLICANT = [
+    'Thank you for reaching out, I am available Tuesday or Thursday afternoon.',
+    'Happy to share more details, here is a summary of my recent work.',
+    'Could you tell me more about the team and the tech stack?',
+    'Just checking in on the status of my application.',
+    'Thanks for the update, looking forward to hearing from you.',
+]
+
+
+class _Weighted:
+    """Repeated weighted draws from a fixed population, in O(log n) each"""
+
+    def __init__(self, population, weights):
+        self.population = list(population)
+        self.cum_weights = list(itertools.accumulate(weights))
+
+    def draw(self, rng, k=1):
+        return rng.choices(self.population, cum_weights=self.cum_weights, k=k)
+
+    def one(self, rng):
+        return self.draw(rng)[0]
+
+
+def _weighted(mapping):
+    return _Weighted(mapping.keys(), [value if isinstance(value, (int, float)) else value[0] for value in mapping.values()])
+
+
+def _zipf(items, exponent=1.0):
+    return _Weighted(items, [1 / (rank + 1) ** exponent for rank in range(len(items))])
+
+
+class Generator:
+    def __init__(self, rng, batch_size=5000, prefix='sample', password='password123', log=None):
+        self.rng = rng
+        self.batch_size = batch_size
+        self.prefix = prefix
+        # Hashing is slow on purpose, so it is done once and shared by every account
+        self.password = make_password(password)
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+        self.job_points = set()
+        self._next_numbers = {}
+
+        self.roles = _weighted(ROLES)
+        self.levels = _weighted(LEVELS)
+        self.work_types = _weighted(WORK_TYPES)
+        self.statuses = _weighted(STATUSES)
+        self.application_counts = _weighted(APPLICATION_COUNTS)
+        self.message_counts = _weighted(MESSAGE_COUNTS)
+        self.skill_draws = {role: _zipf(skills, 0.7) for role, (_, _, skills) in ROLES.items()}
+
+        gazetteer = geocoder.get_gazetteer()
+        self.cities = _Weighted(
+            [(gazetteer.labels[r], *gazetteer.coordinates(r)) for r in range(len(gazetteer.labels))],
+            gazetteer.populations,
+        )
+
+    # Building blocks
+
+    def _name(self):
+        return self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+
+    def _skills(self, role, count):
+        skills = []
+        for skill in self.skill_draws[role].draw(self.rng, k=count * 2):
+            if skill not in skills:
+                skills.append(skill)
+        return skills[:count]
+
+    def _past(self, max_days):
+        return self.now - timedelta(seconds=self.rng.randint(0, max_days * 24 * 3600))
+
+    def _first_unused_number(self, kind):
+        """First unused number for generated ``kind`` usernames, so reruns add rather than collide"""
+        stem = f'{self.prefix}_{kind}_'
+        usernames = User.objects.filter(username__startswith=stem).values_list('username', flat=True)
+        numbers = [int(name[len(stem):]) for name in usernames.iterator() if name[len(stem):].isdigit()]
+        return max(numbers, default=-1) + 1
+
+    def _bulk_create(self, model, objects, timestamps=()):
+        """
+        ``bulk_create`` keeping the generated values of the auto_now(_add)
+        ``timestamps`` fields, which the insert stamps with the current time:
+        they are written back with one executemany UPDATE.
+        """
+        generated = [[getattr(obj, name) for name in timestamps] for obj in objects]
+        model.objects.bulk_create(objects, batch_size=self.batch_size)
+        if not (timestamps and objects):
+            return
+
+        fields = [model._meta.get_field(name) for name in timestamps]
+        quote = connection.ops.quote_name
+        sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+            quote(model._meta.db_table),
+            ', '.join(f'{quote(field.column)} = %s' for field in fields),
+            quote(model._meta.pk.column),
+        )
+        params = []
+        for obj, values in zip(objects, generated):
+            for field, value in zip(fields, values):
+                setattr(obj, field.attname, value)
+            params.append([field.get_db_prep_value(value, connection) for field, value in zip(fields, values)] + [obj.pk])
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+
+    def _users(self, kind, user_type, count):
+        """Create ``count`` users with their UserProfile; returns ``(users, user_profiles)``"""
+        # Looked up once per run; later batches continue from the counter
+        if kind not in self._next_numbers:
+            self._next_numbers[kind] = self._first_unused_number(kind)
+        start = self._next_numbers[kind]
+        self._next_numbers[kind] += count
+        users = []
+        for number in range(start, start + count):
+            first, last = self._name()
+            joined = self._past(720)
+            username = f'{self.prefix}_{kind}_{number}'
+            users.append(User(
+                username=username, email=f'{username}@example.com', password=self.password,
+                first_name=first, last_name=last, date_joined=joined,
+            ))
+        User.objects.bulk_create(users, batch_size=self.batch_size)
+        user_profiles = [
+            UserProfile(user=user, user_type=user_type, created_at=user.date_joined, updated_at=user.date_joined)
+            for user in users
+        ]
+        self._bulk_create(UserProfile, user_profiles, ['created_at', 'updated_at'])
+        return users, user_profiles
+
+    # Generation steps
+
+    def recruiters(self, count):
+        recruiters = []
+        for start in range(0, count, self.batch_size):
+            with transaction.atomic():
+                _, user_profiles = self._users('recruiter', 'recruiter', min(self.batch_size, count - start))
+                batch = [
+                    RecruiterProfile(
+                        user_profile=user_profile,
+                        company_name=f'{self.rng.choice(COMPANY_WORDS)}{self.rng.choice(COMPANY_WORDS).lower()} '
+                                     f'{self.rng.choice(COMPANY_SUFFIXES)}',
+                        company_description='We build software people rely on every day.',
+                    )
+                    for user_profile in user_profiles
+                ]
+                RecruiterProfile.objects.bulk_create(batch, batch_size=self.batch_size)
+                recruiters.extend(batch)
+        self.log(f'Created {len(recruiters)} recruiter(s)')
+        return recruiters
+
+    def jobs(self, recruiters, count):
+        """Returns ``{role: [(job_id, recruiter_user_id), ...]}``"""
+        by_role = {role: [] for role in ROLES}
+        # A few recruiters post most of the jobs
+        posters = _zipf(recruiters, 0.9)
+        for start in range(0, count, self.batch_size):
+            batch, roles = [], []
+            for _ in range(min(self.batch_size, count - start)):
+                role, level = self.roles.one(self.rng), self.levels.one(self.rng)
+                _, title, _ = ROLES[role]
+                _, prefix, _, (salary_low, salary_high) = LEVELS[level]
+                work_type = self.work_types.one(self.rng)
+                skills = self._skills(role, self.rng.randint(3, 6))
+                recruiter = posters.one(self.rng)
+                if work_type == 'remote':
+                    location, latitude, longitude = '', None, None
+                else:
+                    location, latitude, longitude = self.cities.one(self.rng)
+                    self.job_points.add((latitude, longitude))
+                created = self._past(180)
+                salary_min = self.rng.randint(salary_low, (salary_low + salary_high) // 2) * 1000
+                batch.append(Job(
+                    title=f'{prefix} {title}'.strip(),
+                    description=(
+                        f'Join {recruiter.company_name} as a {title.lower()}. You will work with '
+                        f'{", ".join(skills)} on products used by thousands of customers. '
+                    ) * 3,
+                    company=recruiter.company_name,
+                    location=location, latitude=latitude, longitude=longitude,
+                    skills_required=', '.join(skills),
+                    salary_min=salary_min,
+                    salary_max=salary_min + self.rng.randint(10, 50) * 1000,
+                    work_type=work_type,
+                    visa_sponsorship=self.rng.random() < 0.3,
+                    experience_level=level,
+                    recruiter=recruiter,
+                    created_at=created, updated_at=created,
+                    is_active=self.rng.random() < 0.9,
+                ))
+                roles.append(role)
+            with transaction.atomic():
+                self._bulk_create(Job, batch, ['created_at', 'updated_at'])
+                for job, role in zip(batch, roles):
+                    by_role[role].append((job.pk, job.recruiter.user_profile.user_id))
+        self.log(f'Created {count} job(s)')
+        return by_role
+
+    def seekers(self, jobs_by_role, count):
+        """Create job seekers along with their applications and message threads"""
+        all_jobs = [job for jobs in jobs_by_role.values() for job in jobs]
+        # Heavy-tailed popularity: a few jobs get most of the applications
+        popular = {role: _zipf(jobs, 0.8) for role, jobs in jobs_by_role.items() if jobs}
+        popular_any = _zipf(all_jobs, 0.8) if all_jobs else None
+
+        totals = {'seekers': 0, 'applications': 0, 'messages': 0}
+        for start in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - start)
+            with transaction.atomic():
+                users, user_profiles = self._users('seeker', 'job_seeker', size)
+                seeker_profiles, profiles, seeker_roles = [], [], []
+                for user, user_profile in zip(users, user_profiles):
+                    role, level = self.roles.one(self.rng), self.levels.one(self.rng)
+                    _, title, _ = ROLES[role]
+                    _, prefix, (years_low, years_high), _ = LEVELS[level]
+                    skills = ', '.join(self._skills(role, self.rng.randint(4, 8)))
+                    years = self.rng.randint(years_low, years_high)
+                    if self.rng.random() < 0.1:
+                        location, latitude, longitude = '', None, None
+                    else:
+                        location, latitude, longitude = self.cities.one(self.rng)
+                    seeker_profiles.append(JobSeekerProfile(
+                        user_profile=user_profile, skills=skills, experience_years=years,
+                        resume_uploaded=self.rng.random() < 0.6,
+                    ))
+                    profiles.append(Profile(
+                        user=user,
+                        headline=f'{prefix} {title} with {years} year{"s" if years != 1 else ""} of experience'.strip(),
+                        skills=skills,
+                        education=self.rng.choice(['B.S. Computer Science', 'M.S. Computer Science', 'B.A. Mathematics',
+                                                   'Coding bootcamp', 'B.S. Electrical Engineering', '']),
+                        work_experience=f'{years} years building software as a {title.lower()}.',
+                        location=location, latitude=latitude, longitude=longitude,
+                        projects=f'Open-source {skills.split(", ")[0]} project',
+                        show_location=self.rng.random() < 0.8,
+                        created_at=user.date_joined, updated_at=user.date_joined,
+                    ))
+                    seeker_roles.append(role)
+                JobSeekerProfile.objects.bulk_create(seeker_profiles, batch_size=self.batch_size)
+                self._bulk_create(Profile, profiles, ['created_at', 'updated_at'])
+
+                if all_jobs:
+                    applications = self._applications(users, seeker_roles, popular, popular_any)
+                    totals['applications'] += len(applications)
+                    totals['messages'] += self._messages(applications)
+            totals['seekers'] += size
+            self.log(f"  {totals['seekers']}/{count} seekers, {totals['applications']} applications, "
+                     f"{totals['messages']} messages")
+        return totals
+
+    def _applications(self, users, roles, popular, popular_any):
+        """Applications and status history of one batch of seekers; returns ``(application, recruiter_user_id)``"""
+        applications, recruiter_ids = [], []
+        for user, role in zip(users, roles):
+            chosen = {}
+            for _ in range(self.application_counts.one(self.rng)):
+                pool = popular.get(role) if self.rng.random() < IN_ROLE_APPLICATIONS else None
+                job_id, recruiter_id = (pool or popular_any).one(self.rng)
+                chosen[job_id] = recruiter_id
+            for job_id, recruiter_id in chosen.items():
+                applied = max(self._past(120), user.date_joined)
+                status = self.statuses.one(self.rng)
+                changed = applied if status == 'applied' else min(
+                    applied + timedelta(hours=self.rng.randint(4, 24 * 21)), self.now
+                )
+                applications.append(JobApplication(
+                    job_id=job_id, applicant=user, status=status,
+                    notified_status=status if self.rng.random() < 0.8 else 'applied',
+                    cover_note='I am excited about this role and would bring my experience to the team.',
+                    rejection_reason='Position filled' if status == 'rejected' else None,
+                    applied_at=applied, updated_at=changed, status_updated_at=changed,
+                ))
+                recruiter_ids.append(recruiter_id)
+        for application in applications:
+            application.notified = application.notified_status == application.status
+        self._bulk_create(JobApplication, applications, ['applied_at', 'updated_at'])
+
+        events = []
+        for application, recruiter_id in zip(applications, recruiter_ids):
+            events.append(ApplicationStatusEvent(
+                application_id=application.pk, job_id=application.job_id, from_status='', to_status='applied',
+                changed_by_id=application.applicant_id, created_at=application.applied_at,
+            ))
+            if application.status != 'applied':
+                events.append(ApplicationStatusEvent(
+                    application_id=application.pk, job_id=application.job_id, from_status='applied',
+                    to_status=application.status, changed_by_id=recruiter_id,
+                    created_at=application.status_updated_at,
+                ))
+        ApplicationStatusEvent.objects.bulk_create(events, batch_size=self.batch_size)
+        return list(zip(applications, recruiter_ids))
+
+    def _messages(self, applications):
+        """Message threads for a batch of applications, indexed and with read watermarks"""
+        messages = []
+        for application, recruiter_id in applications:
+            sent = application.applied_at
+            for number in range(self.message_counts.one(self.rng)):
+                sent = min(sent + timedelta(minutes=self.rng.randint(5, 60 * 48)), self.now)
+                from_recruiter = number % 2 == 0
+                messages.append(Message(
+                    application=application,
+                    sender_id=recruiter_id if from_recruiter else application.applicant_id,
+                    content=self.rng.choice(MESSAGES_FROM_RECRUITER if from_recruiter else MESSAGES_FROM_APPLICANT),
+                    created_at=sent,
+                ))
+        self._bulk_create(Message, messages, ['created_at'])
+        search.index_messages(messages)
+
+        # Both sides have read most threads up to their latest message
+        last_message = {}
+        for message in messages:
+            last_message[message.application_id] = message
+        read_states = []
+        for application, recruiter_id in applications:
+            message = last_message.get(application.pk)
+            if message is None or self.rng.random() < 0.3:
+                continue
+            for user_id in (recruiter_id, application.applicant_id):
+                read_states.append(MessageReadState(
+                    application=application, user_id=user_id, last_read_message_id=message.pk,
+                ))
+        MessageReadState.objects.bulk_create(read_states, batch_size=self.batch_size)
+        return len(messages)
+
+    def saved_searches(self, recruiters, per_recruiter):
+        searches = []
+        for recruiter in recruiters:
+            for _ in range(self.rng.randint(0, per_recruiter * 2)):
+                role = self.roles.one(self.rng)
+                skill = self._skills(role, 1)[0]
+                location = self.cities.one(self.rng)[0].split(',')[0] if self.rng.random() < 0.5 else ''
+                created = self._past(90)
+                searches.append(SavedSearch(
+                    recruiter=recruiter,
+                    name=f'{skill} candidates' + (f' in {location}' if location else ''),
+                    skills=skill,
+                    location=location,
+                    notification_enabled=self.rng.random() < 0.7,
+                    created_at=created, updated_at=created,
+                ))
+        self._bulk_create(SavedSearch, searches, ['created_at', 'updated_at'])
+        self.log(f'Created {len(searches)} saved search(es)')
+        return len(searches)
+
+
+def generate(rng, recruiters=10, jobs=200, seekers=1000, saved_searches_per_recruiter=2,
+             batch_size=5000, prefix='sample', password='password123', log=None):
+    """
+    Generate a dataset of the given size. Returns counts of what was created.
+    Every batch is its own transaction, so an interrupted run keeps the batches
+    it finished; ``populate_sample_data --flush`` removes them.
+    """
+    generator = Generator(rng, batch_size=batch_size, prefix=prefix, password=password, log=log)
+    recruiter_profiles = generator.recruiters(recruiters)
+    jobs_by_role = generator.jobs(recruiter_profiles, jobs) if recruiter_profiles else {}
+    totals = generator.seekers(jobs_by_role, seekers)
+    with transaction.atomic():
+        totals['saved_searches'] = generator.saved_searches(recruiter_profiles, saved_searches_per_recruiter)
+
+    job_ids = sorted(job_id for role_jobs in jobs_by_role.values() for job_id, _ in role_jobs)
+    for start in range(0, len(job_ids), batch_size):
+        JobStats.rebuild(job_ids[start:start + batch_size])
+
+    # What the Job signals would have done for each row
+    pagecache.bump_generation('jobs')
+    for latitude, longitude in generator.job_points:
+        tiles.invalidate_point('jobs', latitude, longitude)
+
+    totals.update(recruiters=len(recruiter_profiles), jobs=len(job_ids))
+    return totals
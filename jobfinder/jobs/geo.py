@@ -0,0 +1,45 @@
+"""
+Server-side clustering of map points.
+
+Points are snapped to a grid whose cell size follows the map zoom level (a
+cell is about ``CLUSTER_CELL_PIXELS`` wide on screen), and grouped in SQL, so
+the number of rows returned depends on the visible area and zoom rather than
+on how many points there are.
+"""
+from django.db.models import Avg, Count, F, FloatField, Value
+from django.db.models.functions import Floor
+
+MAX_ZOOM = 20
+TILE_PIXELS = 256
+CLUSTER_CELL_PIXELS = 64
+
+
+def cell_degrees(zoom):
+    """Width in degrees of one clustering cell at ``zoom``"""
+    return 360.0 * CLUSTER_CELL_PIXELS / (TILE_PIXELS * 2 ** zoom)
+
+
+def parse_zoom(value):
+    """Zoom level from a query parameter, or None if absent; raises ValueError if invalid"""
+    if value in (None, ''):
+        return None
+    zoom = int(value)
+    if not 0 <= zoom <= MAX_ZOOM:
+        raise ValueError(f'zoom must be between 0 and {MAX_ZOOM}')
+    return zoom
+
+
+def grid_clusters(queryset, zoom, lat_field, lng_field):
+    """
+    Group ``queryset`` into grid cells at ``zoom``.
+    Returns ``values()`` rows with ``lat``/``lng`` (the cell's centroid) and ``count``.
+    """
+    size = Value(cell_degrees(zoom), output_field=FloatField())
+    return queryset.annotate(
+        cell_y=Floor(F(lat_field) / size),
+        cell_x=Floor(F(lng_field) / size),
+    ).order_by().values('cell_y', 'cell_x').annotate(
+        lat=Avg(lat_field),
+        lng=Avg(lng_field),
+        count=Count('pk'),
+    ).order_by('cell_y', 'cell_x')
@@ -0,0 +1,262 @@
+"""
+Offline geocoding of free-text locations ("Atlanta, GA", "Boston 02108",
+"New York, New York (Hybrid)") against a bundled city and postcode gazetteer.
+
+The gazetteer (``jobs/data/gazetteer.tsv`` unless ``settings.GEOCODER_DATASET``
+points elsewhere) is loaded once per process into compact parallel arrays:
+
+* a sorted array of normalized city names, for prefix lookups (autocomplete)
+* exact-name indexes: ``name`` -> records and ``postcode`` -> record, plus the
+  region and country names each record answers to
+
+Names include the common aliases listed in the gazetteer ("NYC", "San
+Francisco Bay Area"), so they geocode and autocomplete like the city itself.
+
+A region or country after the city ("Paris, TX", "London, UK") must match the
+city, or the location is not recognised; it never falls back to another city
+of the same name. Free text without commas is only accepted when every word is
+part of a place name, a region or country, or a known filler word ("Remote -
+greater Boston area"), so job titles such as "Mobile app developer" are not
+read as cities.
+
+Lookups are dictionary hits plus an LRU cache of recent inputs, so there is
+no external service and no per-request parsing.
+"""
+import bisect
+import os
+import re
+import threading
+import unicodedata
+from array import array
+from functools import lru_cache
+
+from django.conf import settings
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(__file__), 'data', 'gazetteer.tsv')
+
+# Longest place name, in words, tried when scanning free text for a city
+MAX_NAME_WORDS = 4
+
+US_STATES = {
+    'alabama': 'al', 'alaska': 'ak', 'arizona': 'az', 'arkansas': 'ar', 'california': 'ca',
+    'colorado': 'co', 'connecticut': 'ct', 'delaware': 'de', 'district of columbia': 'dc',
+    'florida': 'fl', 'georgia': 'ga', 'hawaii': 'hi', 'idaho': 'id', 'illinois': 'il',
+    'indiana': 'in', 'iowa': 'ia', 'kansas': 'ks', 'kentucky': 'ky', 'louisiana': 'la',
+    'maine': 'me', 'maryland': 'md', 'massachusetts': 'ma', 'michigan': 'mi', 'minnesota': 'mn',
+    'mississippi': 'ms', 'missouri': 'mo', 'montana': 'mt', 'nebraska': 'ne', 'nevada': 'nv',
+    'new hampshire': 'nh', 'new jersey': 'nj', 'new mexico': 'nm', 'new york': 'ny',
+    'north carolina': 'nc', 'north dakota': 'nd', 'ohio': 'oh', 'oklahoma': 'ok', 'oregon': 'or',
+    'pennsylvania': 'pa', 'rhode island': 'ri', 'south carolina': 'sc', 'south dakota': 'sd',
+    'tennessee': 'tn', 'texas': 'tx', 'utah': 'ut', 'vermont': 'vt', 'virginia': 'va',
+    'washington': 'wa', 'west virginia': 'wv', 'wisconsin': 'wi', 'wyoming': 'wy',
+}
+
+# Names of non-US regions in the gazetteer -> region code
+REGION_NAMES = {
+    'alberta': 'ab', 'british columbia': 'bc', 'ontario': 'on', 'quebec': 'qc',
+    'england': 'eng', 'ile de france': 'idf', 'new south wales': 'nsw', 'victoria': 'vic',
+    'karnataka': 'ka', 'maharashtra': 'mh', 'telangana': 'tg', 'community of madrid': 'md',
+    'catalonia': 'ct', 'lazio': 'lz', 'north holland': 'nh', 'zurich': 'zh', 'sao paulo': 'sp',
+}
+
+# Country code -> other names it is written as
+COUNTRY_NAMES = {
+    'us': ('usa', 'united states', 'united states of america', 'america'),
+    'gb': ('uk', 'united kingdom', 'great britain', 'britain'),
+    'au': ('australia',), 'br': ('brazil',), 'ca': ('canada',), 'ch': ('switzerland',),
+    'de': ('germany',), 'es': ('spain',), 'fr': ('france',), 'ie': ('ireland',),
+    'il': ('israel',), 'in': ('india',), 'it': ('italy',), 'jp': ('japan',),
+    'mx': ('mexico',), 'nl': ('netherlands', 'holland'), 'se': ('sweden',), 'sg': ('singapore',),
+}
+
+# Words that may surround a city in free text without making it something else
+FILLER_WORDS = frozenset({
+    'remote', 'hybrid', 'onsite', 'on', 'site', 'office', 'based', 'in', 'near', 'around',
+    'greater', 'area', 'metro', 'metropolitan', 'region', 'downtown', 'the', 'and', 'or', 'of',
+})
+
+_POSTCODE_RE = re.compile(r'\b(\d{5})(?:-\d{4})?\b')
+_PARENTHETICAL_RE = re.compile(r'\([^)]*\)')
+_NON_WORD_RE = re.compile(r'[^a-z0-9,]+')
+
+
+def normalize(text):
+    """Lowercase, strip accents, punctuation and parentheticals; keep commas as separators"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    text = _PARENTHETICAL_RE.sub(' ', text)
+    return ' '.join(_NON_WORD_RE.sub(' ', text).replace(',', ' , ').split())
+
+
+def _alias(name):
+    """Extra lookup key for names with common abbreviations (``st louis`` -> ``saint louis``)"""
+    if name.startswith('st '):
+        return 'saint ' + name[3:]
+    if name.startswith('saint '):
+        return 'st ' + name[6:]
+    return None
+
+
+def _strip_filler(part):
+    return ' '.join(word for word in part.split() if word not in FILLER_WORDS)
+
+
+def _qualifier(part):
+    """Region code or country name for a qualifier such as ``texas``, ``tx`` or ``uk``"""
+    return US_STATES.get(part) or REGION_NAMES.get(part) or part
+
+
+class Gazetteer:
+    """In-memory city/postcode index built from a gazetteer TSV file"""
+
+    def __init__(self, path):
+        self.labels = []
+        self.latitudes = array('d')
+        self.longitudes = array('d')
+        self.populations = array('q')
+        self.by_name = {}
+        self.records_by_name = {}
+        self.qualifiers = []
+        self.by_postcode = {}
+
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip() or line.startswith('#'):
+                    continue
+                fields = line.rstrip('\n').split('\t')
+                name, region, country, latitude, longitude, population = fields[:6]
+                postcodes = fields[6] if len(fields) > 6 else ''
+                aliases = fields[7] if len(fields) > 7 else ''
+                self._add(
+                    name, region, country, float(latitude), float(longitude), int(population), postcodes, aliases
+                )
+
+        # Sorted (name, record) pairs flattened into two parallel arrays for prefix search
+        self.qualifier_names = frozenset().union(*self.qualifiers)
+
+        pairs = sorted(self.by_name.items())
+        self.sorted_names = [name for name, _ in pairs]
+        self.sorted_records = array('l', (record for _, record in pairs))
+
+    def _add(self, name, region, country, latitude, longitude, population, postcodes, aliases=''):
+        record = len(self.labels)
+        # Labels are themselves recognised by lookup(), so they must be unambiguous
+        self.labels.append(f'{name}, {region}' if country == 'US' else f'{name}, {region}, {country}')
+        self.latitudes.append(latitude)
+        self.longitudes.append(longitude)
+        self.populations.append(population)
+
+        country_key = normalize(country)
+        self.qualifiers.append(frozenset(filter(None, (
+            normalize(region), country_key, *COUNTRY_NAMES.get(country_key, ()),
+        ))))
+
+        keys = [normalize(name)] + [normalize(alias) for alias in aliases.split(',')]
+        variants = {variant for key in keys if key for variant in (key, _alias(key)) if variant}
+        for variant in variants:
+            # Ambiguous names ("Portland", "Springfield") resolve to the most populous city
+            best = self.by_name.get(variant)
+            if best is None or population > self.populations[best]:
+                self.by_name[variant] = record
+            self.records_by_name.setdefault(variant, []).append(record)
+        for postcode in filter(None, postcodes.split(',')):
+            self.by_postcode[postcode.strip()] = record
+
+    def coordinates(self, record):
+        return self.latitudes[record], self.longitudes[record]
+
+    def lookup(self, text):
+        """Record index for normalized ``text``, or None"""
+        postcode = _POSTCODE_RE.search(text)
+        if postcode and postcode.group(1) in self.by_postcode:
+            return self.by_postcode[postcode.group(1)]
+
+        parts = [_POSTCODE_RE.sub('', part).strip() for part in text.split(',')]
+        # Leading parts with only filler words ("Remote, Boston, MA") are skipped
+        parts = [part for part in parts if part]
+        while parts and not _strip_filler(parts[0]):
+            parts.pop(0)
+        if not parts:
+            return None
+        # "OR" and "IN" are filler words but also state codes when on their own
+        qualifiers = [_qualifier(_strip_filler(part) or part) for part in parts[1:]]
+        # Names may contain filler words themselves ("Bay Area")
+        for city in (parts[0], _strip_filler(parts[0])):
+            if city in self.records_by_name:
+                return self._match(city, qualifiers)
+        return self._scan(parts[0].split(), qualifiers)
+
+    def _match(self, name, qualifiers):
+        """Most populous city called ``name`` matching every region/country in ``qualifiers``"""
+        records = [
+            record for record in self.records_by_name.get(name, ())
+            if all(qualifier in self.qualifiers[record] for qualifier in qualifiers)
+        ]
+        return max(records, key=lambda r: self.populations[r]) if records else None
+
+    def _scan(self, words, qualifiers):
+        # Free text ("Remote - greater boston area", "Austin TX"): split into
+        # place names (longest first, up to MAX_NAME_WORDS words), filler words,
+        # and regions or countries; any other word means this is not a location
+        name = None
+        start = 0
+        while start < len(words):
+            for size in range(min(MAX_NAME_WORDS, len(words) - start), 0, -1):
+                phrase = ' '.join(words[start:start + size])
+                if name is None and phrase in self.records_by_name:
+                    name = phrase
+                    break
+                if size == 1 and phrase in FILLER_WORDS:
+                    break
+                if name is not None and _qualifier(phrase) in self.qualifier_names:
+                    qualifiers = [*qualifiers, _qualifier(phrase)]
+                    break
+            else:
+                return None
+            start += size
+        return self._match(name, qualifiers) if name is not None else None
+
+    def complete(self, prefix, limit=10):
+        """Labels of cities whose name starts with ``prefix``, most populous first"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        start = bisect.bisect_left(self.sorted_names, prefix)
+        end = bisect.bisect_right(self.sorted_names, prefix + '\uffff')
+        records = sorted(set(self.sorted_records[start:end]), key=lambda r: -self.populations[r])
+        return [self.labels[record] for record in records[:limit]]
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """The process-wide gazetteer, loaded on first use"""
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer(getattr(settings, 'GEOCODER_DATASET', None) or DEFAULT_DATASET)
+    return _gazetteer
+
+
+@lru_cache(maxsize=4096)
+def geocode(text):
+    """``(latitude, longitude)`` for a free-text location, or None if it is not recognised"""
+    text = normalize(text)
+    if not text:
+        return None
+    gazetteer = get_gazetteer()
+    record = gazetteer.lookup(text)
+    return gazetteer.coordinates(record) if record is not None else None
+
+
+def geocode_many(texts):
+    """Geocode a batch of locations; used by worker processes of the backfill command"""
+    return [geocode(text) for text in texts]
+
+
+def complete(prefix, limit=10):
+    """Labels of the cities whose name (or alias) starts with ``prefix``, most populous first"""
+    return get_gazetteer().complete(prefix, limit)
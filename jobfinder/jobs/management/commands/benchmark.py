@@ -0,0 +1,248 @@
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from jobfinder import pagecache
+from jobs import datagen
+from jobs.models import Job, JobApplication, JobStats
+
+MIN_PEAK_DELTA_KIB = 64
+
+# Settings for the run: private caches (so the real ones are neither read nor
+# cleared), no rate limiting, no replica, and no per-request instrumentation
+# beyond what is being measured
+BENCHMARK_SETTINGS = {
+    'CACHES': {
+        alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'benchmark_{alias}'}
+        for alias in settings.CACHES
+    },
+    'RATE_LIMIT_ENABLED': False,
+    'REPLICA_DATABASE_ALIAS': None,
+    'QUERY_INSPECTOR_ENABLED': False,
+    'METRICS_ENABLED': False,
+    'DEBUG': False,
+}
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = ('Benchmark the main pages and AJAX endpoints on a freshly seeded test database, '
+            'and compare the results with a stored baseline')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=30,
+            help='Timed requests per scenario',
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=3,
+            help='Untimed requests per scenario before measuring',
+        )
+        parser.add_argument(
+            '--scale',
+            type=int,
+            default=1,
+            help='Multiplier for the size of the seeded dataset (1 = 5 recruiters, 100 jobs, 300 job seekers)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=2340,
+            help='Random seed for the dataset',
+        )
+        parser.add_argument(
+            '--baseline',
+            default=str(settings.BASE_DIR / 'benchmark_baseline.json'),
+            help='Baseline JSON file to compare against (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--save-baseline',
+            action='store_true',
+            help='Write the results to the baseline file instead of comparing',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.25,
+            help='Allowed relative slowdown in latency or memory before it counts as a regression',
+        )
+        parser.add_argument(
+            '--min-delta-ms',
+            type=float,
+            default=2.0,
+            help='Latency increases smaller than this are noise, whatever the relative change',
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(**BENCHMARK_SETTINGS):
+                self.stdout.write(f"Seeding dataset (scale {options['scale']}, seed {options['seed']})...")
+                fixtures = self._seed(random.Random(options['seed']), options['scale'])
+                results = self._run(self._scenarios(fixtures), options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self._report(results)
+        if options['save_baseline']:
+            with open(options['baseline'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {options['baseline']}"))
+            return
+        self._compare(results, options)
+
+    def _seed(self, rng, scale):
+        """A deterministic dataset from the sample data generator; returns the users and objects the scenarios use"""
+        datagen.generate(rng, recruiters=5 * scale, jobs=100 * scale, seekers=300 * scale, prefix='bench')
+
+        # The most popular posting is the busy pipeline the recruiter scenario opens,
+        # and the most active job seeker is the one browsing and chatting
+        busy_job = Job.objects.select_related('recruiter__user_profile__user').get(
+            id=JobStats.objects.order_by('-total_applications', 'job_id').values('job_id')[:1]
+        )
+        seeker = User.objects.annotate(
+            application_count=Count('job_applications')
+        ).filter(userprofile__user_type='job_seeker').order_by('-application_count', 'id').first()
+        return {
+            'recruiter': busy_job.recruiter.user_profile.user,
+            'seeker': seeker,
+            'busy_job': busy_job,
+            'seeker_application': JobApplication.objects.filter(applicant=seeker).annotate(
+                message_count=Count('messages')
+            ).order_by('-message_count', 'id').first(),
+        }
+
+    def _scenarios(self, fixtures):
+        """
+        ``(name, user or None, path, setup or None)`` of every benchmarked
+        request; ``setup`` runs, untimed, before each request of the scenario
+        """
+        def cold_page_cache():
+            pagecache.bump_generation('jobs')
+
+        search = '/jobs/?search=python&location=Atlanta'
+        return [
+            # Anonymous pages are served from the page cache after the first request,
+            # so the search itself is only measured with the cache emptied every time
+            ('anonymous_job_search', None, search, None),
+            ('anonymous_job_search_cold', None, search, cold_page_cache),
+            ('seeker_job_list', fixtures['seeker'], '/jobs/', None),
+            ('recruiter_pipeline', fixtures['recruiter'], f"/jobs/{fixtures['busy_job'].id}/pipeline/", None),
+            ('candidate_search', fixtures['recruiter'], '/profiles/search/?skills=python', None),
+            ('chat_unread_count', fixtures['seeker'], '/jobs/ajax/unread-count/', None),
+            ('chat_conversations', fixtures['seeker'], '/jobs/ajax/conversations/', None),
+            ('chat_messages', fixtures['seeker'], f"/jobs/ajax/messages/{fixtures['seeker_application'].id}/", None),
+        ]
+
+    def _run(self, scenarios, options):
+        results = {}
+        for name, user, path, setup in scenarios:
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+            setup = setup or (lambda: None)
+
+            for _ in range(options['warmup']):
+                setup()
+                self._request(client, name, path)
+
+            latencies, queries = [], []
+            for _ in range(options['iterations']):
+                setup()
+                counter = _QueryCounter()
+                with ExitStack() as stack:
+                    for db in connections.all():
+                        stack.enter_context(db.execute_wrapper(counter))
+                    started = time.perf_counter()
+                    self._request(client, name, path)
+                    latencies.append(time.perf_counter() - started)
+                queries.append(counter.count)
+
+            # Measured separately: tracing allocations slows every request down
+            setup()
+            tracemalloc.start()
+            self._request(client, name, path)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            latencies.sort()
+            results[name] = {
+                'p50_ms': round(_percentile(latencies, 0.50) * 1000, 2),
+                'p95_ms': round(_percentile(latencies, 0.95) * 1000, 2),
+                'p99_ms': round(_percentile(latencies, 0.99) * 1000, 2),
+                'queries': statistics.median(queries),
+                'peak_kib': round(peak / 1024, 1),
+            }
+        return results
+
+    def _request(self, client, name, path):
+        response = client.get(path)
+        if response.status_code != 200:
+            raise CommandError(f'{name}: GET {path} returned {response.status_code}')
+        return response
+
+    def _report(self, results):
+        self.stdout.write(f"\n{'scenario':<26} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'peak KiB':>10}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<26} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+                f"{result['queries']:>8g} {result['peak_kib']:>10.1f}"
+            )
+
+    def _compare(self, results, options):
+        path, threshold = options['baseline'], options['threshold']
+        try:
+            with open(path) as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            self.stdout.write(self.style.WARNING(f'\nNo baseline at {path}; run with --save-baseline to create one'))
+            return
+
+        regressions = []
+        for name, result in results.items():
+            expected = baseline.get(name)
+            if expected is None:
+                continue
+            # Query counts are deterministic, so any increase is a regression
+            if result['queries'] > expected['queries']:
+                regressions.append(f"{name}: {result['queries']:g} queries (baseline {expected['queries']:g})")
+            # Small absolute changes are timer and allocator noise on fast endpoints
+            for metric, min_delta in (('p50_ms', options['min_delta_ms']),
+                                      ('p95_ms', options['min_delta_ms']),
+                                      ('peak_kib', MIN_PEAK_DELTA_KIB)):
+                if result[metric] > expected[metric] * (1 + threshold) and result[metric] - expected[metric] > min_delta:
+                    regressions.append(f'{name}: {metric} {result[metric]} (baseline {expected[metric]})')
+
+        if regressions:
+            raise CommandError(
+                f'{len(regressions)} regression(s) against {path}:\n  ' + '\n  '.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS(f'\nNo regressions against {path} (threshold {threshold:.0%})'))
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
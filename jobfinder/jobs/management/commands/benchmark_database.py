@@ -0,0 +1,210 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SQLITE_ENGINE = 'django.db.backends.sqlite3'
+
+LOCATIONS = ['Atlanta, GA', 'Austin, TX', 'Boston, MA', 'Chicago, IL', 'Denver, CO', 'Seattle, WA']
+
+
+class _Worker(threading.Thread):
+    """
+    One simulated request loop against the scratch database. Like Django, it
+    opens a connection per request unless the profile sets CONN_MAX_AGE, and
+    runs the profile's init_command pragmas on every new connection.
+    """
+
+    def __init__(self, path, profile, operation, rows, stop):
+        super().__init__(daemon=True)
+        self.path = path
+        self.profile = profile
+        self.operation = operation
+        self.rows = rows
+        self.stop = stop
+        self.latencies = []
+        self.errors = 0
+
+    def connect(self):
+        options = self.profile.get('OPTIONS', {})
+        conn = sqlite3.connect(self.path, timeout=options.get('timeout', 5), isolation_level=None)
+        conn.execute('PRAGMA foreign_keys = ON')
+        for command in options.get('init_command', '').split(';'):
+            if command.strip():
+                conn.execute(command)
+        return conn
+
+    def run(self):
+        persistent = bool(self.profile.get('CONN_MAX_AGE', 0))
+        begin = f"BEGIN {self.profile.get('OPTIONS', {}).get('transaction_mode') or 'DEFERRED'}"
+        rng = random.Random(self.ident)
+        conn = None
+        while not self.stop.is_set():
+            started = time.perf_counter()
+            try:
+                if conn is None:
+                    conn = self.connect()
+                self.operation(conn, begin, rng, self.rows)
+                self.latencies.append(time.perf_counter() - started)
+            except sqlite3.OperationalError:
+                # "database is locked": the request would have failed with a 500
+                self.errors += 1
+                if conn is not None and conn.in_transaction:
+                    conn.rollback()
+            finally:
+                if conn is not None and not persistent:
+                    conn.close()
+                    conn = None
+        if conn is not None:
+            conn.close()
+
+
+def _read(conn, begin, rng, rows):
+    """A job-list style read: filtered, ordered page of rows"""
+    conn.execute(
+        'SELECT id, title, location, salary FROM bench_job WHERE location = ? ORDER BY updated_at DESC LIMIT 20',
+        (rng.choice(LOCATIONS),)
+    ).fetchall()
+
+
+def _write(conn, begin, rng, rows):
+    """A status-update style write: read-modify-write inside one transaction, like atomic()"""
+    job_id = rng.randint(1, rows)
+    conn.execute(begin)
+    salary = conn.execute('SELECT salary FROM bench_job WHERE id = ?', (job_id,)).fetchone()[0]
+    conn.execute('UPDATE bench_job SET salary = ?, updated_at = ? WHERE id = ?', (salary + 1, time.time(), job_id))
+    conn.execute('INSERT INTO bench_event (job_id, created_at) VALUES (?, ?)', (job_id, time.time()))
+    conn.execute('COMMIT')
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = ('Compare throughput of the SQLite database profiles in settings.DATABASE_PROFILES '
+            'under concurrent readers and writers, using a scratch database')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'profiles',
+            nargs='*',
+            help='Profiles to compare (default: every SQLite profile)',
+        )
+        parser.add_argument(
+            '--readers',
+            type=int,
+            default=8,
+            help='Number of concurrent reader threads',
+        )
+        parser.add_argument(
+            '--writers',
+            type=int,
+            default=2,
+            help='Number of concurrent writer threads',
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=5.0,
+            help='Seconds to run each profile for',
+        )
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=5000,
+            help='Rows in the scratch table',
+        )
+
+    def handle(self, *args, **options):
+        profiles = options['profiles'] or [
+            name for name, profile in settings.DATABASE_PROFILES.items() if profile['ENGINE'] == SQLITE_ENGINE
+        ]
+        for name in profiles:
+            if name not in settings.DATABASE_PROFILES:
+                raise CommandError(f'Unknown database profile "{name}"')
+            if settings.DATABASE_PROFILES[name]['ENGINE'] != SQLITE_ENGINE:
+                raise CommandError(f'"{name}" is not an SQLite profile; only SQLite profiles can be benchmarked')
+
+        self.stdout.write(
+            f"{options['readers']} reader(s), {options['writers']} writer(s), "
+            f"{options['duration']:g}s per profile, {options['rows']} rows\n"
+        )
+        self.stdout.write(f"{'profile':<20} {'reads/s':>10} {'writes/s':>10} "
+                          f"{'read p95 ms':>12} {'write p95 ms':>13} {'errors':>8}")
+
+        results = {}
+        for name in profiles:
+            result = results[name] = self._run(settings.DATABASE_PROFILES[name], options)
+            self.stdout.write(
+                f"{name:<20} {result['reads']:>10.0f} {result['writes']:>10.0f} "
+                f"{result['read_p95']:>12.2f} {result['write_p95']:>13.2f} {result['errors']:>8}"
+            )
+
+        base_name, base = profiles[0], results[profiles[0]]
+        for name in profiles[1:]:
+            result = results[name]
+            self.stdout.write(self.style.SUCCESS(
+                f'{name} vs {base_name}: '
+                f"{result['reads'] / max(base['reads'], 1):.1f}x reads, "
+                f"{result['writes'] / max(base['writes'], 1):.1f}x writes"
+            ))
+
+    def _run(self, profile, options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'benchmark.sqlite3')
+            self._seed(path, options['rows'])
+
+            stop = threading.Event()
+            readers = [_Worker(path, profile, _read, options['rows'], stop) for _ in range(options['readers'])]
+            writers = [_Worker(path, profile, _write, options['rows'], stop) for _ in range(options['writers'])]
+            for worker in readers + writers:
+                worker.start()
+            time.sleep(options['duration'])
+            stop.set()
+            for worker in readers + writers:
+                worker.join()
+
+        read_latencies = [latency for worker in readers for latency in worker.latencies]
+        write_latencies = [latency for worker in writers for latency in worker.latencies]
+        return {
+            'reads': len(read_latencies) / options['duration'],
+            'writes': len(write_latencies) / options['duration'],
+            'read_p95': _percentile(read_latencies, 0.95) * 1000,
+            'write_p95': _percentile(write_latencies, 0.95) * 1000,
+            'errors': sum(worker.errors for worker in readers + writers),
+        }
+
+    def _seed(self, path, rows):
+        conn = sqlite3.connect(path)
+        conn.executescript('''
+            CREATE TABLE bench_job (
+                id INTEGER PRIMARY KEY,
+                title TEXT NOT NULL,
+                location TEXT NOT NULL,
+                salary INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX bench_job_location ON bench_job (location, updated_at);
+            CREATE TABLE bench_event (
+                id INTEGER PRIMARY KEY,
+                job_id INTEGER NOT NULL REFERENCES bench_job (id),
+                created_at REAL NOT NULL
+            );
+        ''')
+        rng = random.Random(0)
+        now = time.time()
+        conn.executemany(
+            'INSERT INTO bench_job (id, title, location, salary, updated_at) VALUES (?, ?, ?, ?, ?)',
+            ((i, f'Job {i}', rng.choice(LOCATIONS), rng.randint(40, 200) * 1000, now - i) for i in range(1, rows + 1))
+        )
+        conn.commit()
+        conn.close()
@@ -0,0 +1,124 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from jobs import geocoder, tiles
+from jobs.models import Job, JobApplication
+from profiles.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Fill in missing job and profile coordinates from their location text using the offline gazetteer'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of worker processes used for geocoding (default: CPU count)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Distinct locations handed to a worker at a time',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows written per UPDATE batch',
+        )
+        parser.add_argument(
+            '--overwrite',
+            action='store_true',
+            help='Re-geocode rows that already have coordinates',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be updated without writing anything',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Running in DRY RUN mode - no coordinates will be saved'))
+
+        job_rows = self._pending_rows(Job.objects.all())
+        profile_rows = self._pending_rows(Profile.objects.all())
+
+        # Each distinct location string is geocoded once, however many rows share it
+        locations = sorted({location for _, location in job_rows + profile_rows})
+        self.stdout.write(f'Geocoding {len(locations)} distinct location(s) '
+                          f'for {len(job_rows)} job(s) and {len(profile_rows)} profile(s)')
+        resolved = self._geocode(locations)
+
+        jobs_updated = self._update(Job, job_rows, resolved)
+        profiles_updated = self._update(Profile, profile_rows, resolved)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Resolved {jobs_updated} job(s) and {profiles_updated} profile(s); '
+            f'{len(locations) - len(resolved)} location(s) not recognised'
+        ))
+
+    def _pending_rows(self, queryset):
+        """``(pk, location)`` of rows that have location text but need coordinates"""
+        queryset = queryset.exclude(location__isnull=True).exclude(location='')
+        if not self.options['overwrite']:
+            queryset = queryset.filter(latitude__isnull=True)
+        return list(queryset.values_list('pk', 'location'))
+
+    def _geocode(self, locations):
+        """Map of location text -> coordinates, computed across a process pool"""
+        if not locations:
+            return {}
+        chunk_size = max(self.options['chunk_size'], 1)
+        chunks = [locations[i:i + chunk_size] for i in range(0, len(locations), chunk_size)]
+        workers = max(min(self.options['workers'], len(chunks)), 1)
+
+        if workers == 1:
+            results = map(geocoder.geocode_many, chunks)
+        else:
+            # Each worker loads the gazetteer once and keeps its own LRU cache
+            executor = ProcessPoolExecutor(max_workers=workers)
+            results = executor.map(geocoder.geocode_many, chunks)
+
+        resolved = {}
+        try:
+            for chunk, coordinates in zip(chunks, results):
+                for location, point in zip(chunk, coordinates):
+                    if point is not None:
+                        resolved[location] = point
+        finally:
+            if workers > 1:
+                executor.shutdown()
+        return resolved
+
+    def _update(self, model, rows, resolved):
+        """Write geocoded coordinates with bulk updates; returns the number of rows resolved"""
+        objects = []
+        for pk, location in rows:
+            point = resolved.get(location)
+            if point is not None:
+                objects.append(model(pk=pk, latitude=point[0], longitude=point[1]))
+
+        if objects and not self.options['dry_run']:
+            with transaction.atomic():
+                model.objects.bulk_update(objects, ['latitude', 'longitude'], batch_size=self.options['batch_size'])
+            # bulk_update skips the save signals, so drop the affected map tiles here
+            transaction.on_commit(lambda: self._invalidate_tiles(model, objects))
+        return len(objects)
+
+    def _invalidate_tiles(self, model, objects):
+        if model is Job:
+            for job in objects:
+                tiles.invalidate_point('jobs', job.latitude, job.longitude)
+            return
+        points = {profile.pk: (profile.latitude, profile.longitude) for profile in objects}
+        user_points = dict(Profile.objects.filter(pk__in=points).values_list('user_id', 'pk'))
+        for user_id, job_id in JobApplication.objects.filter(
+            applicant_id__in=user_points
+        ).values_list('applicant_id', 'job_id'):
+            tiles.invalidate_point(f'applicants:{job_id}', *points[user_points[user_id]])
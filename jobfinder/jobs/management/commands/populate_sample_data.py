@@ -1,134 +1,98 @@
-from django.core.management.base import BaseCommand
+import random
+import time
+
 from django.contrib.auth.models import User
-from authentication.models import UserProfile, RecruiterProfile, JobSeekerProfile
-from jobs.models import Job
+from django.core.management.base import BaseCommand, CommandError
+from jobs import datagen
 
 
 class Command(BaseCommand):
-    help = 'Populate the database with sample jobs and users'
+    help = ('Populate the database with a deterministic synthetic dataset of recruiters, jobs, '
+            'job seekers, applications, messages and saved searches')
 
-    def handle(self, *args, **options):
-        # Create sample recruiter
-        recruiter_user = User.objects.create_user(
-            username='recruiter1',
-            email='recruiter1@example.com',
-            password='password123',
-            first_name='John',
-            last_name='Recruiter'
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recruiters',
+            type=int,
+            default=10,
+            help='Number of recruiters',
         )
-        recruiter_profile = UserProfile.objects.create(
-            user=recruiter_user,
-            user_type='recruiter'
+        parser.add_argument(
+            '--jobs',
+            type=int,
+            default=200,
+            help='Number of jobs, spread over the recruiters',
         )
-        recruiter = RecruiterProfile.objects.create(
-            user_profile=recruiter_profile,
-            company_name='TechCorp Inc.',
-            company_description='Leading technology company focused on innovation'
+        parser.add_argument(
+            '--seekers',
+            type=int,
+            default=1000,
+            help='Number of job seekers; each applies to a few jobs and some exchange messages',
         )
-
-        # Create sample job seeker
-        jobseeker_user = User.objects.create_user(
-            username='jobseeker1',
-            email='jobseeker1@example.com',
-            password='password123',
-            first_name='Jane',
-            last_name='Seeker'
+        parser.add_argument(
+            '--saved-searches',
+            type=int,
+            default=2,
+            help='Average number of saved searches per recruiter',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=2340,
+            help='Random seed; the same seed and sizes produce the same data',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows per bulk insert, and job seekers generated per round',
+        )
+        parser.add_argument(
+            '--prefix',
+            default='sample',
+            help='Username prefix of the generated accounts (default: %(default)s)',
         )
-        jobseeker_profile = UserProfile.objects.create(
-            user=jobseeker_user,
-            user_type='job_seeker'
+        parser.add_argument(
+            '--password',
+            default='password123',
+            help='Password of every generated account (default: %(default)s)',
         )
-        jobseeker = JobSeekerProfile.objects.create(
-            user_profile=jobseeker_profile,
-            skills='Python, Django, JavaScript, React',
-            experience_years=3
+        parser.add_argument(
+            '--flush',
+            action='store_true',
+            help='Delete the accounts previously generated with this prefix, and everything they own, first',
         )
 
-        # Sample jobs data
-        sample_jobs = [
-            {
-                'title': 'Senior Software Engineer',
-                'description': 'We are looking for a Senior Software Engineer to join our dynamic team. You will be responsible for designing, developing, and maintaining high-quality software applications. The ideal candidate has strong experience with Python, Django, and modern web technologies.',
-                'company': 'TechCorp Inc.',
-                'location': 'San Francisco, CA',
-                'skills_required': 'Python, Django, PostgreSQL, JavaScript, React',
-                'salary_min': 120000,
-                'salary_max': 160000,
-                'work_type': 'hybrid',
-                'visa_sponsorship': True,
-                'experience_level': 'senior',
-            },
-            {
-                'title': 'Frontend Developer',
-                'description': 'Join our frontend team to build amazing user experiences. We need someone who is passionate about creating responsive, accessible, and performant web applications using modern JavaScript frameworks.',
-                'company': 'WebDesign Studio',
-                'location': 'New York, NY',
-                'skills_required': 'JavaScript, React, CSS, HTML, TypeScript',
-                'salary_min': 80000,
-                'salary_max': 110000,
-                'work_type': 'on_site',
-                'visa_sponsorship': False,
-                'experience_level': 'mid',
-            },
-            {
-                'title': 'Python Backend Developer',
-                'description': 'Remote opportunity for a Python developer to work on scalable backend systems. Experience with Django, FastAPI, and cloud technologies preferred. Great opportunity for growth and learning.',
-                'company': 'CloudTech Solutions',
-                'location': '',
-                'skills_required': 'Python, Django, FastAPI, AWS, Docker',
-                'salary_min': 90000,
-                'salary_max': 130000,
-                'work_type': 'remote',
-                'visa_sponsorship': True,
-                'experience_level': 'mid',
-            },
-            {
-                'title': 'Junior Full Stack Developer',
-                'description': 'Perfect entry-level position for new graduates or career changers. You will work with both frontend and backend technologies while learning from experienced developers in a supportive environment.',
-                'company': 'StartupXYZ',
-                'location': 'Austin, TX',
-                'skills_required': 'JavaScript, Python, HTML, CSS, SQL',
-                'salary_min': 60000,
-                'salary_max': 80000,
-                'work_type': 'hybrid',
-                'visa_sponsorship': False,
-                'experience_level': 'entry',
-            },
-            {
-                'title': 'DevOps Engineer',
-                'description': 'We need a DevOps engineer to help us build and maintain our cloud infrastructure. Experience with CI/CD, containerization, and cloud platforms is essential.',
-                'company': 'InfraTech Corp',
-                'location': 'Seattle, WA',
-                'skills_required': 'AWS, Docker, Kubernetes, Jenkins, Python',
-                'salary_min': 100000,
-                'salary_max': 140000,
-                'work_type': 'on_site',
-                'visa_sponsorship': True,
-                'experience_level': 'senior',
-            },
-            {
-                'title': 'Data Scientist',
-                'description': 'Join our data science team to extract insights from large datasets. You will work on machine learning models, data analysis, and creating data-driven solutions for business problems.',
-                'company': 'DataAnalytics Pro',
-                'location': '',
-                'skills_required': 'Python, SQL, Machine Learning, Pandas, Scikit-learn',
-                'salary_min': 95000,
-                'salary_max': 135000,
-                'work_type': 'remote',
-                'visa_sponsorship': True,
-                'experience_level': 'mid',
-            }
-        ]
+    def handle(self, *args, **options):
+        for option in ('recruiters', 'jobs', 'seekers', 'saved_searches'):
+            if options[option] < 0:
+                raise CommandError(f'--{option.replace("_", "-")} cannot be negative')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        if options['jobs'] and not options['recruiters']:
+            raise CommandError('Jobs need at least one recruiter')
 
-        # Create sample jobs
-        for job_data in sample_jobs:
-            job = Job.objects.create(
-                recruiter=recruiter,
-                **job_data
-            )
-            
+        if options['flush']:
+            deleted, _ = User.objects.filter(username__startswith=f"{options['prefix']}_").delete()
+            self.stdout.write(f'Deleted {deleted} object(s) from the previous run')
+
+        started = time.monotonic()
+        totals = datagen.generate(
+            random.Random(options['seed']),
+            recruiters=options['recruiters'],
+            jobs=options['jobs'],
+            seekers=options['seekers'],
+            saved_searches_per_recruiter=options['saved_searches'],
+            batch_size=options['batch_size'],
+            prefix=options['prefix'],
+            password=options['password'],
+            log=self.stdout.write,
+        )
         self.stdout.write(
             self.style.SUCCESS(
-                f'Successfully created {len(sample_jobs)} sample jobs, 1 recruiter, and 1 job seeker'
+                f"Created {totals['recruiters']} recruiter(s), {totals['jobs']} job(s), "
+                f"{totals['seekers']} job seeker(s), {totals['applications']} application(s), "
+                f"{totals['messages']} message(s) and {totals['saved_searches']} saved search(es) "
+                f"in {time.monotonic() - started:.1f}s"
             )
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from jobs.models import ApplicationTombstone
+
+
+class Command(BaseCommand):
+    help = 'Delete application tombstones older than the pipeline sync retention (run daily)'
+
+    def handle(self, *args, **options):
+        pruned = ApplicationTombstone.prune()
+        self.stdout.write(self.style.SUCCESS(f'Pruned {pruned} tombstone(s)'))
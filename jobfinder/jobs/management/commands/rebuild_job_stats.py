@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from jobs.models import JobStats
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-job application and unread message counters from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'job_ids',
+            nargs='*',
+            type=int,
+            help='Only rebuild stats for these job ids (default: all jobs)',
+        )
+
+    def handle(self, *args, **options):
+        job_ids = options['job_ids'] or None
+        rebuilt = JobStats.rebuild(job_ids)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {rebuilt} job(s)'))
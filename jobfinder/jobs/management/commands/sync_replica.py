@@ -0,0 +1,48 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from jobfinder.dbrouter import replica_alias
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database to the read replica configured with JOBFINDER_DB_REPLICA'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Keep copying every INTERVAL seconds instead of copying once',
+        )
+
+    def handle(self, *args, **options):
+        alias = replica_alias()
+        if alias is None:
+            raise CommandError('No replica configured; set JOBFINDER_DB_REPLICA to the replica file')
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        replica = settings.DATABASES[alias]
+        if not primary['ENGINE'].endswith('sqlite3'):
+            raise CommandError('Only SQLite replicas are synced by this command')
+
+        while True:
+            started = time.monotonic()
+            self._copy(primary['NAME'], replica['NAME'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Copied {primary['NAME']} to {replica['NAME']} in {time.monotonic() - started:.2f}s"
+            ))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def _copy(self, source_path, target_path):
+        # The online backup API gives a consistent snapshot while the site keeps writing
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(target_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
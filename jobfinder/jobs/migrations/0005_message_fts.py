@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+def create_message_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    # Unstemmed, with prefix indexes: every search term is matched as a prefix,
+    # and a stemming tokenizer would stem the prefix too ("deploy"* -> "deploi"*)
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS jobs_message_fts "
+        "USING fts5(content, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    # Backfill the index with the messages that already exist
+    schema_editor.execute(
+        "INSERT INTO jobs_message_fts (rowid, content) "
+        "SELECT id, content FROM jobs_message"
+    )
+
+
+def drop_message_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS jobs_message_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0004_job_latitude_job_longitude'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_message_fts, drop_message_fts),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def is_read_to_watermarks(apps, schema_editor):
+    """
+    Each participant's watermark becomes the newest message they had marked
+    as read among those sent by the other party.
+    """
+    JobApplication = apps.get_model('jobs', 'JobApplication')
+    Message = apps.get_model('jobs', 'Message')
+    MessageReadState = apps.get_model('jobs', 'MessageReadState')
+
+    read_by_sender = {}
+    for row in Message.objects.filter(is_read=True).values('application_id', 'sender_id').annotate(max_id=Max('id')):
+        read_by_sender.setdefault(row['application_id'], []).append((row['sender_id'], row['max_id']))
+
+    participants = JobApplication.objects.filter(id__in=read_by_sender.keys()).values_list(
+        'id', 'applicant_id', 'job__recruiter__user_profile__user_id'
+    )
+
+    read_states = []
+    for application_id, applicant_id, recruiter_user_id in participants:
+        for user_id in {applicant_id, recruiter_user_id}:
+            watermark = max(
+                (max_id for sender_id, max_id in read_by_sender[application_id] if sender_id != user_id),
+                default=0
+            )
+            if watermark:
+                read_states.append(MessageReadState(
+                    application_id=application_id, user_id=user_id, last_read_message_id=watermark
+                ))
+    MessageReadState.objects.bulk_create(read_states, batch_size=500)
+
+
+def watermarks_to_is_read(apps, schema_editor):
+    Message = apps.get_model('jobs', 'Message')
+    MessageReadState = apps.get_model('jobs', 'MessageReadState')
+
+    for state in MessageReadState.objects.all().iterator():
+        Message.objects.filter(
+            application_id=state.application_id,
+            id__lte=state.last_read_message_id
+        ).exclude(sender_id=state.user_id).update(is_read=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_initial'),
+        ('jobs', '0005_message_fts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageReadState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_message_id', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('application', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_states', to='jobs.jobapplication')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='message_read_states', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('application', 'user')},
+            },
+        ),
+        migrations.RunPython(is_read_to_watermarks, watermarks_to_is_read),
+        migrations.RemoveField(
+            model_name='message',
+            name='is_read',
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0006_message_read_state'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApplicationTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_id', models.BigIntegerField()),
+                ('application_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='jobapplication',
+            index=models.Index(fields=['job', 'updated_at'], name='jobs_app_job_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='applicationtombstone',
+            index=models.Index(fields=['job_id', 'deleted_at'], name='jobs_tomb_job_deleted_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:17
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_status_events(apps, schema_editor):
+    """
+    Earlier history was not kept, so each existing application gets its
+    submission and, if it has moved on, one transition to its current status.
+    """
+    JobApplication = apps.get_model('jobs', 'JobApplication')
+    ApplicationStatusEvent = apps.get_model('jobs', 'ApplicationStatusEvent')
+
+    events = []
+    for application in JobApplication.objects.all().iterator():
+        events.append(ApplicationStatusEvent(
+            application_id=application.id, job_id=application.job_id,
+            from_status='', to_status='applied', created_at=application.applied_at
+        ))
+        if application.status != 'applied':
+            events.append(ApplicationStatusEvent(
+                application_id=application.id, job_id=application.job_id,
+                from_status='applied', to_status=application.status,
+                created_at=max(application.status_updated_at, application.applied_at)
+            ))
+    ApplicationStatusEvent.objects.bulk_create(events, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0007_application_sync'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='jobapplication',
+            name='status_updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='When the status last changed'),
+        ),
+        migrations.CreateModel(
+            name='ApplicationStatusEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, choices=[('applied', 'Applied'), ('review', 'Under Review'), ('interview', 'Interview'), ('offer', 'Offer Extended'), ('closed', 'Closed'), ('rejected', 'Rejected')], max_length=20)),
+                ('to_status', models.CharField(choices=[('applied', 'Applied'), ('review', 'Under Review'), ('interview', 'Interview'), ('offer', 'Offer Extended'), ('closed', 'Closed'), ('rejected', 'Rejected')], max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('application', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_events', to='jobs.jobapplication')),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_events', to='jobs.job')),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['job', 'created_at'], name='jobs_event_job_created_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_status_events, migrations.RunPython.noop),
+    ]
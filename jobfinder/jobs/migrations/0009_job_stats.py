@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+
+def backfill_job_stats(apps, schema_editor):
+    """Application counts for existing jobs; run rebuild_job_stats to fill in unread counts"""
+    Job = apps.get_model('jobs', 'Job')
+    JobApplication = apps.get_model('jobs', 'JobApplication')
+    JobStats = apps.get_model('jobs', 'JobStats')
+
+    statuses = ['applied', 'review', 'interview', 'offer', 'closed', 'rejected']
+    counts = {
+        row['job_id']: row
+        for row in JobApplication.objects.values('job_id').annotate(
+            total_applications=Count('id'),
+            last_application_at=Max('applied_at'),
+            **{f'{status}_count': Count('id', filter=Q(status=status)) for status in statuses}
+        )
+    }
+    JobStats.objects.bulk_create([
+        JobStats(job_id=job_id, **{
+            field: value for field, value in counts.get(job_id, {}).items() if field != 'job_id'
+        })
+        for job_id in Job.objects.values_list('id', flat=True)
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0008_application_status_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobStats',
+            fields=[
+                ('job', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='jobs.job')),
+                ('total_applications', models.PositiveIntegerField(default=0)),
+                ('applied_count', models.PositiveIntegerField(default=0)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('interview_count', models.PositiveIntegerField(default=0)),
+                ('offer_count', models.PositiveIntegerField(default=0)),
+                ('closed_count', models.PositiveIntegerField(default=0)),
+                ('rejected_count', models.PositiveIntegerField(default=0)),
+                ('unread_messages', models.PositiveIntegerField(default=0, help_text='Applicant messages the recruiter has not read')),
+                ('last_application_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Job stats',
+            },
+        ),
+        migrations.RunPython(backfill_job_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0009_job_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobapplication',
+            name='version',
+            field=models.PositiveIntegerField(default=0, help_text='Bumped on every status write; used to detect conflicting updates'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0010_application_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='jobapplication',
+            index=models.Index(fields=['job', 'status', 'status_updated_at'], name='jobs_app_job_status_idx'),
+        ),
+    ]
@@ -1,5 +1,9 @@
-from django.db import models
+from datetime import timedelta
+from django.db import models, transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
 from django.contrib.auth.models import User
+from django.utils import timezone
 from authentication.models import RecruiterProfile
 
 
@@ -67,6 +71,9 @@ class JobApplication(models.Model):
         ('rejected', 'Rejected'),
     ]
 
+    # Statuses shown as columns on the recruiter's kanban pipeline, in display order
+    PIPELINE_STATUSES = ['applied', 'review', 'interview', 'offer', 'closed']
+
     job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='applications')
     applicant = models.ForeignKey(User, on_delete=models.CASCADE, related_name='job_applications')
     cover_note = models.TextField(blank=True, null=True, help_text="Personalized note for the application")
@@ -75,12 +82,19 @@ class JobApplication(models.Model):
     rejection_reason = models.TextField(blank=True, null=True, help_text="Reason for rejection")
     applied_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    status_updated_at = models.DateTimeField(auto_now=True)
+    status_updated_at = models.DateTimeField(default=timezone.now, help_text="When the status last changed")
     notified = models.BooleanField(default=True, help_text="Whether applicant has been notified of current status")
+    version = models.PositiveIntegerField(default=0, help_text="Bumped on every status write; used to detect conflicting updates")
 
     class Meta:
         unique_together = ('job', 'applicant')  # Prevent duplicate applications
         ordering = ['-applied_at']
+        indexes = [
+            # Delta sync of the pipeline board: changes on a job since a point in time
+            models.Index(fields=['job', 'updated_at'], name='jobs_app_job_updated_idx'),
+            # Keyset pagination of the pipeline columns (see jobs/pipeline.py)
+            models.Index(fields=['job', 'status', 'status_updated_at'], name='jobs_app_job_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.applicant.username} applied to {self.job.title}"
@@ -109,15 +123,295 @@ class JobApplication(models.Model):
         return status_classes.get(self.notified_status, 'bg-secondary')
 
 
+class ApplicationStatusEvent(models.Model):
+    """Append-only log of application status transitions"""
+    application = models.ForeignKey(JobApplication, on_delete=models.CASCADE, related_name='status_events')
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='status_events')
+    from_status = models.CharField(max_length=20, choices=JobApplication.STATUS_CHOICES, blank=True)
+    to_status = models.CharField(max_length=20, choices=JobApplication.STATUS_CHOICES)
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['job', 'created_at'], name='jobs_event_job_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Application {self.application_id}: {self.from_status or '-'} -> {self.to_status}"
+
+    @classmethod
+    def record(cls, transitions, changed_by=None, at=None):
+        """
+        Log transitions given as ``(application_id, job_id, from_status, to_status)``
+        tuples; transitions that don't change the status are skipped. Applicant
+        map tiles carry each applicant's status, so the tiles showing moved
+        applications are dropped once the transaction commits.
+        """
+        from . import tiles  # tiles imports this module
+
+        at = at or timezone.now()
+        transitions = [t for t in transitions if t[2] != t[3]]
+        # New applications (no previous status) are invalidated by the post_save handler
+        moved = [t[0] for t in transitions if t[2]]
+        with transaction.atomic():
+            cls.objects.bulk_create([
+                cls(
+                    application_id=application_id,
+                    job_id=job_id,
+                    from_status=from_status,
+                    to_status=to_status,
+                    changed_by=changed_by,
+                    created_at=at
+                )
+                for application_id, job_id, from_status, to_status in transitions
+            ])
+            JobStats.apply_transitions(transitions, at=at)
+            if moved:
+                transaction.on_commit(lambda: tiles.invalidate_applications(moved))
+
+
+class ApplicationTombstone(models.Model):
+    """Records deleted applications so pipeline boards can drop them on their next sync"""
+    # How long deleted applications are remembered; older sync versions must reload
+    RETENTION = timedelta(days=7)
+
+    job_id = models.BigIntegerField()
+    application_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['job_id', 'deleted_at'], name='jobs_tomb_job_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"Application {self.application_id} deleted from job {self.job_id}"
+
+    @classmethod
+    def prune(cls, job_id=None):
+        """
+        Delete tombstones past RETENTION, of one job (using the job/deleted_at
+        index) or of every job; returns how many were deleted.
+        """
+        expired = cls.objects.filter(deleted_at__lt=timezone.now() - cls.RETENTION)
+        if job_id is not None:
+            expired = expired.filter(job_id=job_id)
+        return expired.delete()[0]
+
+
+class MessageQuerySet(models.QuerySet):
+    def unread_for(self, user):
+        """Messages sent by someone else after ``user``'s read watermark on their thread"""
+        watermark = MessageReadState.objects.filter(
+            application=OuterRef('application'),
+            user=user
+        ).values('last_read_message_id')[:1]
+        return self.exclude(sender=user).filter(
+            id__gt=Coalesce(Subquery(watermark), Value(0))
+        )
+
+
 class Message(models.Model):
     application = models.ForeignKey(JobApplication, on_delete=models.CASCADE, related_name='messages')
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
-    is_read = models.BooleanField(default=False)
+
+    objects = MessageQuerySet.as_manager()
 
     class Meta:
         ordering = ['created_at']
 
     def __str__(self):
         return f"Message from {self.sender.username} on {self.application}"
+
+
+def unread_count_for(user):
+    """Annotation for JobApplication querysets: messages on the application ``user`` has not read yet"""
+    unread = Message.objects.filter(
+        application=OuterRef('pk')
+    ).unread_for(user).values('application').annotate(count=Count('id')).values('count')
+    return Coalesce(Subquery(unread), Value(0))
+
+
+class MessageReadState(models.Model):
+    """
+    Per-participant read watermark for an application's message thread.
+    Every message with an id up to ``last_read_message_id`` counts as read by ``user``.
+    """
+    application = models.ForeignKey(JobApplication, on_delete=models.CASCADE, related_name='read_states')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='message_read_states')
+    last_read_message_id = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('application', 'user')
+
+    def __str__(self):
+        return f"{self.user.username} read {self.application} up to message {self.last_read_message_id}"
+
+    @classmethod
+    def mark_read(cls, application, user, message_id):
+        """
+        Move ``user``'s watermark on ``application`` forward to ``message_id``.
+        It never moves backwards, so a stale read finishing after a newer one
+        cannot mark messages unread again.
+        """
+        if not cls._advance(application, user, message_id).update(
+            last_read_message_id=message_id, updated_at=timezone.now()
+        ):
+            # No row yet, or it is already past message_id. Concurrent first
+            # reads both insert-or-ignore, then both advance.
+            cls.objects.bulk_create([cls(application=application, user=user)], ignore_conflicts=True)
+            cls._advance(application, user, message_id).update(
+                last_read_message_id=message_id, updated_at=timezone.now()
+            )
+
+    @classmethod
+    async def amark_read(cls, application, user, message_id):
+        """``mark_read`` for async views"""
+        if not await cls._advance(application, user, message_id).aupdate(
+            last_read_message_id=message_id, updated_at=timezone.now()
+        ):
+            await cls.objects.abulk_create([cls(application=application, user=user)], ignore_conflicts=True)
+            await cls._advance(application, user, message_id).aupdate(
+                last_read_message_id=message_id, updated_at=timezone.now()
+            )
+
+    @classmethod
+    def _advance(cls, application, user, message_id):
+        return cls.objects.filter(application=application, user=user, last_read_message_id__lt=message_id)
+
+
+class JobStats(models.Model):
+    """
+    Per-job application funnel counters, maintained incrementally on
+    application create, status transition (via ApplicationStatusEvent.record)
+    and delete, and on messages sent to, deleted from or read by the
+    recruiter (``add_unread``). The row is created with the job; rebuild with
+    ``manage.py rebuild_job_stats`` if counters ever drift.
+    """
+    job = models.OneToOneField(Job, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    total_applications = models.PositiveIntegerField(default=0)
+    applied_count = models.PositiveIntegerField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
+    interview_count = models.PositiveIntegerField(default=0)
+    offer_count = models.PositiveIntegerField(default=0)
+    closed_count = models.PositiveIntegerField(default=0)
+    rejected_count = models.PositiveIntegerField(default=0)
+    unread_messages = models.PositiveIntegerField(default=0, help_text="Applicant messages the recruiter has not read")
+    last_application_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Job stats'
+
+    def __str__(self):
+        return f"Stats for job {self.job_id}"
+
+    @staticmethod
+    def status_field(status):
+        return f'{status}_count'
+
+    @classmethod
+    def apply_transitions(cls, transitions, at=None):
+        """
+        Apply ``(application_id, job_id, from_status, to_status)`` transitions.
+        An empty ``from_status`` is a new application; an empty ``to_status`` a deletion.
+        """
+        deltas = {}
+        new_applications = set()
+        for _, job_id, from_status, to_status in transitions:
+            if from_status == to_status:
+                continue
+            job_deltas = deltas.setdefault(job_id, {})
+            if from_status:
+                field = cls.status_field(from_status)
+                job_deltas[field] = job_deltas.get(field, 0) - 1
+            else:
+                job_deltas['total_applications'] = job_deltas.get('total_applications', 0) + 1
+                new_applications.add(job_id)
+            if to_status:
+                field = cls.status_field(to_status)
+                job_deltas[field] = job_deltas.get(field, 0) + 1
+            else:
+                job_deltas['total_applications'] = job_deltas.get('total_applications', 0) - 1
+
+        with transaction.atomic():
+            for job_id, job_deltas in deltas.items():
+                changes = {field: F(field) + delta for field, delta in job_deltas.items() if delta}
+                if job_id in new_applications:
+                    changes['last_application_at'] = at or timezone.now()
+                if changes:
+                    changes['updated_at'] = timezone.now()
+                    cls.objects.filter(job_id=job_id).update(**changes)
+
+    @classmethod
+    def add_unread(cls, job_id, delta):
+        """
+        Move the job's unread message counter by ``delta`` (clamped at zero),
+        for a message sent to, deleted from or read by its recruiter.
+        """
+        if delta:
+            cls.objects.filter(job_id=job_id).update(
+                unread_messages=Greatest(F('unread_messages') + delta, Value(0)), updated_at=timezone.now()
+            )
+
+    @classmethod
+    def application_unread(cls, application_id):
+        """Messages on one application that its recruiter has not read"""
+        return cls._recruiter_unread_messages().filter(application_id=application_id).count()
+
+    @staticmethod
+    def _recruiter_unread_messages():
+        recruiter_user = 'application__job__recruiter__user_profile__user'
+        watermark = MessageReadState.objects.filter(
+            application=OuterRef('application'),
+            user=OuterRef(recruiter_user)
+        ).values('last_read_message_id')[:1]
+        return Message.objects.exclude(sender=F(recruiter_user)).filter(
+            id__gt=Coalesce(Subquery(watermark), Value(0))
+        )
+
+    @classmethod
+    def rebuild(cls, job_ids=None):
+        """Recompute stats from scratch for ``job_ids`` (all jobs if None). Returns the number of jobs."""
+        jobs = Job.objects.all()
+        if job_ids is not None:
+            jobs = jobs.filter(id__in=job_ids)
+        job_ids = list(jobs.values_list('id', flat=True))
+
+        annotations = {
+            cls.status_field(status): Count('id', filter=Q(status=status))
+            for status, _ in JobApplication.STATUS_CHOICES
+        }
+        counts = {
+            row['job_id']: row
+            for row in JobApplication.objects.filter(job_id__in=job_ids).values('job_id').annotate(
+                total_applications=Count('id'),
+                last_application_at=Max('applied_at'),
+                **annotations
+            )
+        }
+        unread = dict(
+            cls._recruiter_unread_messages().filter(
+                application__job_id__in=job_ids
+            ).values('application__job_id').annotate(count=Count('id')).values_list('application__job_id', 'count')
+        )
+
+        stats = []
+        for job_id in job_ids:
+            row = counts.get(job_id, {})
+            stats.append(cls(
+                job_id=job_id,
+                total_applications=row.get('total_applications', 0),
+                last_application_at=row.get('last_application_at'),
+                unread_messages=unread.get(job_id, 0),
+                **{field: row.get(field, 0) for field in annotations}
+            ))
+        with transaction.atomic():
+            cls.objects.filter(job_id__in=job_ids).delete()
+            cls.objects.bulk_create(stats, batch_size=500)
+        return len(stats)
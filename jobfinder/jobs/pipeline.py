@@ -0,0 +1,95 @@
+"""
+Paginated loading of the recruiter's kanban pipeline columns.
+
+Each column is ordered by ``status_updated_at`` (newest first, ties broken by
+id) and paged with a keyset cursor, so every page is a short range scan of
+the ``(job, status, status_updated_at)`` index however many applications the
+job has. The board renders the first page of each column and fetches the
+rest on scroll.
+
+The board then polls for changes (``jobs.ajax_views.pipeline_changes``). Its
+sync version is the newest ``updated_at`` / ``deleted_at`` the client has been
+sent rather than the server clock, so it only moves as far as the rows the
+database (possibly a lagging replica) has actually shown, and never backwards.
+"""
+from datetime import timedelta
+
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import ApplicationTombstone, JobApplication, unread_count_for
+
+PAGE_SIZE = 25
+
+# Versions of boards with no recent changes are moved up to this age, so an
+# idle board never looks too old to sync (see ApplicationTombstone.RETENTION).
+# Far longer than any replica lag, so nothing older can still be in flight.
+IDLE_SYNC_VERSION_AGE = timedelta(days=1)
+
+
+def encode_cursor(application):
+    """Opaque cursor pointing just past ``application`` in its column"""
+    return f'{application.status_updated_at.isoformat()}|{application.id}'
+
+
+def decode_cursor(cursor):
+    """Return ``(status_updated_at, id)`` for a cursor, or raise ValueError"""
+    timestamp, _, application_id = cursor.partition('|')
+    status_updated_at = parse_datetime(timestamp)
+    if status_updated_at is None:
+        raise ValueError('Invalid cursor')
+    return status_updated_at, int(application_id)
+
+
+def card_queryset(job_id, user):
+    """Applications on ``job_id`` with everything a card template needs, for ``user``"""
+    return JobApplication.objects.filter(job_id=job_id).select_related('applicant').annotate(
+        message_count=Count('messages'),
+        unread_count=unread_count_for(user)
+    )
+
+
+def column_page(job_id, status, user, cursor=None, page_size=None):
+    """
+    One page of the ``status`` column of a job's board.
+    Returns ``(applications, next_cursor)``; ``next_cursor`` is None on the last page.
+    """
+    page_size = page_size or PAGE_SIZE
+    applications = card_queryset(job_id, user).filter(status=status)
+    if cursor:
+        status_updated_at, application_id = decode_cursor(cursor)
+        applications = applications.filter(
+            Q(status_updated_at__lt=status_updated_at) |
+            Q(status_updated_at=status_updated_at, id__lt=application_id)
+        )
+    # Fetch one extra row to learn whether another page exists
+    applications = list(applications.order_by('-status_updated_at', '-id')[:page_size + 1])
+    if len(applications) <= page_size:
+        return applications, None
+    applications = applications[:page_size]
+    return applications, encode_cursor(applications[-1])
+
+
+def column_counts(job_id):
+    """Number of applications in each pipeline column of a job, in one grouped query"""
+    counts = dict.fromkeys(JobApplication.PIPELINE_STATUSES, 0)
+    counts.update(
+        JobApplication.objects.filter(
+            job_id=job_id, status__in=JobApplication.PIPELINE_STATUSES
+        ).order_by().values('status').annotate(count=Count('id')).values_list('status', 'count')
+    )
+    return counts
+
+
+def sync_version(*timestamps):
+    """Sync version for a client that has seen changes up to the newest of ``timestamps``"""
+    return max([timezone.now() - IDLE_SYNC_VERSION_AGE, *filter(None, timestamps)])
+
+
+def latest_change(job_id):
+    """Sync version covering every change to ``job_id``'s board visible now"""
+    return sync_version(
+        JobApplication.objects.filter(job_id=job_id).aggregate(latest=Max('updated_at'))['latest'],
+        ApplicationTombstone.objects.filter(job_id=job_id).aggregate(latest=Max('deleted_at'))['latest'],
+    )
@@ -0,0 +1,149 @@
+"""
+Full-text search over application message threads.
+
+On SQLite, messages are indexed in the ``jobs_message_fts`` FTS5 table
+(created by migration 0005, rowid = message id; unstemmed, with prefix
+indexes, as every search term is matched as a prefix). The index is kept up to
+date incrementally by the signal handlers in ``jobs/signals.py``. Other
+database backends fall back to an ``icontains`` scan.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+
+from .models import Message
+
+FTS_TABLE = 'jobs_message_fts'
+
+# Private-use characters used as highlight markers so the snippet can be
+# HTML-escaped before the real <mark> tags are put in.
+_MARK_START = '\ue000'
+_MARK_END = '\ue001'
+
+SNIPPET_TOKENS = 16
+PREVIEW_CHARS = 120
+
+
+def fts_enabled():
+    """Return True if the message FTS index is available on this database"""
+    return connection.vendor == 'sqlite'
+
+
+def index_message(message):
+    """Add (or replace) a message in the FTS index"""
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [message.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, content) VALUES (%s, %s)',
+            [message.pk, message.content],
+        )
+
+
+def index_messages(messages):
+    """Add newly created messages to the FTS index in one statement (for bulk_create, which sends no signals)"""
+    if not fts_enabled() or not messages:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, content) VALUES (%s, %s)',
+            [(message.pk, message.content) for message in messages],
+        )
+
+
+def unindex_message(message_id):
+    """Remove a message from the FTS index"""
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [message_id])
+
+
+def _tokenize(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def _fts_match_expression(tokens):
+    """Build an FTS5 MATCH expression: every token must match, as a prefix"""
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _render_highlight(text):
+    return escape(text).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+
+
+def _highlight_python(content, tokens):
+    """Fallback highlighter used when FTS5 is not available"""
+    preview = content[:PREVIEW_CHARS]
+    if len(content) > PREVIEW_CHARS:
+        preview += '...'
+    pattern = re.compile(r'\b(' + '|'.join(re.escape(t) for t in tokens) + r')\w*', re.IGNORECASE)
+    marked = pattern.sub(lambda m: f'{_MARK_START}{m.group(0)}{_MARK_END}', preview)
+    return _render_highlight(marked)
+
+
+def _participant_scope(user, recruiter_profile):
+    scope = Q(application__applicant=user)
+    if recruiter_profile is not None:
+        scope |= Q(application__job__recruiter=recruiter_profile)
+    return scope
+
+
+def search_messages(user, recruiter_profile, query, page=1, per_page=20):
+    """
+    Search the messages of every conversation ``user`` takes part in, either
+    as the applicant or as the recruiter owning the job.
+
+    Returns ``(total, rows)`` where ``rows`` is a list of
+    ``(message_id, highlighted_snippet)`` for the requested page, best
+    matches first.
+    """
+    tokens = _tokenize(query)
+    if not tokens:
+        return 0, []
+
+    offset = (page - 1) * per_page
+
+    if not fts_enabled():
+        messages = Message.objects.filter(
+            _participant_scope(user, recruiter_profile),
+            *[Q(content__icontains=token) for token in tokens]
+        ).order_by('-created_at')
+        total = messages.count()
+        rows = [
+            (message_id, _highlight_python(content, tokens))
+            for message_id, content in messages.values_list('id', 'content')[offset:offset + per_page]
+        ]
+        return total, rows
+
+    recruiter_id = recruiter_profile.id if recruiter_profile is not None else None
+    base_sql = f"""
+        FROM {FTS_TABLE}
+        JOIN jobs_message m ON m.id = {FTS_TABLE}.rowid
+        JOIN jobs_jobapplication a ON a.id = m.application_id
+        JOIN jobs_job j ON j.id = a.job_id
+        WHERE {FTS_TABLE} MATCH %s
+          AND (a.applicant_id = %s OR j.recruiter_id = %s)
+    """
+    params = [_fts_match_expression(tokens), user.id, recruiter_id]
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) {base_sql}', params)
+        total = cursor.fetchone()[0]
+        if not total:
+            return 0, []
+        cursor.execute(
+            f"""
+            SELECT m.id, snippet({FTS_TABLE}, 0, %s, %s, '...', %s)
+            {base_sql}
+            ORDER BY {FTS_TABLE}.rank, m.id DESC
+            LIMIT %s OFFSET %s
+            """,
+            [_MARK_START, _MARK_END, SNIPPET_TOKENS] + params + [per_page, offset],
+        )
+        rows = [(message_id, _render_highlight(snippet)) for message_id, snippet in cursor.fetchall()]
+
+    return total, rows
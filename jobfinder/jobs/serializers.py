@@ -0,0 +1,61 @@
+"""
+Shared helpers for building JSON AJAX payloads straight from ``values()`` rows.
+
+Display values (names, previews) are computed in SQL so views never need to
+load model instances just to format them. Dates are left as datetimes and
+serialized as ISO 8601 strings by ``DjangoJSONEncoder``; pages format them in
+the browser (``formatDate()`` in ``base.html``). Payloads are serialized with
+sorted keys and compact separators, so identical data always produces
+identical bytes (safe to cache or ETag).
+"""
+from django.db.models import Case, CharField, F, Value, When
+from django.db.models.functions import Coalesce, Concat, Length, NullIf, Substr, Trim
+from django.db.models.lookups import GreaterThan
+from django.http import JsonResponse
+
+
+def full_name(user_path):
+    """SQL equivalent of ``user.get_full_name() or user.username`` for the user at ``user_path``"""
+    return Coalesce(
+        NullIf(
+            Trim(Concat(F(f'{user_path}__first_name'), Value(' '), F(f'{user_path}__last_name'))),
+            Value('')
+        ),
+        F(f'{user_path}__username'),
+        output_field=CharField()
+    )
+
+
+def preview(field, length):
+    """SQL equivalent of ``text[:length] + '...'`` when ``text`` is longer than ``length``"""
+    return Case(
+        When(GreaterThan(Length(field), length), then=Concat(Substr(field, 1, length), Value('...'))),
+        default=F(field),
+        output_field=CharField()
+    )
+
+
+def serialize_rows(rows, fields, columnar=False):
+    """
+    Project ``rows`` onto ``fields``, a mapping of output key -> row key.
+
+    Returns a list of dicts, or with ``columnar=True`` a single dict of
+    parallel arrays (``{key: [value, ...]}``), which is much smaller for
+    long lists since keys are not repeated per row.
+    """
+    if columnar:
+        return {key: [row[column] for row in rows] for key, column in fields.items()}
+    return [{key: row[column] for key, column in fields.items()} for row in rows]
+
+
+def wants_columnar(request):
+    return request.GET.get('format') == 'columnar'
+
+
+def stable_json_response(data, **kwargs):
+    """JsonResponse with deterministic, compact encoding"""
+    return JsonResponse(
+        data,
+        json_dumps_params={'separators': (',', ':'), 'sort_keys': True},
+        **kwargs
+    )
@@ -0,0 +1,208 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import pre_delete, pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from jobfinder import pagecache
+from profiles.models import Profile
+from .models import (
+    ApplicationStatusEvent, ApplicationTombstone, Job, JobApplication, JobStats, Message, MessageReadState
+)
+from . import geocoder, search, tiles
+
+
+def _recruiter_of(message):
+    """
+    ``(job_id, recruiter user id)`` of a message's application, or None once it
+    is gone. Views that already have them set ``message.job_recruiter`` to save
+    the query.
+    """
+    known = getattr(message, 'job_recruiter', None)
+    if known is not None:
+        return known
+    return JobApplication.objects.filter(pk=message.application_id).values_list(
+        'job_id', 'job__recruiter__user_profile__user_id'
+    ).first()
+
+
+def _deleted_model(origin):
+    """Model whose delete() started a (possibly cascading) delete, from the signal's ``origin``"""
+    if origin is None:
+        return None
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+
+@receiver(post_save, sender=Message)
+def index_message_on_save(sender, instance, **kwargs):
+    """Keep the message full-text index in sync when a message is created or edited"""
+    search.index_message(instance)
+    if kwargs.get('created'):
+        # Message counts are part of the application's pipeline card
+        JobApplication.objects.filter(pk=instance.application_id).update(updated_at=timezone.now())
+        job_id, recruiter_id = _recruiter_of(instance)
+        if instance.sender_id != recruiter_id:
+            JobStats.add_unread(job_id, 1)
+
+
+@receiver(post_delete, sender=Message)
+def unindex_message_on_delete(sender, instance, origin=None, **kwargs):
+    """Drop deleted messages (including cascaded deletes) from the full-text index"""
+    search.unindex_message(instance.pk)
+    if _deleted_model(origin) not in (None, Message):
+        # The application goes in the same delete, and its unread messages
+        # with it (see count_unread_before_delete)
+        return
+    recruiter = _recruiter_of(instance)
+    if recruiter is not None:
+        job_id, recruiter_id = recruiter
+        JobApplication.objects.filter(pk=instance.application_id).update(updated_at=timezone.now())
+        read = MessageReadState.objects.filter(
+            application_id=instance.application_id, user_id=recruiter_id, last_read_message_id__gte=instance.pk
+        ).exists()
+        if instance.sender_id != recruiter_id and not read:
+            JobStats.add_unread(job_id, -1)
+
+
+@receiver(post_save, sender=Job)
+def create_job_stats(sender, instance, created, **kwargs):
+    if created:
+        JobStats.objects.get_or_create(job=instance)
+
+
+@receiver(post_save, sender=Job)
+@receiver(post_delete, sender=Job)
+def invalidate_job_pages(sender, instance, **kwargs):
+    """Cached public job pages are stale once any job changes"""
+    transaction.on_commit(lambda: pagecache.bump_generation('jobs'))
+
+
+@receiver(post_save, sender=JobApplication)
+def record_application_submitted(sender, instance, created, **kwargs):
+    """Start the application's status history when it is submitted"""
+    if created:
+        ApplicationStatusEvent.record(
+            [(instance.pk, instance.job_id, '', instance.status)],
+            changed_by=instance.applicant, at=instance.applied_at
+        )
+
+
+@receiver(pre_delete, sender=JobApplication)
+def count_unread_before_delete(sender, instance, origin=None, **kwargs):
+    """
+    Count the application's unread messages while they still exist, so the
+    job's counter drops once for the application instead of once per message.
+    """
+    # A deleted job takes its stats with it
+    if _deleted_model(origin) is not Job:
+        instance._unread_messages = JobStats.application_unread(instance.pk)
+
+
+@receiver(pre_delete, sender=JobApplication)
+def load_status_before_delete(sender, instance, origin=None, **kwargs):
+    """
+    An instance deleted directly may have been loaded before its status last
+    changed; cascaded and queryset deletes load fresh ones.
+    """
+    if origin is instance:
+        instance._stored_status = JobApplication.objects.filter(pk=instance.pk).values_list(
+            'status', flat=True
+        ).first()
+
+
+@receiver(post_delete, sender=JobApplication)
+def record_application_tombstone(sender, instance, **kwargs):
+    """Leave a tombstone so pipeline boards syncing by timestamp remove the card"""
+    ApplicationTombstone.objects.create(job_id=instance.job_id, application_id=instance.pk)
+    status = getattr(instance, '_stored_status', None) or instance.status
+    JobStats.apply_transitions([(instance.pk, instance.job_id, status, '')])
+    JobStats.add_unread(instance.job_id, -getattr(instance, '_unread_messages', 0))
+    # Jobs nobody deletes from any more are left to the prune_tombstones command
+    ApplicationTombstone.prune(job_id=instance.job_id)
+
+
+def _geocode_location(sender, instance):
+    """
+    Fill in coordinates from the location text when they are missing, or
+    when the location text changed but the coordinates were left as they were.
+    """
+    if instance.pk:
+        old = sender.objects.filter(pk=instance.pk).values_list('location', 'latitude', 'longitude').first()
+        if old is not None and old[0] != instance.location and old[1:] == (instance.latitude, instance.longitude):
+            instance.latitude = instance.longitude = None
+    if instance.location and (instance.latitude is None or instance.longitude is None):
+        coordinates = geocoder.geocode(instance.location)
+        if coordinates is not None:
+            instance.latitude, instance.longitude = coordinates
+
+
+# Connected before the tile handlers below, so they see the geocoded position
+@receiver(pre_save, sender=Job)
+def geocode_job_location(sender, instance, **kwargs):
+    _geocode_location(sender, instance)
+
+
+@receiver(pre_save, sender=Profile)
+def geocode_profile_location(sender, instance, **kwargs):
+    _geocode_location(sender, instance)
+
+
+def _invalidate_tiles_on_commit(points):
+    """Drop cached map tiles around ``points``, a list of ``(layer, lat, lng)``, once the write commits"""
+    if points:
+        transaction.on_commit(lambda: [tiles.invalidate_point(*point) for point in points])
+
+
+def _applicant_point(user_id):
+    """Map position of an applicant, or None when they do not share it"""
+    return Profile.objects.filter(user_id=user_id, show_location=True).values_list('latitude', 'longitude').first()
+
+
+@receiver(pre_save, sender=Job)
+def invalidate_job_tiles_on_save(sender, instance, **kwargs):
+    """A job that moves, appears or disappears changes the job map tiles at its old and new positions"""
+    new = (instance.latitude, instance.longitude, instance.is_active)
+    old = None
+    if instance.pk:
+        old = Job.objects.filter(pk=instance.pk).values_list('latitude', 'longitude', 'is_active').first()
+    if old == new:
+        return
+    # Only active jobs are on the map
+    points = [state[:2] for state in (old, new) if state is not None and state[2]]
+    _invalidate_tiles_on_commit([('jobs', *point) for point in points])
+
+
+@receiver(post_delete, sender=Job)
+def invalidate_job_tiles_on_delete(sender, instance, **kwargs):
+    if instance.is_active:
+        _invalidate_tiles_on_commit([('jobs', instance.latitude, instance.longitude)])
+
+
+@receiver(pre_save, sender=Profile)
+def invalidate_applicant_tiles_on_save(sender, instance, **kwargs):
+    """Moving or hiding an applicant changes the applicant map tiles of every job they applied to"""
+    new = (instance.latitude, instance.longitude) if instance.show_location else None
+    old = None
+    if instance.pk:
+        old = Profile.objects.filter(pk=instance.pk).values_list('latitude', 'longitude', 'show_location').first()
+        old = old[:2] if old and old[2] else None
+    if old == new:
+        return
+    job_ids = JobApplication.objects.filter(applicant_id=instance.user_id).values_list('job_id', flat=True)
+    _invalidate_tiles_on_commit([
+        (f'applicants:{job_id}', *point) for job_id in job_ids for point in (old, new) if point
+    ])
+
+
+@receiver(post_save, sender=JobApplication)
+def invalidate_applicant_tiles_on_apply(sender, instance, created, **kwargs):
+    if created:
+        point = _applicant_point(instance.applicant_id)
+        if point:
+            _invalidate_tiles_on_commit([(f'applicants:{instance.job_id}', *point)])
+
+
+@receiver(post_delete, sender=JobApplication)
+def invalidate_applicant_tiles_on_delete(sender, instance, **kwargs):
+    point = _applicant_point(instance.applicant_id)
+    if point:
+        _invalidate_tiles_on_commit([(f'applicants:{instance.job_id}', *point)])
@@ -1,3 +1,1502 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.messages import add_message, INFO
+from django.contrib.messages.storage import default_storage
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.db.models import Count, F
+from django.db.utils import ConnectionHandler
+from django.http import HttpResponse
+from django.template import engines
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from authentication.models import JobSeekerProfile, RecruiterProfile, UserProfile
+from jobfinder import csvexport, dbrouter, metrics, pagecache, ratelimit, servertiming
+from jobfinder.querybudget import QueryBudgetExceeded
+from profiles.models import Profile
+from . import analytics, datagen, geocoder, pipeline, search, serializers, tiles
+from .models import (
+    ApplicationStatusEvent, ApplicationTombstone, Job, JobApplication, JobStats, Message, MessageReadState
+)
+
+
+def make_recruiter(username):
+    user = User.objects.create_user(username=username, password='pw')
+    user_profile = UserProfile.objects.create(user=user, user_type='recruiter')
+    return user, RecruiterProfile.objects.create(user_profile=user_profile)
+
+
+def make_seeker(username):
+    user = User.objects.create_user(username=username, password='pw')
+    user_profile = UserProfile.objects.create(user=user, user_type='job_seeker')
+    JobSeekerProfile.objects.create(user_profile=user_profile)
+    return user
+
+
+# Tests create many users; the default hasher makes that slow
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class JobsTestCase(TestCase):
+    """A recruiter with one job and two applicants"""
+
+    def setUp(self):
+        # Rate-limit buckets and cached pages must not leak between tests
+        for cache in caches.all():
+            cache.clear()
+        self.recruiter, recruiter_profile = make_recruiter('recruiter')
+        self.job = Job.objects.create(
+            title='Backend Developer', description='APIs', company='Acme',
+            skills_required='python', recruiter=recruiter_profile
+        )
+        self.seeker = make_seeker('seeker')
+        self.other_seeker = make_seeker('other_seeker')
+        self.application = JobApplication.objects.create(job=self.job, applicant=self.seeker)
+        self.other_application = JobApplication.objects.create(job=self.job, applicant=self.other_seeker)
+        self.client.force_login(self.recruiter)
+
+    def post_json(self, name, data):
+        return self.client.post(reverse(name), json.dumps(data), content_type='application/json')
+
+
+class MessageSearchTests(JobsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.deploy = Message.objects.create(
+            application=self.application, sender=self.seeker, content='When is the deployment window?'
+        )
+        Message.objects.create(application=self.application, sender=self.recruiter, content='Friday afternoon')
+        # Not a conversation of the searching seeker
+        self.hidden = Message.objects.create(
+            application=self.other_application, sender=self.other_seeker, content='Deployment question'
+        )
+
+    def search(self, user, query):
+        return search.search_messages(user, None, query)
+
+    def test_prefix_match_with_highlight(self):
+        total, rows = self.search(self.seeker, 'deploy')
+
+        self.assertEqual(total, 1)
+        self.assertEqual(rows[0][0], self.deploy.id)
+        self.assertIn('<mark>deployment</mark>', rows[0][1])
+
+    def test_only_searches_own_conversations(self):
+        recruiter_profile = RecruiterProfile.objects.get(user_profile__user=self.recruiter)
+
+        self.assertEqual(self.search(self.other_seeker, 'window'), (0, []))
+        total, rows = search.search_messages(self.recruiter, recruiter_profile, 'deployment')
+        self.assertEqual({row[0] for row in rows}, {self.deploy.id, self.hidden.id})
+
+    def test_edits_and_deletes_update_the_index(self):
+        self.deploy.content = 'Rollout window moved'
+        self.deploy.save()
+        self.assertEqual(self.search(self.seeker, 'deploy')[0], 0)
+        self.assertEqual(self.search(self.seeker, 'rollout')[0], 1)
+
+        self.deploy.delete()
+        self.assertEqual(self.search(self.seeker, 'rollout')[0], 0)
+
+    def test_fallback_without_fts(self):
+        with mock.patch.object(search, 'fts_enabled', return_value=False):
+            total, rows = self.search(self.seeker, 'DEPLOY window')
+
+        self.assertEqual(total, 1)
+        self.assertEqual(rows[0][0], self.deploy.id)
+        self.assertIn('<mark>deployment</mark>', rows[0][1])
+
+    def test_search_view_escapes_content(self):
+        Message.objects.create(application=self.application, sender=self.seeker, content='<b>deploy</b> script')
+        self.client.force_login(self.seeker)
+
+        response = self.client.get(reverse('jobs:ajax_search_messages'), {'q': 'script'})
+
+        highlight = response.json()['results'][0]['highlight']
+        self.assertIn('&lt;b&gt;', highlight)
+        self.assertIn('<mark>script</mark>', highlight)
+
+
+class ReadWatermarkTests(JobsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.first, self.second = [
+            Message.objects.create(application=self.application, sender=self.seeker, content=content)
+            for content in ('Hello', 'Any news?')
+        ]
+
+    def watermark(self):
+        return MessageReadState.objects.get(application=self.application, user=self.recruiter).last_read_message_id
+
+    def test_unread_excludes_own_messages_and_those_up_to_the_watermark(self):
+        Message.objects.create(application=self.application, sender=self.recruiter, content='Soon')
+        self.assertEqual(Message.objects.unread_for(self.recruiter).count(), 2)
+
+        MessageReadState.mark_read(self.application, self.recruiter, self.first.id)
+
+        self.assertEqual(list(Message.objects.unread_for(self.recruiter)), [self.second])
+        self.assertEqual(Message.objects.unread_for(self.seeker).count(), 1)
+
+    def test_mark_read_never_moves_the_watermark_backwards(self):
+        MessageReadState.mark_read(self.application, self.recruiter, self.second.id)
+        # A slower request that loaded the thread before the second message
+        MessageReadState.mark_read(self.application, self.recruiter, self.first.id)
+
+        self.assertEqual(self.watermark(), self.second.id)
+        self.assertEqual(MessageReadState.objects.count(), 1)
+
+    def test_amark_read_never_moves_the_watermark_backwards(self):
+        async_to_sync(MessageReadState.amark_read)(self.application, self.recruiter, self.first.id)
+        self.assertEqual(self.watermark(), self.first.id)
+
+        async_to_sync(MessageReadState.amark_read)(self.application, self.recruiter, self.second.id)
+        async_to_sync(MessageReadState.amark_read)(self.application, self.recruiter, self.first.id)
+
+        self.assertEqual(self.watermark(), self.second.id)
+
+    def test_opening_the_thread_marks_it_read(self):
+        self.assertEqual(self.client.get(reverse('jobs:ajax_unread_count')).json()['unread_count'], 2)
+
+        self.client.get(reverse('jobs:ajax_messages', args=[self.application.id]))
+
+        self.assertEqual(self.watermark(), self.second.id)
+        self.assertEqual(self.client.get(reverse('jobs:ajax_unread_count')).json()['unread_count'], 0)
+
+
+@override_settings(RATE_LIMITS={
+    'jobs:ajax_unread_count': {'rate': 2, 'per': 60},
+    'jobs:my_jobs': {'rate': 1, 'per': 60},
+    'jobs:ajax_conversations': {'rate': 1, 'per': 60, 'methods': ['POST']},
+})
+class RateLimitTests(JobsTestCase):
+    def test_requests_over_the_limit_get_429_with_retry_after(self):
+        url = reverse('jobs:ajax_unread_count')
+        statuses = [self.client.get(url).status_code for _ in range(2)]
+        response = self.client.get(url)
+
+        self.assertEqual(statuses, [200, 200])
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(response.json()['retry_after'], 30)
+
+    def test_pages_get_a_plain_text_429(self):
+        self.client.get(reverse('jobs:my_jobs'))
+        response = self.client.get(reverse('jobs:my_jobs'))
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Content-Type'], 'text/plain')
+
+    def test_each_user_has_their_own_bucket(self):
+        url = reverse('jobs:ajax_unread_count')
+        for _ in range(3):
+            self.client.get(url)
+        self.client.force_login(self.seeker)
+
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_other_methods_are_not_limited(self):
+        url = reverse('jobs:ajax_conversations')
+
+        self.assertEqual([self.client.get(url).status_code for _ in range(3)], [200, 200, 200])
+
+    @override_settings(RATE_LIMIT_ENABLED=False)
+    def test_disabled(self):
+        url = reverse('jobs:my_jobs')
+
+        self.assertEqual([self.client.get(url).status_code for _ in range(3)], [200, 200, 200])
+
+    def test_buckets_refill_over_time(self):
+        store = ratelimit.InMemoryTokenBucketStore()
+        with mock.patch.object(ratelimit.time, 'monotonic', return_value=100.0) as clock:
+            self.assertEqual(store.consume('key', 1, 0.5), (True, 0))
+            self.assertEqual(store.consume('key', 1, 0.5), (False, 2.0))
+            clock.return_value = 102.0
+            self.assertEqual(store.consume('key', 1, 0.5), (True, 0))
+
+
+class SerializerTests(JobsTestCase):
+    def test_full_name_falls_back_to_username(self):
+        User.objects.filter(pk=self.seeker.pk).update(first_name='Ada', last_name='Lovelace')
+        names = dict(
+            JobApplication.objects.annotate(
+                name=serializers.full_name('applicant')
+            ).values_list('applicant__username', 'name')
+        )
+
+        self.assertEqual(names, {'seeker': 'Ada Lovelace', 'other_seeker': 'other_seeker'})
+
+    def test_preview_truncates_long_text(self):
+        Message.objects.create(application=self.application, sender=self.seeker, content='x' * 10)
+        Message.objects.create(application=self.application, sender=self.seeker, content='short')
+
+        previews = Message.objects.annotate(text=serializers.preview('content', 6)).order_by('id')
+
+        self.assertEqual([message.text for message in previews], ['xxxxxx...', 'short'])
+
+    def test_serialize_rows_as_objects_or_columns(self):
+        rows = [{'id': 1, 'sender_name': 'Ada'}, {'id': 2, 'sender_name': 'Bob'}]
+        fields = {'id': 'id', 'sender': 'sender_name'}
+
+        self.assertEqual(
+            serializers.serialize_rows(rows, fields),
+            [{'id': 1, 'sender': 'Ada'}, {'id': 2, 'sender': 'Bob'}]
+        )
+        self.assertEqual(
+            serializers.serialize_rows(rows, fields, columnar=True),
+            {'id': [1, 2], 'sender': ['Ada', 'Bob']}
+        )
+
+    def test_stable_json_response_is_sorted_and_compact(self):
+        response = serializers.stable_json_response({'b': [1, 2], 'a': datetime(2024, 5, 1, 9, 30)})
+
+        self.assertEqual(response.content, b'{"a":"2024-05-01T09:30:00","b":[1,2]}')
+
+    def test_messages_view_in_columnar_format(self):
+        Message.objects.create(application=self.application, sender=self.seeker, content='Hello')
+
+        response = self.client.get(
+            reverse('jobs:ajax_messages', args=[self.application.id]), {'format': 'columnar'}
+        )
+
+        messages = response.json()['messages']
+        self.assertEqual(messages['content'], ['Hello'])
+        self.assertEqual(messages['is_own'], [False])
+
+
+class PipelineBoardTests(JobsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('jobs:application_pipeline', args=[self.job.id])
+
+    def test_cards_carry_message_and_unread_counts(self):
+        Message.objects.create(application=self.application, sender=self.seeker, content='Hi')
+        Message.objects.create(application=self.application, sender=self.recruiter, content='Hello')
+
+        counts = {
+            card.id: (card.message_count, card.unread_count)
+            for card in pipeline.card_queryset(self.job.id, self.recruiter)
+        }
+
+        self.assertEqual(counts, {self.application.id: (2, 1), self.other_application.id: (0, 0)})
+
+    def test_board_groups_applications_by_status(self):
+        JobApplication.objects.filter(pk=self.other_application.pk).update(status='interview')
+        rejected = JobApplication.objects.create(job=self.job, applicant=make_seeker('rejected'), status='rejected')
+
+        response = self.client.get(self.url)
+
+        board = response.context['applications_by_status']
+        self.assertEqual([application.id for application in board['applied']], [self.application.id])
+        self.assertEqual([application.id for application in board['interview']], [self.other_application.id])
+        self.assertNotIn(rejected.id, [application.id for column in board.values() for application in column])
+        self.assertEqual(response.context['column_counts'], {
+            'applied': 1, 'review': 0, 'interview': 1, 'offer': 0, 'closed': 0
+        })
+
+    def test_query_count_does_not_grow_with_applications(self):
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(self.url)
+        for i in range(5):
+            application = JobApplication.objects.create(job=self.job, applicant=make_seeker(f'seeker{i}'))
+            Message.objects.create(application=application, sender=application.applicant, content='Hi')
+
+        with self.assertNumQueries(len(before)):
+            self.client.get(self.url)
+
+
+class BulkTransitionTests(JobsTestCase):
+    def test_moves_with_current_versions_are_applied(self):
+        response = self.post_json('jobs:ajax_bulk_transition', {'moves': [
+            {'id': self.application.id, 'status': 'review', 'version': 0},
+            {'id': self.other_application.id, 'status': 'review', 'version': 0},
+        ]})
+
+        data = response.json()
+        self.assertEqual(data['updated_count'], 2)
+        self.assertEqual(data['results'][str(self.application.id)]['version'], 1)
+        self.assertEqual(
+            set(JobApplication.objects.values_list('status', flat=True)), {'review'}
+        )
+
+    def test_stale_version_is_reported_as_conflict_and_not_written(self):
+        # Someone else moved the application after the board loaded it
+        JobApplication.objects.filter(pk=self.application.pk).update(status='interview', version=1)
+
+        response = self.post_json('jobs:ajax_bulk_transition', {'moves': [
+            {'id': self.application.id, 'status': 'offer', 'version': 0},
+            {'id': self.other_application.id, 'status': 'offer', 'version': 0},
+        ]})
+
+        results = response.json()['results']
+        conflict = results[str(self.application.id)]
+        self.assertTrue(conflict['conflict'])
+        self.assertEqual(conflict['current']['status'], 'interview')
+        self.assertTrue(results[str(self.other_application.id)]['success'])
+
+        self.application.refresh_from_db()
+        self.assertEqual((self.application.status, self.application.version), ('interview', 1))
+        self.assertFalse(ApplicationStatusEvent.objects.filter(
+            application=self.application, to_status='offer'
+        ).exists())
+
+    def test_moves_without_a_usable_id_are_reported(self):
+        response = self.post_json('jobs:ajax_bulk_transition', {'moves': [
+            {'id': 'abc', 'status': 'review'},
+            {'id': self.application.id, 'status': 'review'},
+        ]})
+
+        data = response.json()
+        self.assertEqual(data['updated_count'], 1)
+        self.assertEqual(data['errors'], [{'index': 0, 'id': 'abc', 'error': 'Invalid application id'}])
+
+
+@override_settings(PIPELINE_SYNC_OVERLAP_SECONDS=0)
+class PipelineChangesTests(JobsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('jobs:ajax_pipeline_changes', args=[self.job.id])
+        self.since = timezone.now() - timedelta(minutes=30)
+        JobApplication.objects.update(updated_at=self.since - timedelta(minutes=30))
+
+    def changes(self, since):
+        return self.client.get(self.url, {'since': since.isoformat()}).json()
+
+    def test_without_since_only_returns_a_version(self):
+        data = self.client.get(self.url).json()
+
+        self.assertIn('version', data)
+        self.assertNotIn('changes', data)
+
+    def test_returns_only_applications_changed_since(self):
+        JobApplication.objects.filter(pk=self.application.pk).update(status='review', updated_at=timezone.now())
+
+        data = self.changes(self.since)
+
+        self.assertEqual([change['id'] for change in data['changes']], [self.application.id])
+        self.assertEqual(data['changes'][0]['status'], 'review')
+        self.assertEqual(data['counts']['review'], 1)
+        self.assertEqual(data['deleted'], [])
+
+    def test_nothing_changed(self):
+        data = self.changes(self.since)
+
+        self.assertEqual((data['changes'], data['deleted'], data['counts']), ([], [], None))
+
+    def test_new_applications_carry_their_card(self):
+        new = JobApplication.objects.create(job=self.job, applicant=make_seeker('late_seeker'))
+
+        change = self.changes(self.since)['changes'][0]
+
+        self.assertEqual(change['id'], new.id)
+        self.assertIn(f'data-application-id="{new.id}"', change['html'])
+
+    def test_deleted_applications_are_returned_as_tombstones(self):
+        application_id = self.application.id
+        self.application.delete()
+
+        data = self.changes(self.since)
+
+        self.assertEqual(data['deleted'], [application_id])
+        self.assertEqual(self.changes(timezone.now() + timedelta(seconds=1))['deleted'], [])
+
+    def test_version_older_than_tombstone_retention_resets(self):
+        data = self.changes(timezone.now() - ApplicationTombstone.RETENTION - timedelta(hours=1))
+
+        self.assertTrue(data['reset'])
+
+    @override_settings(PIPELINE_SYNC_OVERLAP_SECONDS=60)
+    def test_overlap_resends_recent_changes(self):
+        JobApplication.objects.filter(pk=self.application.pk).update(updated_at=timezone.now())
+
+        data = self.changes(timezone.now() + timedelta(seconds=30))
+
+        self.assertEqual([change['id'] for change in data['changes']], [self.application.id])
+
+    def test_version_is_the_newest_change_returned(self):
+        changed_at = timezone.now() - timedelta(minutes=10)
+        JobApplication.objects.filter(pk=self.application.pk).update(updated_at=changed_at)
+
+        data = self.changes(self.since)
+
+        self.assertEqual(data['version'], changed_at.isoformat())
+        self.assertEqual(self.changes(changed_at)['version'], changed_at.isoformat())
+
+    def test_changes_older_than_the_request_but_seen_later_are_not_skipped(self):
+        JobApplication.objects.filter(pk=self.application.pk).update(updated_at=timezone.now() - timedelta(minutes=10))
+        version = parse_datetime(self.changes(self.since)['version'])
+        # Committed (or replayed by a lagging replica) after that sync, but stamped before it ran
+        JobApplication.objects.filter(pk=self.other_application.pk).update(
+            updated_at=timezone.now() - timedelta(minutes=5)
+        )
+
+        data = self.changes(version)
+
+        self.assertEqual([change['id'] for change in data['changes']], [self.other_application.id])
+
+    def test_idle_board_version_catches_up(self):
+        idle_since = timezone.now() - pipeline.IDLE_SYNC_VERSION_AGE
+
+        data = self.changes(timezone.now() - timedelta(days=3))
+
+        self.assertGreaterEqual(parse_datetime(data['version']), idle_since)
+
+
+class HiringAnalyticsTests(JobsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.third_application = JobApplication.objects.create(job=self.job, applicant=make_seeker('third_seeker'))
+        self.start = timezone.now() - timedelta(days=1)
+        ApplicationStatusEvent.objects.update(created_at=self.start)
+        self.move(self.application, 'applied', 'review', hours=1)
+        self.move(self.application, 'review', 'interview', hours=3)
+        self.move(self.other_application, 'applied', 'rejected', hours=2)
+        # Straight to an offer, then back for another interview round
+        self.move(self.third_application, 'applied', 'offer', hours=1)
+        self.move(self.third_application, 'offer', 'interview', hours=2)
+
+    def move(self, application, from_status, to_status, hours):
+        ApplicationStatusEvent.record(
+            [(application.id, self.job.id, from_status, to_status)],
+            changed_by=self.recruiter, at=self.start + timedelta(hours=hours)
+        )
+
+    def test_time_in_stage(self):
+        stages = {stage['status']: stage for stage in analytics.time_in_stage(self.job.id)}
+
+        self.assertEqual(
+            {key: stages['applied'][key] for key in ('entries', 'current', 'avg_seconds', 'max_seconds')},
+            {'entries': 3, 'current': 0, 'avg_seconds': 4800, 'max_seconds': 7200}
+        )
+        self.assertEqual((stages['review']['entries'], stages['review']['avg_seconds']), (1, 7200))
+        self.assertEqual((stages['interview']['entries'], stages['interview']['current']), (2, 2))
+        self.assertIsNone(stages['interview']['avg_seconds'])
+        self.assertEqual(stages['closed']['entries'], 0)
+
+    def test_funnel_is_cumulative_with_rejections_separate(self):
+        funnel = analytics.funnel(self.job.id)
+
+        self.assertEqual(
+            [(stage['status'], stage['count']) for stage in funnel['stages']],
+            [('applied', 3), ('review', 2), ('interview', 2), ('offer', 1), ('closed', 0)]
+        )
+        self.assertEqual(funnel['stages'][1]['conversion'], 0.6667)
+        self.assertEqual(funnel['rejected'], {'count': 1, 'conversion': 0.3333})
+
+    def test_stats_endpoint(self):
+        data = self.client.get(reverse('jobs:ajax_pipeline_stats', args=[self.job.id])).json()
+
+        self.assertEqual(data['job_id'], self.job.id)
+        self.assertEqual(data['funnel']['stages'][0]['count'], 3)
+        self.assertEqual(len(data['time_in_stage']), len(JobApplication.STATUS_CHOICES))
+
+    def test_stats_endpoint_is_only_for_the_jobs_recruiter(self):
+        self.client.force_login(make_recruiter('other_recruiter')[0])
+
+        response = self.client.get(reverse('jobs:ajax_pipeline_stats', args=[self.job.id]))
+
+        self.assertEqual(response.status_code, 404)
+
+
+class JobStatsTests(JobsTestCase):
+    FIELDS = [
+        'total_applications', 'applied_count', 'review_count', 'interview_count', 'offer_count',
+        'closed_count', 'rejected_count', 'unread_messages',
+    ]
+
+    def stats(self):
+        return JobStats.objects.filter(job=self.job).values(*self.FIELDS).get()
+
+    def assertMatchesRebuild(self):
+        incremental = self.stats()
+        JobStats.rebuild([self.job.id])
+        self.assertEqual(incremental, self.stats())
+        return incremental
+
+    def send(self, user, application, content='Hello'):
+        self.client.force_login(user)
+        response = self.post_json('jobs:ajax_send_message', {'application_id': application.id, 'content': content})
+        self.assertTrue(response.json()['success'])
+
+    def test_application_counters_follow_transitions(self):
+        self.assertEqual(self.assertMatchesRebuild()['applied_count'], 2)
+
+        self.post_json('jobs:ajax_bulk_transition', {'moves': [
+            {'id': self.application.id, 'status': 'interview'},
+            {'id': self.other_application.id, 'status': 'review'},
+        ]})
+        self.post_json('jobs:ajax_delete_application', {'application_id': self.other_application.id})
+        stats = self.assertMatchesRebuild()
+
+        self.assertEqual(
+            (stats['applied_count'], stats['review_count'], stats['interview_count'], stats['rejected_count']),
+            (0, 0, 1, 1)
+        )
+        self.application.delete()
+        self.assertEqual(self.assertMatchesRebuild()['total_applications'], 1)
+
+    def test_apply_transitions_in_bulk(self):
+        JobStats.apply_transitions([
+            (self.application.id, self.job.id, 'applied', 'review'),
+            (self.other_application.id, self.job.id, 'applied', 'offer'),
+            (0, self.job.id, '', 'applied'),
+            (self.application.id, self.job.id, 'review', 'review'),
+        ])
+
+        stats = self.stats()
+        self.assertEqual(
+            (stats['total_applications'], stats['applied_count'], stats['review_count'], stats['offer_count']),
+            (3, 1, 1, 1)
+        )
+
+    def test_unread_messages_follow_sends_reads_and_deletes(self):
+        self.send(self.seeker, self.application)
+        self.send(self.seeker, self.application)
+        self.send(self.other_seeker, self.other_application)
+        # The recruiter's own messages are not unread for them
+        self.send(self.recruiter, self.application)
+        self.assertEqual(self.assertMatchesRebuild()['unread_messages'], 3)
+
+        self.client.get(reverse('jobs:ajax_messages', args=[self.application.id]))
+        self.assertEqual(self.assertMatchesRebuild()['unread_messages'], 1)
+
+        # A read message, then a whole application with an unread one
+        self.application.messages.filter(sender=self.seeker).first().delete()
+        self.assertEqual(self.assertMatchesRebuild()['unread_messages'], 1)
+        self.other_application.delete()
+        self.assertEqual(self.assertMatchesRebuild()['unread_messages'], 0)
+
+    def test_deleting_a_user_drops_their_unread_messages(self):
+        self.send(self.seeker, self.application)
+        self.send(self.other_seeker, self.other_application)
+
+        self.seeker.delete()
+
+        self.assertEqual(self.assertMatchesRebuild()['unread_messages'], 1)
+
+    def test_add_unread_is_clamped_at_zero(self):
+        JobStats.add_unread(self.job.id, 2)
+        JobStats.add_unread(self.job.id, -5)
+
+        self.assertEqual(self.stats()['unread_messages'], 0)
+
+
+class OptimisticLockingTests(JobsTestCase):
+    """Writes carrying the ``version`` the board last saw are refused once someone else moved the card"""
+
+    def test_update_with_stale_version_returns_409(self):
+        JobApplication.objects.filter(pk=self.application.pk).update(version=3)
+
+        response = self.post_json('jobs:ajax_update_status', {
+            'application_id': self.application.id, 'status': 'review', 'version': 2
+        })
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['current']['version'], 3)
+
+    def test_update_with_current_version_bumps_it(self):
+        response = self.post_json('jobs:ajax_update_status', {
+            'application_id': self.application.id, 'status': 'review', 'version': 0
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.application.refresh_from_db()
+        self.assertEqual((self.application.status, self.application.version), ('review', 1))
+
+    def test_delete_with_stale_version_returns_409_and_keeps_the_application(self):
+        JobApplication.objects.filter(pk=self.application.pk).update(status='interview', version=1)
+
+        response = self.post_json('jobs:ajax_delete_application', {
+            'application_id': self.application.id, 'rejection_reason': 'Filled', 'version': 0
+        })
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['current']['status'], 'interview')
+        self.application.refresh_from_db()
+        self.assertEqual((self.application.status, self.application.version), ('interview', 1))
+        self.assertFalse(ApplicationStatusEvent.objects.filter(
+            application=self.application, to_status='rejected'
+        ).exists())
+
+
+class PipelineColumnPageTests(JobsTestCase):
+    def setUp(self):
+        super().setUp()
+        # Same timestamp everywhere, so the pages rely on the id tie-break
+        stamp = timezone.now()
+        for i in range(3):
+            JobApplication.objects.create(job=self.job, applicant=make_seeker(f'seeker{i}'))
+        JobApplication.objects.update(status_updated_at=stamp)
+        self.ids = sorted(JobApplication.objects.values_list('id', flat=True), reverse=True)
+
+    def pages(self, page_size):
+        pages, cursor = [], None
+        while True:
+            applications, cursor = pipeline.column_page(
+                self.job.id, 'applied', self.recruiter, cursor=cursor, page_size=page_size
+            )
+            pages.append([application.id for application in applications])
+            if cursor is None:
+                return pages
+
+    def test_pages_cover_the_column_once_in_order(self):
+        pages = self.pages(2)
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual(sum(pages, []), self.ids)
+
+    def test_exactly_full_last_page_has_no_next_cursor(self):
+        self.assertEqual(self.pages(5), [self.ids[:5]])
+        self.assertEqual(self.pages(len(self.ids)), [self.ids])
+
+    def test_cursor_skips_newer_applications(self):
+        applications, cursor = pipeline.column_page(self.job.id, 'applied', self.recruiter, page_size=2)
+        JobApplication.objects.filter(pk=applications[0].pk).update(
+            status_updated_at=timezone.now() + timedelta(minutes=1)
+        )
+
+        applications, _ = pipeline.column_page(self.job.id, 'applied', self.recruiter, cursor=cursor, page_size=2)
+
+        self.assertEqual([application.id for application in applications], self.ids[2:4])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(
+            reverse('jobs:ajax_pipeline_column', args=[self.job.id, 'applied']), {'cursor': 'garbage'}
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+    @mock.patch.object(pipeline, 'PAGE_SIZE', 2)
+    def test_column_endpoint_renders_the_next_page(self):
+        url = reverse('jobs:ajax_pipeline_column', args=[self.job.id, 'applied'])
+        _, cursor = pipeline.column_page(self.job.id, 'applied', self.recruiter)
+
+        data = self.client.get(url, {'cursor': cursor}).json()
+
+        self.assertEqual(data['count'], 2)
+        for application_id in self.ids[2:4]:
+            self.assertIn(f'data-application-id="{application_id}"', data['html'])
+        self.assertIsNotNone(data['next_cursor'])
+
+    def test_column_endpoint_rejects_unknown_statuses(self):
+        url = reverse('jobs:ajax_pipeline_column', args=[self.job.id, 'rejected'])
+
+        self.assertEqual(self.client.get(url).status_code, 400)
+
+
+class ApplicantLocationTests(JobsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('jobs:ajax_applicant_locations', args=[self.job.id])
+        User.objects.filter(pk=self.seeker.pk).update(first_name='Ada', last_name='Lovelace')
+        Profile.objects.create(user=self.seeker, location='Atlanta, GA', latitude=33.75, longitude=-84.39)
+        Profile.objects.create(user=self.other_seeker, latitude=33.76, longitude=-84.38, show_location=False)
+        self.nearby = JobApplication.objects.create(job=self.job, applicant=make_seeker('nearby'))
+        Profile.objects.create(user=self.nearby.applicant, latitude=33.77, longitude=-84.37)
+        # No coordinates, so not on the map
+        no_location = JobApplication.objects.create(job=self.job, applicant=make_seeker('nowhere'))
+        Profile.objects.create(user=no_location.applicant)
+
+    def test_points_of_applicants_sharing_their_location(self):
+        data = self.client.get(self.url).json()
+
+        locations = data['locations']
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(locations['id'], [self.application.id, self.nearby.id])
+        self.assertEqual(locations['name'], ['Ada Lovelace', 'nearby'])
+        self.assertEqual(locations['location'], ['Atlanta, GA', 'Location not specified'])
+        self.assertEqual(locations['lat'], [33.75, 33.77])
+        self.assertEqual(data['status_labels']['applied'], 'Applied')
+
+    def test_selected_ids_only(self):
+        data = self.client.get(self.url, {'ids': f'{self.nearby.id},{self.other_application.id}'}).json()
+
+        self.assertEqual(data['locations']['id'], [self.nearby.id])
+
+    def test_clustered_when_zoomed_out(self):
+        data = self.client.get(self.url, {'zoom': 3}).json()
+
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(data['clusters']['count'], [2])
+
+    def test_invalid_zoom(self):
+        self.assertEqual(self.client.get(self.url, {'zoom': 99}).status_code, 400)
+
+    def test_only_the_jobs_recruiter(self):
+        self.client.force_login(make_recruiter('other_recruiter')[0])
+
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class MapTileTests(JobsTestCase):
+    def setUp(self):
+        super().setUp()
+        Job.objects.filter(pk=self.job.pk).update(latitude=33.75, longitude=-84.39)
+        Profile.objects.create(user=self.seeker, latitude=33.75, longitude=-84.39)
+        self.x, self.y = tiles.tile_for_point(33.75, -84.39, 8)
+
+    def job_tile(self, z=8, x=None, y=None):
+        x = self.x if x is None else x
+        y = self.y if y is None else y
+        return self.client.get(reverse('jobs:job_map_tile', args=[z, x, y]))
+
+    def applicant_tile(self):
+        return self.client.get(reverse('jobs:ajax_applicant_map_tile', args=[self.job.id, 8, self.x, self.y]))
+
+    def test_quadkeys(self):
+        self.assertEqual(tiles.quadkey(0, 0, 0), '')
+        self.assertEqual(tiles.quadkey(3, 3, 5), '213')
+        # A tile's quadkey prefixes the quadkey of every point inside it
+        point = tiles.quadkey(tiles.MAX_ZOOM, *tiles.tile_for_point(33.75, -84.39, tiles.MAX_ZOOM))
+        self.assertTrue(point.startswith(tiles.quadkey(8, self.x, self.y)))
+
+    def test_tile_bounds_contain_the_point(self):
+        south, west, north, east = tiles.tile_bounds(8, self.x, self.y)
+
+        self.assertTrue(south <= 33.75 < north and west <= -84.39 < east)
+
+    def test_tiles_are_cached_until_a_point_in_them_changes(self):
+        self.assertEqual(self.job_tile().json()['count'], 1)
+        # Written without signals, so the cached tile is not dropped
+        Job.objects.filter(pk=self.job.pk).update(is_active=False)
+        self.assertEqual(self.job_tile().json()['count'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Job.objects.create(
+                title='Nearby', description='x', company='Acme', recruiter=self.job.recruiter,
+                latitude=33.76, longitude=-84.38
+            )
+
+        self.assertEqual(self.job_tile().json()['count'], 1)
+        self.assertEqual(self.job_tile().json()['clusters']['lat'], [33.76])
+
+    def test_tiles_elsewhere_are_kept(self):
+        other = tiles.tile_for_point(42.36, -71.06, 8)
+        self.job_tile(x=other[0], y=other[1])
+        Job.objects.filter(pk=self.job.pk).update(latitude=42.36, longitude=-71.06)
+
+        tiles.invalidate_point('jobs', 33.75, -84.39)
+
+        # Still the cached (now stale) tile: only tiles around the point were dropped
+        self.assertEqual(self.job_tile(x=other[0], y=other[1]).json()['count'], 0)
+
+    def test_status_changes_invalidate_applicant_tiles(self):
+        self.assertEqual(self.applicant_tile().json()['clusters']['status'], ['applied'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post_json('jobs:ajax_update_status', {'application_id': self.application.id, 'status': 'interview'})
+
+        self.assertEqual(self.applicant_tile().json()['clusters']['status'], ['interview'])
+
+    def test_responses_are_browser_cacheable(self):
+        self.assertIn('public', self.job_tile()['Cache-Control'])
+        self.assertIn('private', self.applicant_tile()['Cache-Control'])
+
+    def test_invalid_tile(self):
+        self.assertEqual(self.job_tile(z=2, x=4, y=0).status_code, 400)
+
+
+class GeocoderTests(TestCase):
+    def label(self, text):
+        gazetteer = geocoder.get_gazetteer()
+        record = gazetteer.lookup(geocoder.normalize(text))
+        return gazetteer.labels[record] if record is not None else None
+
+    def test_city_region_and_postcode_forms(self):
+        for text in ('Atlanta, GA', 'Atlanta, Georgia, USA', 'atlanta ga', 'Remote, Atlanta, GA'):
+            with self.subTest(text):
+                self.assertEqual(self.label(text), 'Atlanta, GA')
+        self.assertEqual(self.label('Boston 02108'), 'Boston, MA')
+        self.assertEqual(self.label('Remote - greater Boston area'), 'Boston, MA')
+        self.assertEqual(self.label('New York, New York (Hybrid)'), 'New York, NY')
+
+    def test_ambiguous_names(self):
+        # Without a region the most populous city wins; with one it must match
+        self.assertEqual(self.label('Portland'), 'Portland, OR')
+        self.assertEqual(self.label('Portland, ME'), 'Portland, ME')
+        self.assertEqual(self.label('Portland, Maine, USA'), 'Portland, ME')
+        self.assertEqual(self.label('Birmingham, AL'), 'Birmingham, AL')
+        self.assertIsNone(self.label('Paris, TX'))
+        self.assertIsNone(self.label('London, Ontario'))
+
+    def test_aliases(self):
+        for text, label in [
+            ('NYC', 'New York, NY'),
+            ('New York City', 'New York, NY'),
+            ('San Francisco Bay Area', 'San Francisco, CA'),
+            ('Remote - SF Bay Area', 'San Francisco, CA'),
+            ('Bengaluru, India', 'Bangalore, KA, IN'),
+        ]:
+            with self.subTest(text):
+                self.assertEqual(self.label(text), label)
+
+    def test_text_that_is_not_a_place(self):
+        for text in ('Mobile app developer', 'Senior engineer', 'Remote', 'Remote, US', ''):
+            with self.subTest(text):
+                self.assertIsNone(geocoder.geocode(text))
+
+    def test_every_label_geocodes_to_its_own_city(self):
+        gazetteer = geocoder.get_gazetteer()
+
+        self.assertEqual([label for label in gazetteer.labels if self.label(label) != label], [])
+
+    def test_complete(self):
+        self.assertEqual(geocoder.complete('san f'), ['San Francisco, CA'])
+        self.assertEqual(geocoder.complete('NYC'), ['New York, NY'])
+        self.assertEqual(geocoder.complete(''), [])
+        self.assertLessEqual(len(geocoder.complete('s', limit=3)), 3)
+
+    def test_autocomplete_endpoint(self):
+        response = self.client.get(reverse('jobs:ajax_location_autocomplete'), {'q': 'Atla'})
+
+        self.assertEqual(response.json()['results'][0], 'Atlanta, GA')
+        self.assertIn('public', response['Cache-Control'])
+        self.assertEqual(
+            self.client.get(reverse('jobs:ajax_location_autocomplete')).json()['results'], []
+        )
+
+    def test_locations_are_geocoded_on_save(self):
+        recruiter_profile = make_recruiter('recruiter')[1]
+        job = Job.objects.create(
+            title='Engineer', description='x', company='Acme', recruiter=recruiter_profile, location='Boston, MA'
+        )
+        self.assertEqual((job.latitude, job.longitude), geocoder.geocode('Boston, MA'))
+
+        job.location = 'NYC'
+        job.save()
+
+        self.assertEqual((job.latitude, job.longitude), geocoder.geocode('New York, NY'))
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        caches['pages'].clear()
+        self.factory = RequestFactory()
+        self.calls = 0
+
+    def view(self, request):
+        self.calls += 1
+        response = HttpResponse(f'render {self.calls}')
+        if request.GET.get('cookie'):
+            response.set_cookie('seen', '1')
+        return response
+
+    def get(self, path='/jobs/', user=None, flash=None):
+        request = self.factory.get(path)
+        SessionMiddleware(lambda request: None).process_request(request)
+        request.user = user or AnonymousUser()
+        request._messages = default_storage(request)
+        if flash:
+            add_message(request, INFO, flash)
+        return pagecache.cache_anonymous_page('test')(self.view)(request)
+
+    def test_anonymous_get_is_served_from_cache(self):
+        first = self.get()
+        second = self.get()
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(second.content, first.content)
+
+    def test_tracking_parameters_share_the_cached_page(self):
+        self.get('/jobs/?q=python')
+        self.get('/jobs/?utm_source=mail&q=python&ref=x')
+
+        self.assertEqual(self.calls, 1)
+
+    def test_bump_generation_invalidates(self):
+        self.get()
+        pagecache.bump_generation('test')
+        self.get()
+
+        self.assertEqual(self.calls, 2)
+
+    def test_responses_setting_cookies_are_not_cached(self):
+        self.get('/jobs/?cookie=1')
+        self.get('/jobs/?cookie=1')
+
+        self.assertEqual(self.calls, 2)
+
+    def test_requests_with_flash_messages_bypass_the_cache(self):
+        self.get()
+        response = self.get(flash='Saved')
+
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(response.content, b'render 2')
+
+    def test_logged_in_users_bypass_the_cache(self):
+        user = User.objects.create_user(username='visitor', password='pw')
+        self.get(user=user)
+        self.get(user=user)
+
+        self.assertEqual(self.calls, 2)
+
+    def test_job_list_is_cached_for_anonymous_visitors(self):
+        recruiter_profile = make_recruiter('recruiter')[1]
+        self.client.get(reverse('jobs:job_list'))
+        # Saved inside the test transaction, so the generation bump never runs
+        Job.objects.create(
+            title='Unlisted Role', description='x', company='Acme', skills_required='x', recruiter=recruiter_profile
+        )
+
+        self.assertNotContains(self.client.get(reverse('jobs:job_list')), 'Unlisted Role')
+        self.client.force_login(recruiter_profile.user_profile.user)
+        self.assertContains(self.client.get(reverse('jobs:job_list')), 'Unlisted Role')
+
+    def test_saving_a_job_invalidates_the_job_pages(self):
+        recruiter_profile = make_recruiter('recruiter')[1]
+        self.client.get(reverse('jobs:job_list'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Job.objects.create(
+                title='Fresh Role', description='x', company='Acme', skills_required='x', recruiter=recruiter_profile
+            )
+
+        self.assertContains(self.client.get(reverse('jobs:job_list')), 'Fresh Role')
+
+
+class CardFragmentCacheTests(JobsTestCase):
+    def test_job_cards_are_reused_until_the_job_is_saved(self):
+        self.assertContains(self.client.get(reverse('jobs:job_list')), 'Backend Developer')
+        # Not a save, so updated_at and the fragment key stay the same
+        Job.objects.filter(pk=self.job.pk).update(title='Platform Engineer')
+        self.assertContains(self.client.get(reverse('jobs:job_list')), 'Backend Developer')
+
+        self.job.refresh_from_db()
+        self.job.save()
+
+        response = self.client.get(reverse('jobs:job_list'))
+        self.assertContains(response, 'Platform Engineer')
+        self.assertNotContains(response, 'Backend Developer')
+
+    def test_my_jobs_cards_follow_job_edits(self):
+        self.client.get(reverse('jobs:my_jobs'))
+        self.job.company = 'Globex'
+        self.job.save()
+
+        self.assertContains(self.client.get(reverse('jobs:my_jobs')), 'Globex')
+
+    def test_application_cards_follow_status_and_applicant_changes(self):
+        JobApplication.objects.update(notified=False)
+        url = reverse('jobs:application_pipeline', args=[self.job.id])
+        notified_badge = b'notification-status badge bg-success'
+        notified = self.client.get(url).content.count(notified_badge)
+
+        self.post_json('jobs:ajax_update_status', {
+            'application_id': self.application.id, 'status': 'review', 'notify': True
+        })
+        User.objects.filter(pk=self.seeker.pk).update(first_name='Grace', last_name='Hopper')
+
+        response = self.client.get(url)
+        self.assertContains(response, 'Grace Hopper')
+        self.assertEqual(response.content.count(notified_badge), notified + 1)
+        self.assertEqual(response.context['applications_by_status']['review'][0].id, self.application.id)
+
+
+class DatabaseProfileTests(TestCase):
+    """The SQLite profiles in settings.DATABASE_PROFILES"""
+
+    def open(self, name, directory):
+        profile = dict(settings.DATABASE_PROFILES[name], NAME=os.path.join(directory, 'profile.sqlite3'))
+        wrapper = ConnectionHandler({DEFAULT_DB_ALIAS: profile})[DEFAULT_DB_ALIAS]
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_production_profile_applies_pragmas(self):
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = self.open('sqlite-production', directory)
+            self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+            self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)  # NORMAL
+            self.assertEqual(self.pragma(wrapper, 'busy_timeout'), settings.SQLITE_PRAGMAS['busy_timeout'])
+            self.assertEqual(self.pragma(wrapper, 'cache_size'), settings.SQLITE_PRAGMAS['cache_size'])
+            self.assertEqual(self.pragma(wrapper, 'temp_store'), 2)  # MEMORY
+            self.assertEqual(wrapper.settings_dict['CONN_MAX_AGE'], 600)
+            wrapper.close()
+
+    def test_development_profile_keeps_defaults(self):
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = self.open('sqlite', directory)
+            self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'delete')
+            self.assertEqual(wrapper.settings_dict['CONN_MAX_AGE'], 0)
+            wrapper.close()
+
+    def test_benchmark_compares_sqlite_profiles(self):
+        out = StringIO()
+        call_command('benchmark_database', '--duration', '0.2', '--rows', '50',
+                     '--readers', '2', '--writers', '1', stdout=out)
+        output = out.getvalue()
+        self.assertIn('sqlite-production vs sqlite', output)
+        self.assertNotIn('postgres', output)
+
+    def test_benchmark_rejects_other_profiles(self):
+        with self.assertRaisesMessage(CommandError, 'not an SQLite profile'):
+            call_command('benchmark_database', 'postgres', stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, 'Unknown database profile'):
+            call_command('benchmark_database', 'oracle', stdout=StringIO())
+
+
+@mock.patch.object(dbrouter, 'replica_alias', return_value='replica')
+class ReplicaRouterTests(SimpleTestCase):
+    """Routing decisions of ReplicaRouter under ReplicaRoutingMiddleware"""
+
+    def setUp(self):
+        self.router = dbrouter.ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def route(self, request, write=False):
+        """Run request through the middleware, returning the response and where each read went"""
+        reads = []
+
+        def get_response(request):
+            reads.append(self.router.db_for_read(Job))
+            if write:
+                self.assertEqual(self.router.db_for_write(Job), 'default')
+            reads.append(self.router.db_for_read(Job))
+            return HttpResponse()
+
+        response = dbrouter.ReplicaRoutingMiddleware(get_response)(request)
+        return response, reads
+
+    def test_outside_a_request_reads_use_primary(self, replica_alias):
+        self.assertEqual(self.router.db_for_read(Job), 'default')
+
+    def test_get_reads_from_replica(self, replica_alias):
+        response, reads = self.route(self.factory.get('/jobs/'))
+        self.assertEqual(reads, ['replica', 'replica'])
+        self.assertNotIn(dbrouter.PIN_COOKIE, response.cookies)
+
+    def test_write_moves_reads_to_primary_and_pins_client(self, replica_alias):
+        response, reads = self.route(self.factory.get('/jobs/'), write=True)
+        self.assertEqual(reads, ['replica', 'default'])
+        cookie = response.cookies[dbrouter.PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_PIN_SECONDS)
+        self.assertTrue(cookie['httponly'])
+
+    def test_pinned_client_reads_from_primary(self, replica_alias):
+        request = self.factory.get('/jobs/')
+        request.COOKIES[dbrouter.PIN_COOKIE] = '1'
+        response, reads = self.route(request)
+        self.assertEqual(reads, ['default', 'default'])
+        self.assertNotIn(dbrouter.PIN_COOKIE, response.cookies)
+
+    def test_post_reads_from_primary(self, replica_alias):
+        response, reads = self.route(self.factory.post('/jobs/'))
+        self.assertEqual(reads, ['default', 'default'])
+
+    def test_cache_table_writes_do_not_pin(self, replica_alias):
+        cache_entry = mock.Mock(_meta=mock.Mock(app_label='django_cache'))
+
+        def get_response(request):
+            self.router.db_for_write(cache_entry)
+            return HttpResponse()
+
+        response = dbrouter.ReplicaRoutingMiddleware(get_response)(self.factory.get('/jobs/'))
+        self.assertNotIn(dbrouter.PIN_COOKIE, response.cookies)
+
+    def test_no_replica_reads_use_primary(self, replica_alias):
+        replica_alias.return_value = None
+        response, reads = self.route(self.factory.get('/jobs/'))
+        self.assertEqual(reads, ['default', 'default'])
+
+
+class ReplicaPinCookieTests(JobsTestCase):
+    def test_write_sets_pin_cookie(self):
+        response = self.post_json('jobs:ajax_bulk_transition', {'moves': [
+            {'id': self.application.id, 'status': 'review'},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(dbrouter.PIN_COOKIE, response.cookies)
+
+    def test_read_leaves_client_unpinned(self):
+        response = self.client.get(reverse('jobs:job_list'))
+        self.assertNotIn(dbrouter.PIN_COOKIE, response.cookies)
+
+
+@override_settings(QUERY_INSPECTOR_ENABLED=True, QUERY_BUDGET_ACTION='raise')
+class QueryBudgetTests(JobsTestCase):
+    """Budgeted views stay within QUERY_BUDGETS however much data there is"""
+
+    def setUp(self):
+        super().setUp()
+        # Enough rows that a query per job, application or message would show
+        Profile.objects.create(user=self.recruiter, skills='python, django')
+        Profile.objects.create(user=self.seeker, skills='python', location='Atlanta, GA')
+        for i in range(12):
+            recruiter, recruiter_profile = make_recruiter(f'recruiter{i}')
+            Profile.objects.create(user=recruiter, skills='python')
+            Job.objects.create(title=f'Job {i}', description='Work', company='Acme', recruiter=recruiter_profile)
+            applicant = make_seeker(f'applicant{i}')
+            application = JobApplication.objects.create(job=self.job, applicant=applicant)
+            Message.objects.create(application=application, sender=applicant, content='Hello')
+
+    def get(self, name, *args, data=None):
+        response = self.client.get(reverse(name, args=args), data)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_recruiter_views(self):
+        since = (timezone.now() - timedelta(minutes=1)).isoformat()
+        for name, args, data in [
+            ('jobs:job_list', (), None),
+            ('jobs:job_detail', (self.job.id,), None),
+            ('jobs:my_jobs', (), None),
+            ('jobs:application_pipeline', (self.job.id,), None),
+            ('jobs:ajax_pipeline_changes', (self.job.id,), {'since': since}),
+            ('jobs:ajax_conversations', (), None),
+            ('jobs:ajax_applicant_locations', (self.job.id,), None),
+            ('jobs:recommended_candidates', (self.job.id,), None),
+        ]:
+            with self.subTest(name):
+                self.get(name, *args, data=data)
+
+    def test_job_seeker_views(self):
+        self.client.force_login(self.seeker)
+        for name, args in [
+            ('jobs:job_list', ()),
+            ('jobs:job_detail', (self.job.id,)),
+            ('jobs:ajax_conversations', ()),
+        ]:
+            with self.subTest(name):
+                self.get(name, *args)
+
+    def test_over_budget_raises(self):
+        with override_settings(QUERY_BUDGETS={'jobs:my_jobs': 1}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('jobs:my_jobs'))
+
+
+class ServerTimingTests(JobsTestCase):
+    """Per-request timings from ServerTimingMiddleware"""
+
+    def timings(self, response):
+        """The Server-Timing header as ``{name: [params]}``"""
+        entries = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            entries[name] = params
+        return entries
+
+    def test_internal_ip_gets_header(self):
+        response = self.client.get(reverse('jobs:job_list'))
+        timings = self.timings(response)
+        self.assertEqual(list(timings), ['total', 'view', 'db', 'tpl'])
+        self.assertRegex(timings['db'][1], r'^desc="[1-9][0-9]* queries"$')
+        total, view = (float(timings[name][0].removeprefix('dur=')) for name in ('total', 'view'))
+        self.assertLessEqual(view, total)
+
+    @override_settings(INTERNAL_IPS=[])
+    def test_header_hidden_from_other_visitors(self):
+        with self.assertLogs('jobfinder.servertiming', 'INFO') as logs:
+            response = self.client.get(reverse('jobs:job_list'))
+        self.assertNotIn('Server-Timing', response)
+        fields = logs.records[-1].server_timing
+        self.assertEqual(fields['view'], 'jobs:job_list')
+        self.assertEqual(fields['status'], 200)
+        self.assertGreater(fields['db_queries'], 0)
+        self.assertIn('view=jobs:job_list', logs.records[-1].getMessage())
+
+    @override_settings(INTERNAL_IPS=[])
+    def test_staff_gets_header(self):
+        self.recruiter.is_staff = True
+        self.recruiter.save(update_fields=['is_staff'])
+        response = self.client.get(reverse('jobs:job_list'))
+        self.assertIn('tpl', self.timings(response))
+
+    @override_settings(SERVER_TIMING_ENABLED=False)
+    def test_disabled(self):
+        with self.assertNoLogs('jobfinder.servertiming'):
+            response = self.client.get(reverse('jobs:job_list'))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_template_render_outside_request_is_untimed(self):
+        template = engines.all()[0].from_string('{{ value }}')
+        self.assertIsInstance(template, servertiming.TimedTemplate)
+        self.assertEqual(template.render({'value': 'ok'}), 'ok')
+
+
+class MetricsTests(JobsTestCase):
+    """Request metrics, snapshot files and the /metrics endpoint"""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings_override = override_settings(METRICS_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def make_registry(self):
+        registry = metrics.Registry()
+        return registry, registry.counter('test_events_total', 'Test events', ['kind'])
+
+    def test_middleware_counts_requests(self):
+        key = ('jobs:job_list', 'GET', '200')
+        before = metrics.REQUESTS.samples.get(key, 0)
+        self.client.get(reverse('jobs:job_list'))
+        self.assertEqual(metrics.REQUESTS.samples[key], before + 1)
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        self.assertIn(
+            f'jobfinder_http_requests_total{{view="jobs:job_list",method="GET",status="200"}} {before + 1}',
+            response.content.decode(),
+        )
+
+    @override_settings(METRICS_ALLOWED_IPS=[])
+    def test_endpoint_needs_staff_or_allowed_ip(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.recruiter.is_staff = True
+        self.recruiter.save(update_fields=['is_staff'])
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    def test_job_flush_accumulates_and_resets(self):
+        registry, counter = self.make_registry()
+        counter.inc(3, kind='sent')
+        registry.flush(job='digest')
+        self.assertEqual(counter.samples, {})
+        counter.inc(2, kind='sent')
+        registry.flush(job='digest')
+
+        self.assertEqual(sorted(os.listdir(self.directory)), ['.lock', 'metrics-job-digest.json'])
+        self.assertEqual(registry.collect()['test_events_total']['samples'], {('sent',): 5})
+
+    def test_exited_process_snapshot_is_retained(self):
+        registry, counter = self.make_registry()
+        counter.inc(4, kind='sent')
+        snapshot = registry.snapshot()
+        dead = os.path.join(self.directory, f'metrics-process-{metrics._HOST}-999999999-0.json')
+        with open(dead, 'w') as f:
+            json.dump(snapshot, f)
+
+        fresh, _ = self.make_registry()
+        for _ in range(2):
+            self.assertEqual(fresh.collect()['test_events_total']['samples'], {('sent',): 4})
+        self.assertFalse(os.path.exists(dead))
+        self.assertTrue(os.path.exists(os.path.join(self.directory, 'metrics-retained.json')))
+
+    def test_histogram_quantiles(self):
+        self.assertEqual(metrics.histogram_quantile(0.5, (1, 2, 4), [0, 10, 0, 0]), 1.5)
+        self.assertEqual(metrics.histogram_quantile(0.99, (1, 2, 4), [0, 0, 0, 3]), 4)
+        registry = metrics.Registry()
+        histogram = registry.histogram('test_seconds', 'Test durations', buckets=(1, 2, 4), quantiles=(0.5,))
+        for value in (1.2, 1.4, 1.6, 1.8):
+            histogram.observe(value)
+        text = metrics.render(registry.collect())
+        self.assertIn('test_seconds_bucket{le="2.0"} 4', text)
+        self.assertIn('test_seconds_count 4', text)
+        self.assertIn('test_seconds_quantile{quantile="0.5"} 1.5', text)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class DataGenerationTests(TestCase):
+    """The seeded bulk generator behind populate_sample_data"""
+
+    SIZES = {'recruiters': 3, 'jobs': 12, 'seekers': 40, 'batch_size': 15}
+
+    def generate(self, seed, prefix='gen'):
+        return datagen.generate(random.Random(seed), prefix=prefix, **self.SIZES)
+
+    def fingerprint(self, prefix='gen'):
+        """Everything generated, without primary keys or timestamps relative to now"""
+        jobs = Job.objects.filter(recruiter__user_profile__user__username__startswith=prefix)
+        applications = JobApplication.objects.filter(applicant__username__startswith=prefix)
+        return {
+            'jobs': sorted(jobs.values_list('title', 'company', 'location', 'salary_min', 'skills_required')),
+            'applications': sorted(applications.values_list('applicant__username', 'job__title', 'job__company',
+                                                            'job__salary_min', 'status')),
+            'messages': sorted(Message.objects.filter(
+                application__applicant__username__startswith=prefix,
+            ).values_list('application__applicant__username', 'sender__username', 'content')),
+        }
+
+    def test_same_seed_same_data(self):
+        totals = self.generate(7)
+        first = self.fingerprint()
+        self.assertEqual(len(first['jobs']), 12)
+        self.assertEqual(len(first['applications']), totals['applications'])
+
+        User.objects.filter(username__startswith='gen_').delete()
+        self.assertEqual(self.generate(7), totals)
+        self.assertEqual(self.fingerprint(), first)
+
+        User.objects.filter(username__startswith='gen_').delete()
+        self.generate(8)
+        self.assertNotEqual(self.fingerprint(), first)
+
+    def test_rerun_adds_accounts(self):
+        self.generate(7)
+        self.generate(7)
+        self.assertEqual(User.objects.filter(username__startswith='gen_seeker_').count(), 80)
+        self.assertTrue(User.objects.filter(username='gen_seeker_79').exists())
+
+    def test_derived_rows_are_consistent(self):
+        totals = self.generate(7)
+        self.assertGreater(totals['messages'], 0)
+
+        stats = {row['job_id']: row for row in JobStats.objects.values()}
+        for job in Job.objects.all():
+            counts = dict(job.applications.values_list('status').annotate(n=Count('id')))
+            self.assertEqual(stats[job.id]['total_applications'], sum(counts.values()))
+            for status in ('applied', 'review', 'interview', 'offer', 'closed', 'rejected'):
+                self.assertEqual(stats[job.id][f'{status}_count'], counts.get(status, 0))
+
+        for application in JobApplication.objects.prefetch_related('status_events'):
+            events = sorted(application.status_events.all(), key=lambda event: event.created_at)
+            self.assertEqual(events[0].to_status, 'applied')
+            self.assertEqual(events[-1].to_status, application.status)
+            # Generated timestamps survive bulk_create's auto_now_add
+            self.assertEqual(events[0].created_at, application.applied_at)
+
+        message = Message.objects.filter(sender=F('application__applicant')).first()
+        word = max(message.content.strip('.!?').split(), key=len)
+        _, rows = search.search_messages(message.sender, None, word, per_page=100)
+        self.assertIn(message.id, [message_id for message_id, _ in rows])
+
+
+class AsyncViewTests(JobsTestCase):
+    """The polling endpoints served as async views, driven through the ASGI handler"""
+
+    def setUp(self):
+        super().setUp()
+        User.objects.filter(pk=self.seeker.pk).update(first_name='Ada', last_name='Lovelace')
+        self.question = Message.objects.create(application=self.application, sender=self.seeker, content='Any news?')
+        self.other_question = Message.objects.create(
+            application=self.other_application, sender=self.other_seeker, content='Is it remote?'
+        )
+        self.async_client.force_login(self.recruiter)
+
+    async def get_json(self, name, *args, status=200):
+        response = await self.async_client.get(reverse(name, args=args))
+        self.assertEqual(response.status_code, status)
+        return response.json()
+
+    async def test_unread_count(self):
+        self.assertEqual((await self.get_json('jobs:ajax_unread_count'))['unread_count'], 2)
+        await self.async_client.aforce_login(self.seeker)
+        self.assertEqual((await self.get_json('jobs:ajax_unread_count'))['unread_count'], 0)
+
+    async def test_application_messages_marks_thread_read(self):
+        data = await self.get_json('jobs:ajax_messages', self.application.id)
+
+        self.assertEqual([message['content'] for message in data['messages']], ['Any news?'])
+        self.assertEqual(data['application']['applicant'], 'Ada Lovelace')
+        self.assertEqual((await self.get_json('jobs:ajax_unread_count'))['unread_count'], 1)
+        stats = await JobStats.objects.aget(job=self.job)
+        self.assertEqual(stats.unread_messages, 1)
+
+    async def test_application_messages_needs_a_participant(self):
+        await self.async_client.aforce_login(self.other_seeker)
+        data = await self.get_json('jobs:ajax_messages', self.application.id, status=403)
+        self.assertEqual(data['error'], 'Not authorized')
+
+    async def test_conversations(self):
+        data = await self.get_json('jobs:ajax_conversations')
+
+        conversations = data['conversations']
+        self.assertEqual([row['application_id'] for row in conversations],
+                         [self.other_application.id, self.application.id])
+        self.assertEqual(conversations[1]['other_party'], 'Ada Lovelace')
+        self.assertEqual(data['unread_count'], 2)
+
+        await self.async_client.aforce_login(self.seeker)
+        data = await self.get_json('jobs:ajax_conversations')
+        self.assertEqual([row['other_party'] for row in data['conversations']], ['Acme'])
+        self.assertEqual(data['unread_count'], 0)
+
+    async def test_applicant_locations(self):
+        await Profile.objects.acreate(user=self.seeker, latitude=33.75, longitude=-84.39)
+        data = await self.get_json('jobs:ajax_applicant_locations', self.job.id)
+        self.assertEqual(data['locations']['id'], [self.application.id])
+
+        await self.async_client.aforce_login(self.seeker)
+        await self.get_json('jobs:ajax_applicant_locations', self.job.id, status=403)
+
+    async def test_login_required(self):
+        await self.async_client.alogout()
+        response = await self.async_client.get(reverse('jobs:ajax_unread_count'))
+        self.assertEqual(response.status_code, 302)
+
+
+class CsvExportTests(JobsTestCase):
+    """Streaming CSV exports of the admin actions"""
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(self.admin)
+        Message.objects.create(application=self.application, sender=self.seeker, content='Hi, "quick" question\nthanks')
+        Message.objects.create(application=self.application, sender=self.recruiter, content='Sure')
+
+    def export(self, model, action, **headers):
+        changelist = reverse(f'admin:jobs_{model._meta.model_name}_changelist')
+        return self.client.post(changelist, {
+            'action': action,
+            '_selected_action': list(model.objects.values_list('pk', flat=True)),
+        }, headers=headers)
+
+    def read(self, response):
+        return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    @override_settings(CSV_EXPORT_GZIP=False)
+    def test_applications_export(self):
+        response = self.export(JobApplication, 'export_jobapplications_csv')
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename=jobapplications_export.csv')
+        header, *rows = self.read(response)
+        self.assertEqual(header[:3], ['id', 'applicant_username', 'applicant_email'])
+        self.assertEqual(header[-1], 'resume')
+        self.assertEqual(sorted(row[1] for row in rows), ['other_seeker', 'seeker'])
+        self.assertTrue(all(len(row) == len(header) and row[-1] == '' for row in rows))
+
+    def test_messages_export_is_gzipped_when_accepted(self):
+        response = self.export(Message, 'export_messages_csv', accept_encoding='gzip, deflate')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        content = gzip.decompress(b''.join(response.streaming_content)).decode()
+        header, *rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(header, ['id', 'sender_username', 'application_id', 'application_applicant',
+                                  'content', 'created_at'])
+        self.assertEqual(sorted(row[4] for row in rows), ['Hi, "quick" question\nthanks', 'Sure'])
+
+    def test_plain_without_accept_encoding(self):
+        response = self.export(Message, 'export_messages_csv')
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(len(self.read(response)), 3)
+
+    @mock.patch.object(csvexport, 'BUFFER_BYTES', 16)
+    def test_rows_streamed_lazily_in_chunks(self):
+        request = RequestFactory().get('/')
+        queryset = JobApplication.objects.order_by('id')
+        with self.assertNumQueries(0):
+            response = csvexport.csv_response(
+                request, 'applications.csv', ['id', 'user'], csvexport.rows(queryset, 'id', 'applicant__username')
+            )
+        with self.assertNumQueries(1):
+            chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual(b''.join(chunks).decode().splitlines(), [
+            'id,user', f'{self.application.id},seeker', f'{self.other_application.id},other_seeker',
+        ])
@@ -0,0 +1,165 @@
+"""
+Cached map tiles of clustered points.
+
+Tiles use the standard Web Mercator ``z/x/y`` scheme (the one Leaflet and
+OpenStreetMap use). Each tile holds the grid clusters (see ``jobs/geo.py``)
+of the points that fall inside it, and is cached under its quadkey. A tile's
+quadkey is a prefix of the quadkey of every point inside it, so when a point
+moves, every tile that could contain it is found by taking the prefixes of
+the point's quadkey at ``MAX_ZOOM``.
+
+Layers are named by the caller: ``'jobs'`` for active jobs and
+``'applicants:<job_id>'`` for one job's applicants.
+"""
+import math
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Min
+
+from . import geo, serializers
+from .models import Job, JobApplication
+
+MAX_ZOOM = 18
+MAX_LATITUDE = 85.05112878
+
+TILE_FIELDS = {
+    'lat': 'lat',
+    'lng': 'lng',
+    'count': 'count',
+    'id': 'point_id',
+}
+
+
+# Latitude/longitude lookups of each layer's points
+JOB_POINT_FIELDS = ('latitude', 'longitude')
+APPLICANT_POINT_FIELDS = ('applicant__profile__latitude', 'applicant__profile__longitude')
+APPLICANT_EXTRA_FIELDS = {'status': 'status'}
+
+
+def job_points():
+    """Points of the ``'jobs'`` layer: active jobs with coordinates"""
+    return Job.objects.filter(is_active=True, latitude__isnull=False, longitude__isnull=False)
+
+
+def applicant_points(job_id):
+    """Points of the ``'applicants:<job_id>'`` layer: applicants sharing their location"""
+    return JobApplication.objects.filter(
+        job_id=job_id,
+        applicant__profile__show_location=True,
+        applicant__profile__latitude__isnull=False,
+        applicant__profile__longitude__isnull=False
+    )
+
+
+def _cache():
+    return caches[getattr(settings, 'MAP_TILE_CACHE_ALIAS', 'default')]
+
+
+def quadkey(z, x, y):
+    """Quadkey string of tile ``(z, x, y)``; the root tile's quadkey is empty"""
+    digits = []
+    for level in range(z, 0, -1):
+        mask = 1 << (level - 1)
+        digit = 0
+        if x & mask:
+            digit += 1
+        if y & mask:
+            digit += 2
+        digits.append(str(digit))
+    return ''.join(digits)
+
+
+def tile_for_point(lat, lng, z):
+    """``(x, y)`` of the tile containing a point at zoom ``z``"""
+    n = 2 ** z
+    lat = max(min(lat, MAX_LATITUDE), -MAX_LATITUDE)
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(z, x, y):
+    """``(south, west, north, east)`` of tile ``(z, x, y)`` in degrees"""
+    n = 2 ** z
+
+    def latitude(tile_y):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / n))))
+
+    return latitude(y + 1), x / n * 360.0 - 180.0, latitude(y), (x + 1) / n * 360.0 - 180.0
+
+
+def validate_tile(z, x, y):
+    """Raise ValueError unless ``(z, x, y)`` is a tile we serve"""
+    if not 0 <= z <= MAX_ZOOM:
+        raise ValueError(f'z must be between 0 and {MAX_ZOOM}')
+    n = 2 ** z
+    if not (0 <= x < n and 0 <= y < n):
+        raise ValueError('Tile out of range')
+
+
+def _cache_key(layer, z, x, y):
+    return f'maptile:{layer}:{z}:{quadkey(z, x, y)}'
+
+
+def build_tile(points, lat_field, lng_field, z, x, y, extra_fields=None):
+    """
+    Clusters of ``points`` (a queryset) inside tile ``(z, x, y)``, as parallel
+    arrays. Single-point clusters carry the point's primary key as ``id``,
+    plus ``extra_fields`` (a mapping of output key -> field) of that point.
+    """
+    extra_fields = extra_fields or {}
+    south, west, north, east = tile_bounds(z, x, y)
+    inside = points.filter(**{
+        f'{lat_field}__gte': south,
+        f'{lat_field}__lt': north,
+        f'{lng_field}__gte': west,
+        f'{lng_field}__lt': east,
+    })
+    # Min() over a single-point cluster is just that point's value
+    rows = list(geo.grid_clusters(inside, z, lat_field, lng_field).annotate(
+        point_id=Min('pk'),
+        **{f'point_{key}': Min(field) for key, field in extra_fields.items()}
+    ))
+    for row in rows:
+        if row['count'] > 1:
+            row['point_id'] = None
+            for key in extra_fields:
+                row[f'point_{key}'] = None
+    fields = dict(TILE_FIELDS, **{key: f'point_{key}' for key in extra_fields})
+    return {
+        'clusters': serializers.serialize_rows(rows, fields, columnar=True),
+        'count': sum(row['count'] for row in rows),
+    }
+
+
+def get_tile(layer, points, lat_field, lng_field, z, x, y, extra_fields=None):
+    """Tile ``(z, x, y)`` of ``layer``, from the cache when possible"""
+    cache = _cache()
+    key = _cache_key(layer, z, x, y)
+    tile = cache.get(key)
+    if tile is None:
+        tile = build_tile(points, lat_field, lng_field, z, x, y, extra_fields)
+        cache.set(key, tile, getattr(settings, 'MAP_TILE_CACHE_TIMEOUT', 60 * 60 * 24))
+    return tile
+
+
+def invalidate_point(layer, lat, lng):
+    """Drop every cached tile of ``layer`` that contains the point, at all zoom levels"""
+    if lat is None or lng is None:
+        return
+    x, y = tile_for_point(lat, lng, MAX_ZOOM)
+    point_key = quadkey(MAX_ZOOM, x, y)
+    _cache().delete_many([f'maptile:{layer}:{z}:{point_key[:z]}' for z in range(MAX_ZOOM + 1)])
+
+
+def invalidate_applications(application_ids):
+    """Drop the cached applicant tiles showing these applications, e.g. after their status changed"""
+    points = JobApplication.objects.filter(
+        pk__in=application_ids,
+        applicant__profile__show_location=True,
+        applicant__profile__latitude__isnull=False,
+        applicant__profile__longitude__isnull=False
+    ).values_list('job_id', *APPLICANT_POINT_FIELDS)
+    for job_id, lat, lng in points:
+        invalidate_point(f'applicants:{job_id}', lat, lng)
@@ -25,10 +25,20 @@ urlpatterns = [
     # AJAX endpoints
     path('ajax/update-status/', ajax_views.update_application_status, name='ajax_update_status'),
     path('ajax/batch-update/', ajax_views.batch_update_status, name='ajax_batch_update'),
+    path('ajax/bulk-transition/', ajax_views.bulk_transition, name='ajax_bulk_transition'),
     path('ajax/delete-application/', ajax_views.delete_application, name='ajax_delete_application'),
     path('ajax/messages/<int:application_id>/', ajax_views.application_messages, name='ajax_messages'),
     path('ajax/send-message/', ajax_views.send_message, name='ajax_send_message'),
     path('ajax/unread-count/', ajax_views.get_unread_message_count, name='ajax_unread_count'),
     path('ajax/conversations/', ajax_views.get_conversations, name='ajax_conversations'),
+    path('ajax/messages/search/', ajax_views.search_messages, name='ajax_search_messages'),
+    path('ajax/<int:job_id>/pipeline-changes/', ajax_views.pipeline_changes, name='ajax_pipeline_changes'),
+    path('ajax/<int:job_id>/pipeline/<str:status>/', ajax_views.pipeline_column, name='ajax_pipeline_column'),
+    path('ajax/<int:job_id>/pipeline-stats/', ajax_views.pipeline_stats, name='ajax_pipeline_stats'),
     path('ajax/<int:job_id>/applicant-locations/', ajax_views.get_applicant_locations, name='ajax_applicant_locations'),
+    path('ajax/locations/', ajax_views.location_autocomplete, name='ajax_location_autocomplete'),
+    
+    # Clustered map tiles
+    path('tiles/jobs/<int:z>/<int:x>/<int:y>/', ajax_views.job_map_tile, name='job_map_tile'),
+    path('ajax/<int:job_id>/tiles/<int:z>/<int:x>/<int:y>/', ajax_views.applicant_map_tile, name='ajax_applicant_map_tile'),
 ]
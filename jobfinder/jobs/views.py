@@ -2,15 +2,19 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
 from authentication.models import UserProfile, RecruiterProfile, JobSeekerProfile
+from jobfinder.pagecache import cache_anonymous_page
 from profiles.models import Profile
 from .models import Job, JobApplication
 from .forms import JobForm, JobApplicationForm
+from . import geocoder, pipeline
 import re
 import math
 
 
+@cache_anonymous_page('jobs')
 def job_list(request):
     """Main jobs page with search and filtering"""
     jobs = Job.objects.filter(is_active=True)
@@ -61,24 +65,10 @@ def job_list(request):
     
     # --- Commute/distance filtering ---
     # The UI will provide `start_city` (string) and `commute_miles` (int) via GET.
-    # We keep a small mapping of common city names -> (lat, lon). Jobs whose
-    # `location` text contains a known city name will be assigned that city's
-    # coordinates. If a commute filter is provided and a job's location doesn't
-    # map to a known city, the job will be excluded (we can't compute distance).
-    CITY_COORDS = {
-        'new york': (40.7128, -74.0060),
-        'san francisco': (37.7749, -122.4194),
-        'los angeles': (34.0522, -118.2437),
-        'chicago': (41.8781, -87.6298),
-        'boston': (42.3601, -71.0589),
-        'seattle': (47.6062, -122.3321),
-        'austin': (30.2672, -97.7431),
-        'denver': (39.7392, -104.9903),
-        'atlanta': (33.7490, -84.3880),
-        'portland': (45.5051, -122.6750),
-        'los angeles, ca': (34.0522, -118.2437),
-    }
-
+    # Locations are resolved with the offline gazetteer (jobs/geocoder.py). Jobs
+    # use their stored coordinates (geocoded from `location` on save), falling
+    # back to geocoding the text. If a commute filter is provided and a job's
+    # location can't be resolved, the job will be excluded.
     def haversine_miles(lat1, lon1, lat2, lon2):
         # Haversine formula to compute distance between two lat/lon in miles
         R = 3958.8  # Earth radius in miles
@@ -90,15 +80,10 @@ def job_list(request):
         c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
         return R * c
 
-    def find_city_coords(text):
-        if not text:
-            return None
-        t = text.lower()
-        # try to match any city key that appears in the text
-        for city, coords in CITY_COORDS.items():
-            if city in t:
-                return coords
-        return None
+    def job_coords(job):
+        if job.latitude is not None and job.longitude is not None:
+            return job.latitude, job.longitude
+        return geocoder.geocode(job.location or '')
 
     start_city = request.GET.get('start_city', '')
     commute_miles = request.GET.get('commute_miles', '')
@@ -111,18 +96,18 @@ def job_list(request):
     # If start_city provided, try to resolve to coordinates
     start_coords = None
     if start_city:
-        start_coords = CITY_COORDS.get(start_city.lower()) or None
+        start_coords = geocoder.geocode(start_city)
 
     # Apply distance filtering if both start_coords and commute_val are present
     if start_coords and commute_val:
         filtered = []
         # evaluate current queryset into list
         for j in jobs:
-            job_coords = find_city_coords(j.location or '')
-            if not job_coords:
+            coords = job_coords(j)
+            if not coords:
                 # skip jobs with unknown/ambiguous locations when commute filter is active
                 continue
-            dist = haversine_miles(start_coords[0], start_coords[1], job_coords[0], job_coords[1])
+            dist = haversine_miles(start_coords[0], start_coords[1], coords[0], coords[1])
             if dist <= commute_val:
                 filtered.append(j)
         jobs = filtered
@@ -170,17 +155,13 @@ def job_list(request):
             if user_skills:
                 # Build a scored list of (overlap_count, created_at, job)
                 candidates = []
-                for j in Job.objects.filter(is_active=True):
+                # The poster's skills come with each job, rather than a query per job
+                poster_skills = Profile.objects.filter(
+                    user_id=OuterRef('recruiter__user_profile__user_id')
+                ).values('skills')[:1]
+                for j in Job.objects.filter(is_active=True).annotate(poster_skills=Subquery(poster_skills)):
                     # Merge user-editable `profiles.Profile.skills` (poster) with admin `j.skills_required`
-                    poster_skills = ''
-                    try:
-                        recruiter_user = j.recruiter.user_profile.user
-                        poster = Profile.objects.filter(user=recruiter_user).first()
-                        if poster and poster.skills:
-                            poster_skills = poster.skills
-                    except Exception:
-                        poster_skills = ''
-
+                    poster_skills = j.poster_skills or ''
                     admin_skills = j.skills_required or ''
 
                     # Combine both sources (union) so we don't miss any skill tokens
@@ -215,12 +196,12 @@ def job_list(request):
         'recommended_jobs': recommended_jobs,
         'start_city': start_city,
         'commute_miles': commute_miles,
-        'city_choices': sorted([c.title() for c in CITY_COORDS.keys()]),
     }
     
     return render(request, 'jobs/job_list.html', context)
 
 
+@cache_anonymous_page('jobs')
 def job_detail(request, job_id):
     """Job detail page"""
     job = get_object_or_404(Job, id=job_id, is_active=True)
@@ -263,7 +244,7 @@ def my_jobs(request):
         messages.error(request, "Recruiter profile not found.")
         return redirect('jobs:job_list')
     
-    jobs = Job.objects.filter(recruiter=recruiter_profile).order_by('-created_at')
+    jobs = Job.objects.filter(recruiter=recruiter_profile).select_related('stats').order_by('-created_at')
     
     context = {
         'jobs': jobs,
@@ -398,7 +379,9 @@ def apply_to_job(request, job_id):
             application = form.save(commit=False)
             application.job = job
             application.applicant = request.user
-            application.save()
+            # The post_save handlers update the job's stats and status history in the same transaction
+            with transaction.atomic():
+                application.save()
             messages.success(request, "Application submitted successfully!")
             return redirect('jobs:job_detail', job_id=job_id)
     else:
@@ -448,20 +431,26 @@ def application_pipeline(request, job_id):
         messages.error(request, "Recruiter profile not found.")
         return redirect('jobs:job_list')
     
-    job = get_object_or_404(Job, id=job_id, recruiter=recruiter_profile)
+    job = get_object_or_404(Job.objects.select_related('stats'), id=job_id, recruiter=recruiter_profile)
     
-    # Get applications grouped by status
-    applications_by_status = {
-        'applied': job.applications.filter(status='applied').order_by('-applied_at'),
-        'review': job.applications.filter(status='review').order_by('-status_updated_at'),
-        'interview': job.applications.filter(status='interview').order_by('-status_updated_at'),
-        'offer': job.applications.filter(status='offer').order_by('-status_updated_at'),
-        'closed': job.applications.filter(status='closed').order_by('-status_updated_at'),
-    }
+    # Version for the board's delta sync, taken before the cards are loaded
+    sync_version = pipeline.latest_change(job.id).isoformat()
+    
+    # Only the first page of each column is rendered; the board loads the rest
+    # on scroll, so page size and DOM stay bounded however many applicants there are
+    applications_by_status = {}
+    next_cursors = {}
+    for status in JobApplication.PIPELINE_STATUSES:
+        applications_by_status[status], next_cursors[status] = pipeline.column_page(
+            job.id, status, request.user
+        )
     
     context = {
         'job': job,
         'applications_by_status': applications_by_status,
+        'next_cursors': next_cursors,
+        'column_counts': pipeline.column_counts(job.id),
+        'sync_version': sync_version,
         'status_choices': JobApplication.STATUS_CHOICES,
     }
     
@@ -1,53 +1,31 @@
 from django.contrib import admin
-from django.http import HttpResponse
-import csv
+from jobfinder import csvexport
 
 from .models import Profile, SavedSearch, SearchNotification
 
 
 def export_profiles_csv(modeladmin, request, queryset):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename=profiles_export.csv'
-    writer = csv.writer(response)
-    writer.writerow([
+    header = [
         'id', 'username', 'email', 'first_name', 'last_name',
         'headline', 'location', 'skills', 'links', 'created_at'
-    ])
-    for obj in queryset.select_related('user'):
-        writer.writerow([
-            obj.id,
-            obj.user.username if obj.user else '',
-            obj.user.email if obj.user else '',
-            getattr(obj.user, 'first_name', ''),
-            getattr(obj.user, 'last_name', ''),
-            getattr(obj, 'headline', ''),
-            getattr(obj, 'location', ''),
-            getattr(obj, 'skills', ''),
-            getattr(obj, 'links', ''),
-            getattr(obj, 'created_at', ''),
-        ])
-    return response
+    ]
+    rows = csvexport.rows(
+        queryset, 'id', 'user__username', 'user__email', 'user__first_name', 'user__last_name',
+        'headline', 'location', 'skills', 'links', 'created_at'
+    )
+    return csvexport.csv_response(request, 'profiles_export.csv', header, rows)
 export_profiles_csv.short_description = "Export selected profiles to CSV"
 
 
 def export_savedsearches_csv(modeladmin, request, queryset):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename=savedsearches_export.csv'
-    writer = csv.writer(response)
-    writer.writerow([
+    header = [
         'id', 'name', 'recruiter_username', 'query', 'notification_enabled', 'created_at'
-    ])
-    for obj in queryset.select_related('recruiter__user'):
-        recruiter_name = obj.recruiter.user.username if getattr(obj, 'recruiter', None) and getattr(obj.recruiter, 'user', None) else ''
-        writer.writerow([
-            obj.id,
-            getattr(obj, 'name', ''),
-            recruiter_name,
-            getattr(obj, 'query', ''),
-            getattr(obj, 'notification_enabled', False),
-            getattr(obj, 'created_at', ''),
-        ])
-    return response
+    ]
+    rows = csvexport.rows(
+        queryset, 'id', 'name', 'recruiter__user_profile__user__username', 'search_query',
+        'notification_enabled', 'created_at'
+    )
+    return csvexport.csv_response(request, 'savedsearches_export.csv', header, rows)
 export_savedsearches_csv.short_description = "Export selected saved searches to CSV"
 
 
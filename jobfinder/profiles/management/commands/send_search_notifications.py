@@ -2,11 +2,33 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 from django.core.mail import send_mail
 from django.conf import settings
+from jobfinder import metrics
 from profiles.models import SavedSearch, SearchNotification
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+RUNS = metrics.registry.counter(
+    'jobfinder_search_notifications_runs_total', 'Runs of send_search_notifications', ['mode']
+)
+RUN_DURATION = metrics.registry.histogram(
+    'jobfinder_search_notifications_run_duration_seconds', 'Duration of send_search_notifications runs',
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900),
+)
+SEARCHES_PROCESSED = metrics.registry.counter(
+    'jobfinder_search_notifications_searches_total', 'Saved searches checked for new candidates'
+)
+CANDIDATES_MATCHED = metrics.registry.counter(
+    'jobfinder_search_notifications_matches_total', 'New candidates found by saved searches'
+)
+NOTIFICATIONS_CREATED = metrics.registry.counter(
+    'jobfinder_search_notifications_created_total', 'Search notifications created'
+)
+EMAIL_FAILURES = metrics.registry.counter(
+    'jobfinder_search_notifications_email_failures_total', 'Notification emails that failed to send'
+)
+
 
 class Command(BaseCommand):
     help = 'Check saved searches for new candidate matches and send notifications'
@@ -19,6 +41,16 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            self._run(options)
+        finally:
+            RUNS.inc(mode='dry_run' if options['dry_run'] else 'live')
+            RUN_DURATION.observe(time.perf_counter() - started)
+            # This process is about to exit; add its numbers to the job's totals for /metrics
+            metrics.registry.flush(job='send_search_notifications')
+
+    def _run(self, options):
         dry_run = options['dry_run']
         
         if dry_run:
@@ -32,6 +64,7 @@ class Command(BaseCommand):
         total_notifications = 0
         
         for search in saved_searches:
+            SEARCHES_PROCESSED.inc()
             self.stdout.write(f'\nProcessing: {search.name} (Recruiter: {search.recruiter.user_profile.user.email})')
             
             # Get new candidates for this search
@@ -39,6 +72,7 @@ class Command(BaseCommand):
             
             if new_candidates:
                 self.stdout.write(f'  Found {new_candidates.count()} new candidate(s)')
+                CANDIDATES_MATCHED.inc(len(new_candidates))
                 
                 for profile in new_candidates:
                     candidate = profile.user
@@ -58,6 +92,7 @@ class Command(BaseCommand):
                         
                         if created:
                             total_notifications += 1
+                            NOTIFICATIONS_CREATED.inc()
                             self.stdout.write(
                                 self.style.SUCCESS(
                                     f'  ✓ Notification created for: {candidate.get_full_name() or candidate.username}'
@@ -149,6 +184,7 @@ class Command(BaseCommand):
             # )
             
         except Exception as e:
+            EMAIL_FAILURES.inc()
             logger.error(f'Error sending notification email: {e}')
             self.stdout.write(
                 self.style.ERROR(f'    Failed to send email: {e}')